@@ -0,0 +1,345 @@
+/**
+ * Offline replay / benchmark of the voice pipeline, no Discord needed.
+ *
+ * Usage (from the repo root):
+ *   node bench/replay.js <corpus dir> [--concurrency 4] [--realtime] [--no-tts] [--llm-ms 800]
+ *                        [--repeat 1] [--warmup 1] [--json results.json]
+ *
+ * The corpus directory holds 16kHz mono 16-bit .wav (or raw .pcm) utterances and a manifest.json:
+ *   [
+ *     { "file": "weather.wav", "text": "mina what's the weather like", "intent": "chat" },
+ *     { "file": "pause.wav", "text": "mina pause the music", "intent": "music", "command": "MUSIC_CONTROL" }
+ *   ]
+ * "text" is the reference transcript (for WER); "intent" / "command" are optional expectations.
+ * Without a manifest every audio file in the directory is replayed with no expectations.
+ *
+ * Each utterance goes through transcription.transcribeStream -> handleUtterance (classifier, command
+ * registry, memory context) -> tts.generateSpeech. The LLM, the satellite and memory learning are
+ * stubbed; the transcriber and TTS engine are whatever .env / the environment selects.
+ */
+require('dotenv').config();
+const fs = require('fs');
+const path = require('path');
+const { PassThrough } = require('stream');
+const { performance } = require('perf_hooks');
+
+// --- Options ---
+
+function parseArgs(argv) {
+    const opts = { dir: null, concurrency: 1, realtime: false, tts: true, llmMs: 0, repeat: 1, warmup: 1, json: null };
+    for (let i = 0; i < argv.length; i++) {
+        const arg = argv[i];
+        if (arg === '--concurrency') opts.concurrency = parseInt(argv[++i], 10);
+        else if (arg === '--realtime') opts.realtime = true;
+        else if (arg === '--no-tts') opts.tts = false;
+        else if (arg === '--llm-ms') opts.llmMs = parseInt(argv[++i], 10);
+        else if (arg === '--repeat') opts.repeat = parseInt(argv[++i], 10);
+        else if (arg === '--warmup') opts.warmup = parseInt(argv[++i], 10);
+        else if (arg === '--json') opts.json = argv[++i];
+        else if (!opts.dir) opts.dir = arg;
+    }
+    return opts;
+}
+
+const opts = parseArgs(process.argv.slice(2));
+if (!opts.dir) {
+    console.error('Usage: node bench/replay.js <corpus dir> [--concurrency N] [--realtime] [--no-tts] [--llm-ms N] [--repeat N] [--warmup N] [--json out.json]');
+    process.exit(1);
+}
+
+// Repeated phrases would otherwise be served from the TTS cache after the first run
+if (!process.env.TTS_CACHE) process.env.TTS_CACHE = 'false';
+
+const transcription = require('../src/integrations/transcription');
+const pipeline = require('../src/core/pipeline/handleUtterance');
+const registry = require('../src/core/commands/registry');
+const intentClassifier = require('../src/core/nlu/classifier');
+const memory = require('../src/core/memory');
+const ai = require('../src/integrations/ai');
+const satellite = require('../src/integrations/satellite');
+const metrics = require('../src/core/metrics');
+const tts = require('../src/integrations/tts');
+const { ActionType } = require('../src/core/types');
+require('../src/features'); // Register commands
+
+// --- Stubs ---
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+ai.generateResponse = async () => {
+    if (opts.llmMs > 0) await sleep(opts.llmMs);
+    return 'This is a benchmark reply from the stubbed language model.';
+};
+memory.learnFromInteraction = async () => { };
+satellite.sendCommand = () => true;
+satellite.query = async () => ({ title: 'Benchmark Track', artist: 'Replay' });
+
+// Remember which command the registry picked, per utterance
+const findMatch = registry.findMatch.bind(registry);
+registry.findMatch = (text, context) => {
+    const match = findMatch(text, context);
+    context.benchCommand = match ? match.command.id : null;
+    return match;
+};
+
+const fakeClient = { user: { presence: { activities: [] } } };
+
+// --- Corpus ---
+
+const FRAME_BYTES = 640; // 20ms of 16kHz mono s16le, the size Discord's decoder hands us
+
+function readPcm(file) {
+    const data = fs.readFileSync(file);
+    if (path.extname(file).toLowerCase() !== '.wav') return data;
+
+    // Walk the RIFF chunks for 'fmt ' and 'data'
+    if (data.toString('ascii', 0, 4) !== 'RIFF' || data.toString('ascii', 8, 12) !== 'WAVE') {
+        throw new Error(`${file} is not a WAV file`);
+    }
+    let offset = 12;
+    let format = null;
+    while (offset + 8 <= data.length) {
+        const id = data.toString('ascii', offset, offset + 4);
+        const size = data.readUInt32LE(offset + 4);
+        const body = offset + 8;
+        if (id === 'fmt ') {
+            format = {
+                codec: data.readUInt16LE(body),
+                channels: data.readUInt16LE(body + 2),
+                rate: data.readUInt32LE(body + 4),
+                bits: data.readUInt16LE(body + 14)
+            };
+        } else if (id === 'data') {
+            if (!format || format.codec !== 1 || format.channels !== 1 || format.rate !== 16000 || format.bits !== 16) {
+                throw new Error(`${file} must be 16kHz mono 16-bit PCM (got ${JSON.stringify(format)})`);
+            }
+            return data.subarray(body, Math.min(body + size, data.length));
+        }
+        offset = body + size + (size % 2);
+    }
+    throw new Error(`${file} has no data chunk`);
+}
+
+function loadCorpus(dir) {
+    const manifestPath = path.join(dir, 'manifest.json');
+    const entries = fs.existsSync(manifestPath)
+        ? JSON.parse(fs.readFileSync(manifestPath, 'utf8'))
+        : fs.readdirSync(dir).filter((f) => /\.(wav|pcm)$/i.test(f)).sort().map((file) => ({ file }));
+    return entries.map((entry) => {
+        const pcm = readPcm(path.join(dir, entry.file));
+        return { ...entry, pcm, seconds: pcm.length / 32000 };
+    });
+}
+
+// --- Scoring ---
+
+function words(text) {
+    return (text || '').toLowerCase().replace(/[^a-z0-9' ]+/g, ' ').split(/\s+/).filter(Boolean);
+}
+
+/** Word-level edit distance between reference and hypothesis */
+function editDistance(ref, hyp) {
+    let previous = Array.from({ length: hyp.length + 1 }, (_, j) => j);
+    for (let i = 1; i <= ref.length; i++) {
+        const row = [i];
+        for (let j = 1; j <= hyp.length; j++) {
+            row[j] = Math.min(
+                previous[j] + 1,
+                row[j - 1] + 1,
+                previous[j - 1] + (ref[i - 1] === hyp[j - 1] ? 0 : 1)
+            );
+        }
+        previous = row;
+    }
+    return previous[hyp.length];
+}
+
+function percentile(values, p) {
+    if (!values.length) return null;
+    const sorted = [...values].sort((a, b) => a - b);
+    return sorted[Math.min(sorted.length - 1, Math.ceil((p / 100) * sorted.length) - 1)];
+}
+
+// --- Replay ---
+
+function transcribe(item, userId) {
+    return new Promise((resolve) => {
+        const stream = new PassThrough();
+        const finals = [];
+        let audioEnd = null;
+        transcription.transcribeStream(stream, userId, (uid, text) => finals.push(text), null, () => {
+            resolve({ text: finals.join(' '), audioEnd, done: performance.now() });
+        });
+
+        // 20ms frames, either paced like live speech or as fast as the pipe takes them
+        let offset = 0;
+        const pump = () => {
+            while (offset < item.pcm.length) {
+                stream.write(item.pcm.subarray(offset, offset + FRAME_BYTES));
+                offset += FRAME_BYTES;
+                if (opts.realtime) return setTimeout(pump, 20);
+            }
+            audioEnd = performance.now();
+            stream.end();
+        };
+        pump();
+    });
+}
+
+async function replay(item, index) {
+    const userId = `bench-${index}`;
+    const result = { file: item.file, stages: {}, error: null };
+    try {
+        const heard = await transcribe(item, userId);
+        result.transcript = heard.text;
+        result.stages.transcribe = heard.done - heard.audioEnd;
+
+        // handleUtterance marks intent / command / llm on the trace
+        const trace = metrics.startTrace({ userId });
+        trace.mark('transcript');
+        const context = {
+            userId,
+            guildId: 'bench',
+            username: 'Bench',
+            guildName: 'Bench',
+            member: null,
+            client: fakeClient,
+            currentStatus: 'Online',
+            trace
+        };
+        const plan = await pipeline.handleUtterance(heard.text, context);
+        const intentAt = trace.marks.get('intent');
+        if (intentAt !== undefined) {
+            result.stages.intent = intentAt - trace.marks.get('transcript');
+            for (const stage of ['command', 'llm']) {
+                if (trace.has(stage)) result.stages[stage] = trace.marks.get(stage) - intentAt;
+            }
+        }
+        trace.end();
+        result.command = context.benchCommand || null;
+        result.intent = intentClassifier.processTranscription(heard.text).intent || null;
+
+        let finished = performance.now();
+        const speech = plan && plan[ActionType.TTS_SPEAK];
+        if (opts.tts && speech) {
+            const ttsStart = performance.now();
+            const audio = await tts.generateSpeech(speech, { code: 'en-US' });
+            finished = performance.now();
+            result.stages.tts = finished - ttsStart;
+            if (!audio) result.error = 'TTS produced no audio';
+            else if (typeof audio === 'string') tts.disposeFile(audio);
+            else if (audio.stream) audio.stream.resume();
+        }
+        result.stages.total = finished - heard.audioEnd;
+    } catch (e) {
+        result.error = e.message;
+    }
+
+    if (item.text !== undefined) {
+        const ref = words(item.text);
+        result.refWords = ref.length;
+        result.errors = editDistance(ref, words(result.transcript));
+    }
+    return result;
+}
+
+async function runPool(items, concurrency) {
+    const results = new Array(items.length);
+    let next = 0;
+    const workers = Array.from({ length: Math.max(1, concurrency) }, async () => {
+        while (next < items.length) {
+            const index = next++;
+            results[index] = await replay(items[index], index);
+            const r = results[index];
+            const status = r.error ? `ERROR ${r.error}` : `"${r.transcript}"`;
+            console.log(`[Replay] ${r.file}: ${Math.round(r.stages.total || 0)}ms ${status}`);
+        }
+    });
+    await Promise.all(workers);
+    return results;
+}
+
+function summarize(items, results, wallMs) {
+    const stages = {};
+    for (const r of results) {
+        for (const [stage, ms] of Object.entries(r.stages)) (stages[stage] = stages[stage] || []).push(ms);
+    }
+    const latency = {};
+    for (const [stage, values] of Object.entries(stages)) {
+        latency[stage] = { n: values.length, p50: percentile(values, 50), p95: percentile(values, 95) };
+    }
+
+    const scored = results.filter((r) => r.refWords !== undefined);
+    const refWords = scored.reduce((n, r) => n + r.refWords, 0);
+    const errors = scored.reduce((n, r) => n + r.errors, 0);
+
+    const check = (field) => {
+        const expected = items.map((item, i) => [item[field], results[i][field]]).filter(([want]) => want !== undefined);
+        if (!expected.length) return null;
+        return expected.filter(([want, got]) => (want || null) === got).length / expected.length;
+    };
+
+    const audioSeconds = items.reduce((n, item) => n + item.seconds, 0);
+    return {
+        engine: transcription.ENGINE,
+        ttsEngine: opts.tts ? (process.env.TTS_ENGINE || 'gtts') : null,
+        concurrency: opts.concurrency,
+        realtime: opts.realtime,
+        utterances: results.length,
+        errors: results.filter((r) => r.error).length,
+        wallSeconds: wallMs / 1000,
+        throughput: results.length / (wallMs / 1000),
+        realtimeFactor: audioSeconds / (wallMs / 1000),
+        wer: refWords ? errors / refWords : null,
+        intentAccuracy: check('intent'),
+        commandAccuracy: check('command'),
+        latency
+    };
+}
+
+function printSummary(summary) {
+    const fmt = (ms) => (ms === null ? '-' : `${Math.round(ms)}ms`);
+    const pct = (x) => (x === null ? '-' : `${(x * 100).toFixed(1)}%`);
+    console.log('');
+    console.log(`Engine: ${summary.engine}  TTS: ${summary.ttsEngine || 'off'}  Concurrency: ${summary.concurrency}${summary.realtime ? '  (real-time pacing)' : ''}`);
+    console.log(`Utterances: ${summary.utterances} (${summary.errors} errors) in ${summary.wallSeconds.toFixed(1)}s`);
+    console.log(`Throughput: ${summary.throughput.toFixed(2)} utt/s, ${summary.realtimeFactor.toFixed(1)}x real time`);
+    console.log(`WER: ${pct(summary.wer)}  Intent: ${pct(summary.intentAccuracy)}  Command: ${pct(summary.commandAccuracy)}`);
+    console.log('');
+    console.log('Stage        n      p50      p95');
+    for (const [stage, s] of Object.entries(summary.latency)) {
+        console.log(`${stage.padEnd(10)} ${String(s.n).padStart(3)} ${fmt(s.p50).padStart(8)} ${fmt(s.p95).padStart(8)}`);
+    }
+}
+
+async function main() {
+    const corpus = loadCorpus(opts.dir);
+    if (!corpus.length) {
+        console.error(`No utterances found in ${opts.dir}`);
+        process.exit(1);
+    }
+    console.log(`[Replay] ${corpus.length} utterances from ${opts.dir}`);
+
+    // Let the resident transcriber load its model before anything is timed
+    transcription.initModel();
+    for (let i = 0; i < opts.warmup; i++) await replay(corpus[i % corpus.length], `warmup-${i}`);
+
+    const items = [];
+    for (let i = 0; i < Math.max(1, opts.repeat); i++) items.push(...corpus);
+
+    const start = performance.now();
+    const results = await runPool(items, opts.concurrency);
+    const summary = summarize(items, results, performance.now() - start);
+    printSummary(summary);
+
+    if (opts.json) {
+        fs.writeFileSync(opts.json, JSON.stringify({ summary, results }, null, 2));
+        console.log(`\nWrote ${opts.json}`);
+    }
+    process.exit(summary.errors ? 1 : 0);
+}
+
+main().catch((e) => {
+    console.error('[Replay] Failed:', e);
+    process.exit(1);
+});
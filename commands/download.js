@@ -10,7 +10,15 @@ module.exports = {
                 .setRequired(false)
                 .addChoices(
                     { name: 'Text', value: 'txt' }
-                )),
+                ))
+        .addStringOption(option =>
+            option.setName('from')
+                .setDescription('First day to include (YYYY-MM-DD), defaults to your first day (no dates: latest day only)')
+                .setRequired(false))
+        .addStringOption(option =>
+            option.setName('to')
+                .setDescription('Last day to include (YYYY-MM-DD), defaults to your latest day')
+                .setRequired(false)),
     async execute(interaction) {
         return interaction;
     },
@@ -1,5 +1,6 @@
 const { SlashCommandBuilder } = require('discord.js');
 const storage = require('../src/core/storage');
+const soundbank = require('../src/integrations/discord/soundbank');
 const fs = require('fs');
 const path = require('path');
 const https = require('https');
@@ -46,6 +47,7 @@ module.exports = {
                 fileStream.close();
                 // Save setting
                 storage.setJoinSound(targetUser.id, filePath);
+                soundbank.load(filePath, soundbank.THEME_OPTIONS); // Decode now so the first play is instant
                 interaction.editReply(`✅ **Join Sound Set!**\nWhenever **${targetUser.tag}** joins the channel, this sound will play.`);
             });
         }).on('error', (err) => {
@@ -1,5 +1,6 @@
 const { SlashCommandBuilder } = require('discord.js');
 const storage = require('../src/core/storage');
+const soundbank = require('../src/integrations/discord/soundbank');
 const path = require('path');
 const fs = require('fs');
 const https = require('https');
@@ -60,6 +61,7 @@ module.exports = {
             file.on('finish', () => {
                 file.close();
                 storage.setLeaveSound(targetUser.id, filePath);
+                soundbank.load(filePath, soundbank.THEME_OPTIONS); // Decode now so the first play is instant
                 interaction.editReply(`✅ Leave sound set for **${targetUser.username}**!`);
             });
         }).on('error', (err) => {
@@ -1,17 +1,23 @@
 require('dotenv').config();
 const fs = require('fs');
 const path = require('path');
-const { Client, Collection, Events, GatewayIntentBits, ActivityType } = require('discord.js');
+const { Client, Collection, Events, GatewayIntentBits, ActivityType, AttachmentBuilder } = require('discord.js');
 const http = require('http'); // For Socket.io
 const satelliteServer = require('./src/integrations/satellite');
 const voiceHandler = require('./src/core/voice/handler');
 const storage = require('./src/core/storage');
+const transcripts = require('./src/core/transcripts');
 const reminders = require('./src/features/reminders/store');
 const scheduler = require('./src/features/reminders/scheduler');
+const soundbank = require('./src/integrations/discord/soundbank');
+const metrics = require('./src/core/metrics');
+const persistence = require('./src/core/persistence');
 require('./src/features'); // Load all features (Commands)
 
 // Satellite Server Setup
 const server = http.createServer((req, res) => {
+    // Prometheus scrape endpoint (latency histograms, queue and cache gauges)
+    if (metrics.handleRequest(req, res)) return;
     res.writeHead(200);
     res.end('Mina Satellite Uplink Online');
 });
@@ -60,6 +66,9 @@ client.once(Events.ClientReady, c => {
     console.log(`Ready! Logged in as ${c.user.tag}`);
     c.user.setActivity('Listening for /join', { type: ActivityType.Listening });
 
+    // Decode the thinking chime and join/leave themes into memory
+    soundbank.preload(storage);
+
     // Load and schedule existing reminders
     const activeReminders = reminders.getActiveReminders();
     console.log(`[Reminders] Loading ${activeReminders.length} active reminders`);
@@ -104,18 +113,35 @@ client.on(Events.InteractionCreate, async interaction => {
                 if (left) await interaction.reply({ content: 'Left the voice channel.', ephemeral: false });
                 else await interaction.reply({ content: 'I am not in a voice channel.', ephemeral: true });
             } else if (interaction.commandName === 'download') {
-                // Handle download
+                // Handle download: stream the user's lines for the requested days from the transcript index
                 const userId = interaction.user.id;
-                const filePath = storage.getTranscriptPath(userId);
+                const from = interaction.options.getString('from');
+                const to = interaction.options.getString('to');
+
+                if ((from && !transcripts.DATE_PATTERN.test(from)) || (to && !transcripts.DATE_PATTERN.test(to))) {
+                    await interaction.reply({ content: 'Dates must look like 2024-01-31.', ephemeral: true });
+                    return;
+                }
 
-                if (filePath && fs.existsSync(filePath)) {
+                // No range given: just the most recent day with a transcript
+                let range = { from, to };
+                if (!from && !to) {
+                    const latest = transcripts.getDays(userId).pop();
+                    range = { from: latest, to: latest };
+                }
+                const found = transcripts.getDays(userId, range);
+
+                if (found.length) {
+                    const first = found[0];
+                    const last = found[found.length - 1];
+                    const name = first === last ? `transcript-${first}.txt` : `transcript-${first}-to-${last}.txt`;
                     await interaction.reply({
-                        content: 'Here is your latest transcript:',
-                        files: [filePath],
+                        content: first === last ? `Here is your transcript for ${first}:` : `Here is your transcript from ${first} to ${last}:`,
+                        files: [new AttachmentBuilder(transcripts.streamTranscript(userId, range), { name })],
                         ephemeral: true
                     });
                 } else {
-                    await interaction.reply({ content: `No transcript found for today.`, ephemeral: true });
+                    await interaction.reply({ content: `No transcript found for those days.`, ephemeral: true });
                 }
             } else {
                 await command.execute(interaction);
@@ -233,7 +259,7 @@ client.on(Events.VoiceStateUpdate, async (oldState, newState) => {
             console.log(`[Theme] Playing join sound for ${username}`);
             // Small delay to ensure connection is stable and user can hear it
             setTimeout(() => {
-                voiceHandler.playFile(guildId, joinSound, 5000, 0.5); // Max 5000ms, 0.5 Volume
+                voiceHandler.playSound(guildId, joinSound, soundbank.THEME_OPTIONS); // Max 5000ms, 0.5 Volume
             }, 2000);
         }
 
@@ -256,7 +282,7 @@ client.on(Events.VoiceStateUpdate, async (oldState, newState) => {
             console.log(`[Theme] Playing leave sound for ${username}`);
             // Play sound (max 5s, 50% volume)
             // Wait small delay to ensure Discord registers the leave visually? Not strictly necessary but safe.
-            voiceHandler.playFile(guildId, leaveSound, 5000, 0.5);
+            voiceHandler.playSound(guildId, leaveSound, soundbank.THEME_OPTIONS);
         }
 
         // Reset Status if BOT left
@@ -289,8 +315,11 @@ client.on(Events.VoiceStateUpdate, async (oldState, newState) => {
 
                 connection.once(VoiceConnectionStatus.Ready, () => {
                     const player = createAudioPlayer();
-                    const resource = createAudioResource(soundPath, { inlineVolume: true });
-                    resource.volume.setVolume(0.5);
+                    let resource = soundbank.createResource(soundPath, soundbank.THEME_OPTIONS);
+                    if (!resource) {
+                        resource = createAudioResource(soundPath, { inlineVolume: true });
+                        resource.volume.setVolume(0.5);
+                    }
                     player.play(resource);
                     connection.subscribe(player);
 
@@ -323,4 +352,14 @@ client.on(Events.VoiceStateUpdate, async (oldState, newState) => {
     }
 });
 
+// Signals skip 'exit' handlers unless we exit ourselves; exiting writes out buffered transcript
+// lines and data-store changes
+for (const signal of ['SIGINT', 'SIGTERM']) {
+    process.once(signal, () => {
+        console.log(`[Mina] ${signal} received, shutting down`);
+        persistence.shutdown();
+        process.exit(0);
+    });
+}
+
 client.login(process.env.DISCORD_TOKEN);
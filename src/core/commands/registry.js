@@ -3,6 +3,8 @@
  * Handles registration and lookup of non-LLM commands (Music, Reminders, etc.)
  */
 
+const nlu = require('../nlu/engine');
+
 class CommandRegistry {
     constructor() {
         this.commands = [];
@@ -12,11 +14,12 @@ class CommandRegistry {
      * Register a new command
      * @param {Object} command
      * @param {string} command.id - Unique ID
-     * @param {string[]} [command.patterns] - Regex patterns to match
-     * @param {Function} [command.matcher] - Custom matcher function (text, context) => boolean
+     * @param {string[]} [command.patterns] - Regex patterns to match (compiled once, here)
+     * @param {Function} [command.matcher] - Custom matcher function (text, context) => boolean; context.parse holds the NLU parse
      * @param {Function} command.execute - (text, context) => Promise<ActionPlan>
      */
     register(command) {
+        command.compiled = (command.patterns || []).map((pattern) => new RegExp(pattern, 'i'));
         this.commands.push(command);
         console.log(`[Registry] Registered command: ${command.id}`);
     }
@@ -24,18 +27,18 @@ class CommandRegistry {
     /**
      * Find a matching command for the given input
      * @param {string} text 
-     * @param {Object} context 
+     * @param {Object} context - context.parse is filled in from the NLU engine if missing
      * @returns {Object|null} Matching command or null
      */
     findMatch(text, context) {
+        if (!context.parse) context.parse = nlu.parse(text);
+
         for (const cmd of this.commands) {
             // Check Patterns
-            if (cmd.patterns) {
-                for (const pattern of cmd.patterns) {
-                    const regex = new RegExp(pattern, 'i');
-                    if (regex.test(text)) {
-                        return { command: cmd, matches: text.match(regex) };
-                    }
+            for (const regex of cmd.compiled) {
+                const matches = text.match(regex);
+                if (matches) {
+                    return { command: cmd, matches };
                 }
             }
 
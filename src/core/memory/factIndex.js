@@ -0,0 +1,104 @@
+const { normalize } = require('./nameIndex');
+
+/**
+ * BM25 inverted index over every profile's facts, so prompts can carry the facts that matter
+ * for the current query instead of whole profiles.
+ *
+ * Each fact is a document; term statistics are shared across all profiles. Profiles are
+ * re-indexed as a unit whenever their fact list changes (a profile is a few dozen short facts,
+ * so that's cheap and keeps the index exactly in step with memory.json).
+ */
+
+const K1 = 1.2;
+const B = 0.75;
+const STOPWORDS = new Set([
+    'a', 'an', 'the', 'and', 'or', 'but', 'of', 'to', 'in', 'on', 'at', 'for', 'with', 'is', 'are', 'was', 'were',
+    'be', 'been', 'has', 'have', 'had', 'do', 'does', 'did', 'i', 'me', 'my', 'you', 'your', 'he', 'she', 'it',
+    'they', 'them', 'their', 'we', 'our', 'this', 'that', 'what', 'who', 'how', 'about', 'mina', 'speaker', 'user'
+]);
+
+function tokenize(text) {
+    return normalize(text).split(' ')
+        .filter((word) => word && !STOPWORDS.has(word))
+        // Cheap plural folding: "cats" and "cat" count as the same term
+        .map((word) => (word.length > 3 && word.endsWith('s') && !word.endsWith('ss') ? word.slice(0, -1) : word));
+}
+
+class FactIndex {
+    constructor() {
+        this.docs = new Map(); // profileId -> [{ fact, position, terms: Map<term, tf>, length }]
+        this.df = new Map(); // term -> number of facts containing it
+        this.count = 0;
+        this.totalLength = 0;
+    }
+
+    /**
+     * (Re)index a profile's facts
+     * @param {string} profileId
+     * @param {string[]} facts
+     */
+    setFacts(profileId, facts) {
+        this.remove(profileId);
+        if (!facts || !facts.length) return;
+
+        const docs = facts.map((fact, position) => {
+            const terms = new Map();
+            const tokens = tokenize(fact);
+            for (const term of tokens) terms.set(term, (terms.get(term) || 0) + 1);
+            for (const term of terms.keys()) this.df.set(term, (this.df.get(term) || 0) + 1);
+            this.totalLength += tokens.length;
+            return { fact, position, terms, length: tokens.length };
+        });
+        this.count += docs.length;
+        this.docs.set(profileId, docs);
+    }
+
+    /**
+     * Drop a profile from the index
+     * @param {string} profileId
+     */
+    remove(profileId) {
+        const docs = this.docs.get(profileId);
+        if (!docs) return;
+        for (const doc of docs) {
+            for (const term of doc.terms.keys()) {
+                const df = this.df.get(term) - 1;
+                if (df > 0) this.df.set(term, df);
+                else this.df.delete(term);
+            }
+            this.totalLength -= doc.length;
+        }
+        this.count -= docs.length;
+        this.docs.delete(profileId);
+    }
+
+    /**
+     * A profile's facts ranked by BM25 against the query; ties (and an empty query) favour the
+     * most recently learned facts
+     * @param {string} profileId
+     * @param {string} query
+     * @returns {Array<{ fact: string, position: number, score: number }>}
+     */
+    rank(profileId, query) {
+        const docs = this.docs.get(profileId) || [];
+        const terms = [...new Set(tokenize(query))];
+        const avgLength = this.count ? this.totalLength / this.count : 1;
+
+        return docs.map((doc) => {
+            let score = 0;
+            for (const term of terms) {
+                const tf = doc.terms.get(term);
+                if (!tf) continue;
+                const df = this.df.get(term);
+                const idf = Math.log(1 + (this.count - df + 0.5) / (df + 0.5));
+                score += idf * (tf * (K1 + 1)) / (tf + K1 * (1 - B + B * doc.length / (avgLength || 1)));
+            }
+            return { fact: doc.fact, position: doc.position, score };
+        }).sort((a, b) => b.score - a.score || b.position - a.position);
+    }
+}
+
+module.exports = {
+    FactIndex,
+    tokenize
+};
@@ -1,31 +1,35 @@
 const fs = require('fs');
 const path = require('path');
 const ai = require('../../integrations/ai'); // Use generic AI provider for learning
+const persistence = require('../persistence');
+const { NameIndex } = require('./nameIndex');
+const { FactIndex } = require('./factIndex');
+const { LearningQueue } = require('./learningQueue');
+const metrics = require('../metrics');
 
 const MEMORY_FILE = path.join(process.cwd(), 'data', 'memory.json');
 const MEMORY_LOG_FILE = path.join(process.cwd(), 'data', 'memory.log');
-
-// Ensure data dir exists
-if (!fs.existsSync(path.join(process.cwd(), 'data'))) {
-    fs.mkdirSync(path.join(process.cwd(), 'data'));
+// Prompt budget for remembered facts (speaker, mentioned people and Mina herself together)
+const CONTEXT_TOKENS = parseInt(process.env.MEMORY_CONTEXT_TOKENS || '600', 10);
+const CONTEXT_FACTS = parseInt(process.env.MEMORY_CONTEXT_FACTS || '8', 10); // Per profile
+
+// Load memory (and replay any changes journaled since the last snapshot)
+const store = persistence.open(MEMORY_FILE, {});
+const memory = store.data;
+
+// Display names -> profiles, for spotting mentioned people in one pass over the text
+const names = new NameIndex();
+// Facts -> BM25 index, for picking the facts relevant to a query
+const factIndex = new FactIndex();
+for (const [uid, profile] of Object.entries(memory)) {
+    names.set(uid, [profile.displayName]);
+    factIndex.setFacts(uid, profile.facts);
 }
 
-let memory = {};
-
-// Load memory
-if (fs.existsSync(MEMORY_FILE)) {
-    try {
-        memory = JSON.parse(fs.readFileSync(MEMORY_FILE, 'utf8'));
-    } catch (e) {
-        console.error("Failed to load memory:", e);
-    }
-}
-
-function saveMemory() {
-    try {
-        fs.writeFileSync(MEMORY_FILE, JSON.stringify(memory, null, 2));
-    } catch (e) {
-        console.error("Failed to save memory:", e);
+// Queue the given profiles for writing; the full file is only rewritten on compaction
+function saveMemory(...userIds) {
+    for (const userId of userIds) {
+        store.set([userId], memory[userId]);
     }
 }
 
@@ -33,11 +37,9 @@ function logToMemoryFile(header, details) {
     const timestamp = new Date().toISOString();
     const entry = `[${timestamp}] === ${header} ===\n${details}\n${'-'.repeat(40)}\n`;
 
-    try {
-        fs.appendFileSync(MEMORY_LOG_FILE, entry, 'utf8');
-    } catch (e) {
-        console.error("Failed to write to memory log:", e);
-    }
+    fs.appendFile(MEMORY_LOG_FILE, entry, 'utf8', (err) => {
+        if (err) console.error("Failed to write to memory log:", err);
+    });
 }
 
 // Get raw profile object
@@ -58,43 +60,73 @@ function findRelevantProfiles(text, excludeUserId) {
     const mentions = [];
     if (!text) return mentions;
 
-    text = text.toLowerCase();
+    for (const uid of names.match(text)) {
+        if (uid === excludeUserId || !memory[uid]) continue; // Skip speaker
+
+        const profile = memory[uid];
+        mentions.push({
+            uid: uid,
+            name: profile.displayName,
+            facts: profile.facts
+        });
+    }
+    return mentions;
+}
 
-    for (const [uid, profile] of Object.entries(memory)) {
-        if (uid === excludeUserId) continue; // Skip speaker
+// Rough token count for budgeting (~4 characters per token)
+function estimateTokens(text) {
+    return Math.ceil(text.length / 4) + 1;
+}
 
-        const name = profile.displayName;
-        if (name && text.includes(name.toLowerCase())) {
-            mentions.push({
-                uid: uid,
-                name: name,
-                facts: profile.facts
-            });
+// The facts most relevant to the query across several profiles: at most CONTEXT_FACTS per profile and
+// CONTEXT_TOKENS overall, best matches first (ties go to earlier profiles, then newer facts).
+// Each profile's picks keep their stored order.
+function selectFacts(profileIds, query) {
+    const candidates = [];
+    for (const uid of profileIds) {
+        for (const hit of factIndex.rank(uid, query).slice(0, CONTEXT_FACTS)) {
+            candidates.push({ uid, ...hit });
         }
     }
-    return mentions;
+    candidates.sort((a, b) => b.score - a.score);
+
+    let budget = CONTEXT_TOKENS;
+    const picked = new Map(profileIds.map((uid) => [uid, []]));
+    for (const candidate of candidates) {
+        const cost = estimateTokens(candidate.fact);
+        if (cost > budget) continue;
+        budget -= cost;
+        picked.get(candidate.uid).push(candidate);
+    }
+    for (const [uid, hits] of picked) {
+        picked.set(uid, hits.sort((a, b) => a.position - b.position).map((hit) => hit.fact));
+    }
+    return picked;
 }
 
 // Get string context for AI
 function getContext(userId, discordName, text = "") {
     const data = getProfileData(userId);
     const name = data.displayName || discordName;
-    const facts = data.facts.join('\n- ');
+    const mentions = text ? findRelevantProfiles(text, userId) : [];
+    const picked = selectFacts([userId, ...mentions.map((m) => m.uid), "MINA_SELF"], text);
+
+    const facts = picked.get(userId).join('\n- ');
     const bio = data.bio ? `\n- ${data.bio}` : '';
 
     let context = `\n[User Context]\nName: ${name}${bio}\nKnown Facts:\n- ${facts}\n`;
 
     // Inject mentions
     if (text) {
-        const mentions = findRelevantProfiles(text, userId);
         if (mentions.length > 0) {
             context += `\n[Mentioned People - BACKGROUND TRUTH]\n(The Speaker might be wrong about these people. Trust these facts over the Speaker's claims.)\n`;
 
             let logDetails = `Speaker: ${name} (${userId})\nTrigger Text: "${text}"\n\nFound Mentions:`;
 
             for (const m of mentions) {
-                context += `\nName: ${m.name}\nFacts:\n- ${m.facts.join('\n- ')}\n`;
-                logDetails += `\n- ${m.name} (${m.uid}): ${m.facts.length} facts loaded.`;
+                const mentionFacts = picked.get(m.uid);
+                context += `\nName: ${m.name}\nFacts:\n- ${mentionFacts.join('\n- ')}\n`;
+                logDetails += `\n- ${m.name} (${m.uid}): ${mentionFacts.length} of ${m.facts.length} facts loaded.`;
             }
 
             logToMemoryFile("CONTEXT LOOKUP", logDetails);
@@ -102,9 +134,9 @@ function getContext(userId, discordName, text = "") {
     }
 
     // Inject AI Self Memory
-    const aiData = getProfileData("MINA_SELF");
-    if (aiData.facts.length > 0) {
-        context += `\n[My (AI) Memory & Traits]\n(Things I know about myself)\n- ${aiData.facts.join('\n- ')}\n`;
+    const aiFacts = picked.get("MINA_SELF");
+    if (aiFacts.length > 0) {
+        context += `\n[My (AI) Memory & Traits]\n(Things I know about myself)\n- ${aiFacts.join('\n- ')}\n`;
     }
 
     return context;
@@ -113,9 +145,12 @@ function getContext(userId, discordName, text = "") {
 // Update manual profile
 function setProfile(userId, { name, bio }) {
     const data = getProfileData(userId);
-    if (name !== undefined) data.displayName = name;
+    if (name !== undefined) {
+        data.displayName = name;
+        names.set(userId, [name]);
+    }
     if (bio !== undefined) data.bio = bio;
-    saveMemory();
+    saveMemory(userId);
     logToMemoryFile("MANUAL UPDATE", `User ${userId} updated profile.\nName: ${name}\nBio: ${bio}`);
 }
 
@@ -124,45 +159,52 @@ function addFact(userId, fact) {
     const data = getProfileData(userId);
     if (!data.facts.includes(fact)) {
         data.facts.push(fact);
-        saveMemory();
+        factIndex.setFacts(userId, data.facts);
+        saveMemory(userId);
         return true;
     }
     return false;
 }
 
 function clearProfile(userId) {
-    delete memory[userId];
-    saveMemory();
+    store.delete([userId]);
+    names.remove(userId);
+    factIndex.remove(userId);
+    learning.cancel(userId);
     logToMemoryFile("PROFILE CLEARED", `User ${userId} cleared their profile.`);
 }
 
-// AI Extraction Logic
-async function learnFromInteraction(userId, userQuery, aiResponse) {
-    // We run this in background
-    try {
-        const profile = getProfileData(userId);
-        const existingFacts = profile.facts;
-        // Map to indexed list for deletion logic
-        const joinedFacts = existingFacts.map((f, i) => `[${i}] ${f}`).join("\n");
-        const knownName = profile.displayName ? `Known Name: ${profile.displayName}` : "Name unknown";
-
-        // AI Self Profile
-        const aiProfile = getProfileData("MINA_SELF");
-        const aiFacts = aiProfile.facts;
-        const joinedAiFacts = aiFacts.map((f, i) => `[${i}] ${f}`).join("\n");
-
-        // Find mentions for Truth Context
-        const mentions = findRelevantProfiles(userQuery, userId);
-        let truthContext = "";
-        if (mentions.length > 0) {
-            truthContext = "\n[Mentioned People (TRUTH)]\n";
-            for (const m of mentions) {
-                truthContext += `${m.name}: ${m.facts.join(", ")}\n`;
-            }
+// AI Extraction Logic: one LLM call covering a batch of a user's turns (see learningQueue.js)
+async function extractFromTurns(userId, turns) {
+    const profile = getProfileData(userId);
+    // Snapshot the lists the prompt's indices refer to; facts may change while the LLM thinks
+    const existingFacts = [...profile.facts];
+    // Map to indexed list for deletion logic
+    const joinedFacts = existingFacts.map((f, i) => `[${i}] ${f}`).join("\n");
+    const knownName = profile.displayName ? `Known Name: ${profile.displayName}` : "Name unknown";
+
+    // AI Self Profile
+    const aiProfile = getProfileData("MINA_SELF");
+    const aiFacts = [...aiProfile.facts];
+    const joinedAiFacts = aiFacts.map((f, i) => `[${i}] ${f}`).join("\n");
+
+    // Find mentions for Truth Context
+    const mentioned = new Map();
+    for (const turn of turns) {
+        for (const m of findRelevantProfiles(turn.query, userId)) mentioned.set(m.uid, m);
+    }
+    let truthContext = "";
+    if (mentioned.size > 0) {
+        truthContext = "\n[Mentioned People (TRUTH)]\n";
+        for (const m of mentioned.values()) {
+            truthContext += `${m.name}: ${m.facts.join(", ")}\n`;
         }
+    }
 
-        const extractionPrompt = `
-Analyze the interaction between User (Speaker) and AI (Mina).
+    const conversation = turns.map((t) => `User: "${t.query}"\nAI: "${t.response}"`).join("\n\n");
+
+    const extractionPrompt = `
+Analyze the conversation between User (Speaker) and AI (Mina).
 Update the Speaker's memory profile AND the AI's internal self-memory.
 
 [Speaker Profile]
@@ -215,84 +257,103 @@ ${truthContext}
   }
 }
 
-User: "${userQuery}"
-AI: "${aiResponse}"
+[Conversation] (oldest first)
+${conversation}
 `;
 
-        let output = await ai.generateResponse(extractionPrompt);
+    let output = await ai.generateResponse(extractionPrompt);
 
-        // Clean up code blocks if present
-        output = output.replace(/```json/g, '').replace(/```/g, '').trim();
+    // Clean up code blocks if present
+    output = output.replace(/```json/g, '').replace(/```/g, '').trim();
 
-        let updates;
-        try {
-            updates = JSON.parse(output);
-        } catch (e) {
-            return;
+    let updates;
+    try {
+        updates = JSON.parse(output);
+    } catch (e) {
+        return;
+    }
+    if (!updates) return;
+
+    let logMsg = `User: ${knownName} (${userId})\nQueries:\n${turns.map((t) => `"${t.query}"`).join("\n")}`;
+
+    // Helper to process updates. Removal indices refer to the snapshot the prompt showed, so they
+    // are resolved to fact text first; everything below runs synchronously, so the batch lands as
+    // a unit against the current lists.
+    const applyUpdates = (targetProfile, shownFacts, ops, typeName) => {
+        let localChanged = false;
+        if (!ops) return false;
+
+        // Removals
+        if (ops.remove && Array.isArray(ops.remove)) {
+            const removals = new Set(ops.remove
+                .filter((index) => Number.isInteger(index) && index >= 0 && index < shownFacts.length)
+                .map((index) => shownFacts[index]));
+            for (const fact of removals) {
+                const index = targetProfile.facts.indexOf(fact);
+                if (index > -1) {
+                    targetProfile.facts.splice(index, 1);
+                    console.log(`[Memory] Removed (${typeName}): "${fact}"`);
+                    logMsg += `\nREMOVED (${typeName}): "${fact}"`;
+                    localChanged = true;
+                }
+            }
         }
 
-        if (updates) {
-            let changed = false;
-            let logMsg = `User: ${knownName} (${userId})\nQuery: "${userQuery}"`;
-
-            // Helper to process updates
-            const applyUpdates = (targetProfile, ops, typeName) => {
-                let localChanged = false;
-                if (!ops) return false;
-
-                // Removals (Desc Sort)
-                if (ops.remove && Array.isArray(ops.remove)) {
-                    const indices = ops.remove.sort((a, b) => b - a);
-                    for (const index of indices) {
-                        if (index >= 0 && index < targetProfile.facts.length) {
-                            const removed = targetProfile.facts.splice(index, 1);
-                            console.log(`[Memory] Removed (${typeName}): "${removed}"`);
-                            logMsg += `\nREMOVED (${typeName}): "${removed}"`;
-                            localChanged = true;
-                        }
-                    }
+        // Additions
+        if (ops.add && Array.isArray(ops.add)) {
+            for (let fact of ops.add) {
+                if (typeof fact !== 'string') continue;
+                let cleanFact = fact.trim();
+                // Clean "User says" prefixes if sticking to user profile logic
+                if (cleanFact.length > 0) {
+                    cleanFact = cleanFact.charAt(0).toUpperCase() + cleanFact.slice(1);
                 }
 
-                // Additions
-                if (ops.add && Array.isArray(ops.add)) {
-                    for (let fact of ops.add) {
-                        let cleanFact = fact.trim();
-                        // Clean "User says" prefixes if sticking to user profile logic
-                        if (cleanFact.length > 0) {
-                            cleanFact = cleanFact.charAt(0).toUpperCase() + cleanFact.slice(1);
-                        }
-
-                        if (cleanFact.length > 3 && cleanFact.length < 150) {
-                            if (!targetProfile.facts.includes(cleanFact)) {
-                                targetProfile.facts.push(cleanFact);
-                                console.log(`[Memory] Learned (${typeName}): "${cleanFact}"`);
-                                logMsg += `\nADDED (${typeName}): "${cleanFact}"`;
-                                localChanged = true;
-                            }
-                        }
+                if (cleanFact.length > 3 && cleanFact.length < 150) {
+                    if (!targetProfile.facts.includes(cleanFact)) {
+                        targetProfile.facts.push(cleanFact);
+                        console.log(`[Memory] Learned (${typeName}): "${cleanFact}"`);
+                        logMsg += `\nADDED (${typeName}): "${cleanFact}"`;
+                        localChanged = true;
                     }
                 }
-                return localChanged;
-            };
-
-            // Apply to Speaker
-            if (applyUpdates(profile, updates.speaker, "Speaker")) changed = true;
-
-            // Apply to Self
-            if (applyUpdates(aiProfile, updates.self, "AI")) changed = true;
-
-            // Save after batch update
-            if (changed) {
-                saveMemory();
-                logToMemoryFile("MEMORY UPDATE", logMsg);
             }
         }
-
-    } catch (e) {
-        console.error("Memory extraction failed:", e);
+        return localChanged;
+    };
+
+    // Apply to Speaker and Self, unless the profile was cleared while the LLM was busy
+    if (memory[userId] !== profile) return;
+    const speaker = profile;
+    const self = getProfileData("MINA_SELF");
+    const speakerChanged = applyUpdates(speaker, existingFacts, updates.speaker, "Speaker");
+    const selfChanged = applyUpdates(self, aiFacts, updates.self, "AI");
+
+    // Save after batch update
+    if (speakerChanged || selfChanged) {
+        factIndex.setFacts(userId, speaker.facts);
+        factIndex.setFacts("MINA_SELF", self.facts);
+        saveMemory(userId, "MINA_SELF");
+        logToMemoryFile("MEMORY UPDATE", logMsg);
     }
 }
 
+// Turns are batched per user and extracted in the background
+const learning = new LearningQueue(extractFromTurns);
+
+metrics.registerCollector(() => {
+    metrics.setGauge('mina_memory_learning_pending_turns', learning.size(), {}, 'Turns waiting for memory extraction');
+    metrics.setCounter('mina_memory_learning_batches_total', learning.stats.batches, {}, 'Memory extraction LLM calls');
+    metrics.setCounter('mina_memory_learning_turns_total', learning.stats.turns, {}, 'Turns queued for memory extraction');
+    metrics.setCounter('mina_memory_learning_dropped_turns_total', learning.stats.dropped, {},
+        'Turns dropped unextracted because the learning backlog was full');
+});
+
+// Queue an exchange for memory extraction
+function learnFromInteraction(userId, userQuery, aiResponse) {
+    learning.add(userId, userQuery, aiResponse);
+}
+
 module.exports = {
     getProfileData,
     getContext,
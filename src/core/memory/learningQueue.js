@@ -0,0 +1,132 @@
+/**
+ * Batches memory extraction: instead of one extraction LLM call per reply, each user's turns
+ * are collected until they go quiet for WINDOW_MS (or MAX_TURNS pile up, or MAX_WAIT_MS passes
+ * since the first one) and then extracted in a single call. Across all users at most
+ * CONCURRENCY extractions run at once and at most PER_MINUTE start in any minute, so memory
+ * learning can't crowd the chat requests off the LLM rate limits. Batches waiting for their turn
+ * are capped at MAX_READY; past that the oldest are dropped (and counted) rather than extracted late.
+ */
+
+const WINDOW_MS = parseInt(process.env.MEMORY_LEARN_WINDOW_MS || '45000', 10);
+const MAX_WAIT_MS = parseInt(process.env.MEMORY_LEARN_MAX_WAIT_MS || '180000', 10);
+const MAX_TURNS = parseInt(process.env.MEMORY_LEARN_MAX_TURNS || '12', 10);
+const CONCURRENCY = parseInt(process.env.MEMORY_LEARN_CONCURRENCY || '1', 10);
+const PER_MINUTE = parseInt(process.env.MEMORY_LEARN_PER_MINUTE || '4', 10);
+const MAX_READY = parseInt(process.env.MEMORY_LEARN_MAX_READY || '32', 10);
+
+class LearningQueue {
+    /**
+     * @param {(userId: string, turns: Array<{ query: string, response: string }>) => Promise<void>} extract
+     */
+    constructor(extract) {
+        this.extract = extract;
+        this.pending = new Map(); // userId -> { turns, firstAt, timer }, the batch still collecting
+        this.ready = []; // { userId, turns } batches that are due, FIFO
+        this.running = new Set(); // userIds being extracted
+        this.starts = []; // Start times within the last minute
+        this.retryTimer = null;
+        this.stats = { turns: 0, batches: 0, dropped: 0 };
+    }
+
+    /**
+     * Queue one exchange for extraction
+     * @param {string} userId
+     * @param {string} query
+     * @param {string} response
+     */
+    add(userId, query, response) {
+        let batch = this.pending.get(userId);
+        if (!batch) {
+            batch = { turns: [], firstAt: Date.now(), timer: null };
+            this.pending.set(userId, batch);
+        }
+        batch.turns.push({ query, response });
+        this.stats.turns++;
+
+        clearTimeout(batch.timer);
+        const wait = Math.min(WINDOW_MS, batch.firstAt + MAX_WAIT_MS - Date.now());
+        if (batch.turns.length >= MAX_TURNS || wait <= 0) this.due(userId);
+        else batch.timer = setTimeout(() => this.due(userId), wait);
+    }
+
+    due(userId) {
+        const batch = this.pending.get(userId);
+        if (!batch) return;
+        clearTimeout(batch.timer);
+        this.pending.delete(userId);
+
+        // Top up the user's batch that's already waiting, so a busy user doesn't queue one batch
+        // per window; no extraction call ever carries more than MAX_TURNS
+        const turns = batch.turns;
+        const waiting = this.ready.findLast((entry) => entry.userId === userId);
+        if (waiting) waiting.turns.push(...turns.splice(0, Math.max(0, MAX_TURNS - waiting.turns.length)));
+        if (turns.length) this.ready.push({ userId, turns });
+
+        while (this.ready.length > MAX_READY) {
+            const dropped = this.ready.shift();
+            this.stats.dropped += dropped.turns.length;
+            console.warn(`[Memory] Learning backlog full, dropped ${dropped.turns.length} turns for ${dropped.userId}`);
+        }
+        this.pump();
+    }
+
+    pump() {
+        clearTimeout(this.retryTimer);
+        this.retryTimer = null;
+        const now = Date.now();
+        this.starts = this.starts.filter((at) => now - at < 60000);
+
+        for (let i = 0; i < this.ready.length && this.running.size < CONCURRENCY;) {
+            if (this.starts.length >= PER_MINUTE) {
+                // Out of budget: try again when the oldest start leaves the window
+                this.retryTimer = setTimeout(() => this.pump(), this.starts[0] + 60000 - now + 10);
+                return;
+            }
+            if (this.running.has(this.ready[i].userId)) {
+                i++; // One extraction per user at a time; the next batch waits its turn
+                continue;
+            }
+            this.start(this.ready.splice(i, 1)[0]);
+        }
+    }
+
+    start({ userId, turns }) {
+        this.running.add(userId);
+        this.starts.push(Date.now());
+        this.stats.batches++;
+
+        Promise.resolve()
+            .then(() => this.extract(userId, turns))
+            .catch((e) => console.error("Memory extraction failed:", e))
+            .finally(() => {
+                this.running.delete(userId);
+                this.pump();
+            });
+    }
+
+    /**
+     * Forget a user's turns that haven't been extracted yet
+     * @param {string} userId
+     */
+    cancel(userId) {
+        const batch = this.pending.get(userId);
+        if (batch) clearTimeout(batch.timer);
+        this.pending.delete(userId);
+        this.ready = this.ready.filter((batch) => batch.userId !== userId);
+    }
+
+    /**
+     * Turns waiting for extraction
+     * @returns {number}
+     */
+    size() {
+        let turns = 0;
+        for (const batch of this.pending.values()) turns += batch.turns.length;
+        for (const batch of this.ready) turns += batch.turns.length;
+        return turns;
+    }
+}
+
+module.exports = {
+    LearningQueue
+};
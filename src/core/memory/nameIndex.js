@@ -0,0 +1,108 @@
+/**
+ * Multi-pattern name matcher (Aho-Corasick) for finding which known people an utterance mentions.
+ *
+ * Names and text are normalized the same way (lowercase, accents and punctuation stripped,
+ * single spaces) and padded with a space on each side, so every match falls on word
+ * boundaries: "Al" matches "ask al about it" but not "also". The automaton is rebuilt lazily,
+ * on the first lookup after a name changes, so a lookup is one pass over the text no matter
+ * how many profiles exist.
+ */
+
+function normalize(text) {
+    return (text || '')
+        .normalize('NFKD')
+        .replace(/[\u0300-\u036f]/g, '')
+        .toLowerCase()
+        .replace(/[^\p{L}\p{N}]+/gu, ' ')
+        .trim();
+}
+
+class NameIndex {
+    constructor() {
+        this.names = new Map(); // id -> normalized names
+        this.dirty = true;
+        this.automaton = null;
+    }
+
+    /**
+     * Set the names (display name, aliases) a profile can be mentioned by
+     * @param {string} id
+     * @param {Array<string|null>} names
+     */
+    set(id, names) {
+        const normalized = [...new Set(names.map(normalize).filter(Boolean))];
+        if (normalized.length) this.names.set(id, normalized);
+        else this.names.delete(id);
+        this.dirty = true;
+    }
+
+    /**
+     * @param {string} id
+     */
+    remove(id) {
+        if (this.names.delete(id)) this.dirty = true;
+    }
+
+    build() {
+        // Trie over ' name ' patterns; out[node] lists the ids whose pattern ends at that node
+        const next = [new Map()];
+        const out = [[]];
+        for (const [id, names] of this.names) {
+            for (const name of names) {
+                let node = 0;
+                for (const ch of ` ${name} `) {
+                    let child = next[node].get(ch);
+                    if (child === undefined) {
+                        child = next.length;
+                        next.push(new Map());
+                        out.push([]);
+                        next[node].set(ch, child);
+                    }
+                    node = child;
+                }
+                out[node].push(id);
+            }
+        }
+
+        // Failure links, breadth first; each node inherits the matches of its failure target
+        const fail = new Array(next.length).fill(0);
+        const queue = [...next[0].values()];
+        for (let head = 0; head < queue.length; head++) {
+            const node = queue[head];
+            for (const [ch, child] of next[node]) {
+                let f = fail[node];
+                while (f && !next[f].has(ch)) f = fail[f];
+                const target = next[f].get(ch);
+                fail[child] = target !== undefined && target !== child ? target : 0;
+                if (out[fail[child]].length) out[child] = out[child].concat(out[fail[child]]);
+                queue.push(child);
+            }
+        }
+
+        this.automaton = { next, fail, out };
+        this.dirty = false;
+    }
+
+    /**
+     * Ids of every profile mentioned in the text, in order of first mention
+     * @param {string} text
+     * @returns {string[]}
+     */
+    match(text) {
+        if (this.dirty) this.build();
+        const { next, fail, out } = this.automaton;
+        const found = new Set();
+        let node = 0;
+        for (const ch of ` ${normalize(text)} `) {
+            while (node && !next[node].has(ch)) node = fail[node];
+            node = next[node].get(ch) || 0;
+            for (const id of out[node]) found.add(id);
+        }
+        return [...found];
+    }
+}
+
+module.exports = {
+    NameIndex,
+    normalize
+};
@@ -0,0 +1,217 @@
+const { performance } = require('perf_hooks');
+
+// Per-utterance tracing and Prometheus metrics (served at /metrics on the satellite HTTP server).
+// A trace follows one utterance from the end of speech to the first TTS audio; every stage it
+// reaches is timed against the stage before it and recorded in mina_stage_seconds.
+
+// Stages in pipeline order
+const STAGES = ['speech_end', 'transcriber_start', 'transcript', 'intent', 'command', 'llm', 'tts', 'playback'];
+// Seconds; covers everything from a cached clip to a slow LLM round trip
+const DEFAULT_BUCKETS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32];
+
+const histograms = new Map(); // name -> { help, buckets, series: Map<labelKey, { labels, counts, sum, count }> }
+const gauges = new Map(); // name -> { type: 'gauge'|'counter', help, series: Map<labelKey, { labels, value }> }
+const collectors = []; // () => void, refresh gauges and counters right before a scrape
+let traceSeq = 0;
+
+function labelKey(labels) {
+    return Object.keys(labels).sort().map((k) => `${k}="${String(labels[k]).replace(/["\\\n]/g, '_')}"`).join(',');
+}
+
+/**
+ * Record one observation (in seconds) in a histogram, creating it on first use
+ * @param {string} name
+ * @param {number} value
+ * @param {Object} [labels]
+ * @param {string} [help]
+ */
+function observe(name, value, labels = {}, help = '') {
+    let histogram = histograms.get(name);
+    if (!histogram) {
+        histogram = { help, buckets: DEFAULT_BUCKETS, series: new Map() };
+        histograms.set(name, histogram);
+    }
+    const key = labelKey(labels);
+    let series = histogram.series.get(key);
+    if (!series) {
+        series = { labels: key, counts: new Array(histogram.buckets.length).fill(0), sum: 0, count: 0 };
+        histogram.series.set(key, series);
+    }
+    for (let i = 0; i < histogram.buckets.length; i++) {
+        if (value <= histogram.buckets[i]) series.counts[i]++;
+    }
+    series.sum += value;
+    series.count++;
+}
+
+function setValue(type, name, value, labels, help) {
+    let gauge = gauges.get(name);
+    if (!gauge) {
+        gauge = { type, help, series: new Map() };
+        gauges.set(name, gauge);
+    }
+    const key = labelKey(labels);
+    gauge.series.set(key, { labels: key, value });
+}
+
+/**
+ * Set a gauge to its current value
+ * @param {string} name
+ * @param {number} value
+ * @param {Object} [labels]
+ * @param {string} [help]
+ */
+function setGauge(name, value, labels = {}, help = '') {
+    setValue('gauge', name, value, labels, help);
+}
+
+/**
+ * Publish a running total kept elsewhere (only ever goes up; name it *_total) as a counter,
+ * so rate() and increase() work on it
+ * @param {string} name
+ * @param {number} value
+ * @param {Object} [labels]
+ * @param {string} [help]
+ */
+function setCounter(name, value, labels = {}, help = '') {
+    setValue('counter', name, value, labels, help);
+}
+
+/**
+ * Run `fn` before every scrape, e.g. to copy a module's stats into gauges and counters
+ * @param {Function} fn
+ */
+function registerCollector(fn) {
+    collectors.push(fn);
+}
+
+function withLabels(labels, extra) {
+    const all = [labels, extra].filter(Boolean).join(',');
+    return all ? `{${all}}` : '';
+}
+
+/**
+ * Everything in Prometheus text exposition format
+ * @returns {string}
+ */
+function render() {
+    for (const fn of collectors) {
+        try {
+            fn();
+        } catch (e) {
+            console.error('[Metrics] Collector failed:', e);
+        }
+    }
+
+    const lines = [];
+    for (const [name, gauge] of gauges) {
+        if (gauge.help) lines.push(`# HELP ${name} ${gauge.help}`);
+        lines.push(`# TYPE ${name} ${gauge.type}`);
+        for (const series of gauge.series.values()) {
+            lines.push(`${name}${withLabels(series.labels)} ${series.value}`);
+        }
+    }
+    for (const [name, histogram] of histograms) {
+        if (histogram.help) lines.push(`# HELP ${name} ${histogram.help}`);
+        lines.push(`# TYPE ${name} histogram`);
+        for (const series of histogram.series.values()) {
+            histogram.buckets.forEach((bound, i) => {
+                lines.push(`${name}_bucket${withLabels(series.labels, `le="${bound}"`)} ${series.counts[i]}`);
+            });
+            lines.push(`${name}_bucket${withLabels(series.labels, 'le="+Inf"')} ${series.count}`);
+            lines.push(`${name}_sum${withLabels(series.labels)} ${series.sum}`);
+            lines.push(`${name}_count${withLabels(series.labels)} ${series.count}`);
+        }
+    }
+    return lines.join('\n') + '\n';
+}
+
+/**
+ * HTTP handler for GET /metrics. Returns false if the request is for something else.
+ * @param {import('http').IncomingMessage} req
+ * @param {import('http').ServerResponse} res
+ */
+function handleRequest(req, res) {
+    if (req.method !== 'GET' || req.url.split('?')[0] !== '/metrics') return false;
+    res.writeHead(200, { 'Content-Type': 'text/plain; version=0.0.4; charset=utf-8' });
+    res.end(render());
+    return true;
+}
+
+// --- Tracing ---
+
+class Trace {
+    constructor(meta = {}) {
+        this.id = `${Date.now().toString(36)}-${(++traceSeq).toString(36)}`;
+        this.meta = meta;
+        this.marks = new Map(); // stage -> performance.now()
+        this.ended = false;
+    }
+
+    /**
+     * Record when a stage was reached (only the first time)
+     * @param {string} stage - one of STAGES
+     */
+    mark(stage) {
+        if (this.ended || this.marks.has(stage)) return;
+        this.marks.set(stage, performance.now());
+        if (stage === 'playback') this.end();
+    }
+
+    has(stage) {
+        return this.marks.has(stage);
+    }
+
+    /**
+     * Record stage durations and log a summary. Idempotent.
+     */
+    end() {
+        if (this.ended) return;
+        this.ended = true;
+
+        // Each stage is timed from whichever stage was reached just before it
+        const reached = STAGES.filter((stage) => this.marks.has(stage))
+            .map((stage) => [stage, this.marks.get(stage)])
+            .sort((a, b) => a[1] - b[1]);
+        const parts = [];
+        for (let i = 1; i < reached.length; i++) {
+            const [stage, at] = reached[i];
+            const ms = at - reached[i - 1][1];
+            observe('mina_stage_seconds', ms / 1000, { stage }, 'Time from the previous stage to this one, per utterance');
+            parts.push(`${stage} +${Math.round(ms)}ms`);
+        }
+
+        const spoke = this.marks.get('speech_end');
+        const played = this.marks.get('playback');
+        if (spoke !== undefined && played !== undefined && played > spoke) {
+            observe('mina_response_seconds', (played - spoke) / 1000, {}, 'End of speech to first TTS audio');
+            parts.push(`total ${Math.round(played - spoke)}ms`);
+        }
+
+        // Utterances that weren't addressed to Mina only get metrics, not a log line
+        if (this.marks.has('command') || this.marks.has('llm') || this.marks.has('playback')) {
+            console.log(`[Trace ${this.id}] ${parts.join(', ')}`);
+        }
+    }
+}
+
+/**
+ * Start tracing an utterance
+ * @param {Object} [meta] - e.g. { userId, guildId }
+ * @returns {Trace}
+ */
+function startTrace(meta) {
+    return new Trace(meta);
+}
+
+module.exports = {
+    STAGES,
+    Trace,
+    startTrace,
+    observe,
+    setGauge,
+    setCounter,
+    registerCollector,
+    render,
+    handleRequest
+};
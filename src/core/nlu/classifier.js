@@ -29,6 +29,28 @@ const MEDIA_INFO_PATTERNS = [
     /what'?s? this (song|track|music|playing)/i
 ];
 
+// Common mis-hearings of "Mina" that normalizeWakeWord maps back to the wake word.
+// Also used to build the transcriber's wake-word spotting grammar.
+const WAKE_WORD_VARIANTS = ['meena', 'nina', 'mena', 'minae', 'mean a', 'mean up', 'meet up', 'meaner'];
+
+/**
+ * Every phrase that counts as the wake word: the configured trigger words plus the mis-hearings
+ * above. This is the list the transcription workers get as MINA_WAKE_WORDS.
+ * @returns {string[]}
+ */
+function getWakePhrases() {
+    return [...new Set([...storage.getTriggerWords(), ...WAKE_WORD_VARIANTS])];
+}
+
+// Wake-word normalization patterns, compiled once; alternations stand in for the chains of
+// replace() calls they came from (each alternative can only match where the others didn't)
+const MUSIC_COMMAND = /\b(pause|play|stop|skip|next|previous|prev)\b/i;
+const CONVERSATIONAL_MEAN = /^(I\s+)?mean[,\s]/i;
+const MISHEARD_WAKE_COMMAND = /^(?:mean[\s-]*a|mean[\s-]*up|meet[\s-]*up|meaner)\s+(pause|play|stop|skip|next|previous|prev)/gi;
+const WAKE_PAUSE = /\b(mina|meena|nina|mena|minae)\s*(paus|paz)\b/gi;
+const WAKE_VARIANT = /\b(?:meena|nina|mena|minae)\b/gi;
+const PAUSE_MISSPELLING = /\b(?:paz|paus)\b/gi;
+
 // Question indicators (more likely to be AI chat)
 const QUESTION_INDICATORS = [
     'how', 'what', 'when', 'where', 'why', 'who', 'which',
@@ -46,16 +68,16 @@ function normalizeWakeWord(text) {
 
     // STEP 0: Protect conversational "mean" patterns from normalization
     // If text starts with "I mean" or "mean," (conversational), don't normalize it
-    if (/^(I\s+)?mean[,\s]/i.test(normalized.trim())) {
+    if (CONVERSATIONAL_MEAN.test(normalized.trim())) {
         // Check if there's a music command later - only normalize if there is
-        if (!/\b(pause|play|stop|skip|next|previous|prev)\b/i.test(normalized)) {
+        if (!MUSIC_COMMAND.test(normalized)) {
             return normalized;  // Keep as-is, it's conversational
         }
         // If there IS a command, we still need to be careful
         // Only normalize if the command is within the first few words after "mean"
         const afterMean = normalized.replace(/^(I\s+)?mean[,\s]*/i, '').trim();
         const firstWords = afterMean.split(/\s+/).slice(0, 3).join(' ');
-        if (!/\b(pause|play|stop|skip|next|previous|prev)\b/i.test(firstWords)) {
+        if (!MUSIC_COMMAND.test(firstWords)) {
             return normalized;  // Command too far away, keep as-is
         }
     }
@@ -68,24 +90,17 @@ function normalizeWakeWord(text) {
     // STEP 2: Handle specific transcription errors ONLY when followed by music commands
     // This prevents "I mean, listen..." from being normalized
     // Order matters: do these BEFORE the general replacements
-    normalized = normalized.replace(/^mean[\s-]*a\s+(pause|play|stop|skip|next|previous|prev)/gi, 'Mina $1');
-    normalized = normalized.replace(/^mean[\s-]*up\s+(pause|play|stop|skip|next|previous|prev)/gi, 'Mina $1');
-    normalized = normalized.replace(/^meet[\s-]*up\s+(pause|play|stop|skip|next|previous|prev)/gi, 'Mina $1');
-    normalized = normalized.replace(/^meaner\s+(pause|play|stop|skip|next|previous|prev)/gi, 'Mina $1');
+    normalized = normalized.replace(MISHEARD_WAKE_COMMAND, 'Mina $1');
 
     // STEP 3: Handle "Mina/variation + Paus/Paz" -> "Mina pause"
     // Do this BEFORE general variation replacement
-    normalized = normalized.replace(/\b(mina|meena|nina|mena|minae)\s*(paus|paz)\b/gi, 'Mina pause');
+    normalized = normalized.replace(WAKE_PAUSE, 'Mina pause');
 
     // STEP 4: Replace general wake word variations (but NOT "mean" alone)
-    normalized = normalized.replace(/\bmeena\b/gi, 'Mina');
-    normalized = normalized.replace(/\bnina\b/gi, 'Mina');
-    normalized = normalized.replace(/\bmena\b/gi, 'Mina');
-    normalized = normalized.replace(/\bminae\b/gi, 'Mina');
+    normalized = normalized.replace(WAKE_VARIANT, 'Mina');
 
     // STEP 5: Normalize standalone command misspellings
-    normalized = normalized.replace(/\bpaz\b/gi, 'pause');
-    normalized = normalized.replace(/\bpaus\b/gi, 'pause');
+    normalized = normalized.replace(PAUSE_MISSPELLING, 'pause');
 
     return normalized;
 }
@@ -441,6 +456,8 @@ function parseTime(timeStr) {
 }
 
 module.exports = {
+    WAKE_WORD_VARIANTS,
+    getWakePhrases,
     normalizeWakeWord,
     classifyIntent,
     calculateTriggerConfidence,
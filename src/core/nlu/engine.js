@@ -0,0 +1,81 @@
+/**
+ * NLU Engine
+ * One structured parse per utterance: wake word, trigger confidence, intent and every command
+ * slot (reminder, timer, music classification, media action), memoized so the thinking-sound
+ * precheck, the pipeline and the command matchers all share it instead of re-parsing the text.
+ */
+
+const intentClassifier = require('./classifier');
+const intentParser = require('./parser');
+
+// A parse is reused for the same text within this window (reminder/timer times are relative to
+// when it was parsed, so entries must not live long)
+const CACHE_MS = parseInt(process.env.NLU_CACHE_MS || '10000', 10);
+const CACHE_MAX = 128;
+
+// Slots filled from the command part of the utterance (reminders, timers, music - the features' registration order)
+const SLOTS = [
+    ['reminder', (query) => intentClassifier.parseReminder(query)],
+    ['timer', (query) => intentClassifier.parseTimer(query)],
+    ['music', (query) => intentClassifier.classifyIntent(query)],
+    ['media', (query) => intentParser.parseIntent(query)]
+];
+
+const cache = new Map(); // text -> { at, parse }
+
+/**
+ * @typedef {Object} Parse
+ * @property {string} text - Raw transcription
+ * @property {string} normalized - Wake-word normalized text
+ * @property {string|undefined} afterWakeWord - Command part after the wake word
+ * @property {string} query - afterWakeWord, or the whole normalized text without one
+ * @property {'music'|'chat'|null} intent - null when Mina wasn't addressed
+ * @property {number} confidence
+ * @property {number|undefined} triggerConfidence
+ * @property {{ message: string, remindAt: string }|null} reminder
+ * @property {{ message: string, remindAt: string, isTimer: boolean }|null} timer
+ * @property {{ intent: string, confidence: number }} music - Music-vs-chat classification of the query
+ * @property {{ type: string }|null} media - Media action (MEDIA_PLAY, MEDIA_INFO, ...)
+ */
+
+function build(text) {
+    const parse = { text, ...intentClassifier.processTranscription(text) };
+    parse.query = parse.afterWakeWord || parse.normalized;
+    // Slots are filled on first access (partial transcripts only need the wake word), then kept
+    for (const [slot, fill] of SLOTS) {
+        let value;
+        let filled = false;
+        Object.defineProperty(parse, slot, {
+            enumerable: true,
+            get() {
+                if (!filled) {
+                    value = fill(parse.query);
+                    filled = true;
+                }
+                return value;
+            }
+        });
+    }
+    return Object.freeze(parse);
+}
+
+/**
+ * Parse an utterance (memoized)
+ * @param {string} text - Raw transcription
+ * @returns {Parse}
+ */
+function parse(text) {
+    const now = Date.now();
+    const hit = cache.get(text);
+    if (hit && now - hit.at < CACHE_MS) return hit.parse;
+
+    const result = build(text);
+    cache.delete(text);
+    cache.set(text, { at: now, parse: result });
+    if (cache.size > CACHE_MAX) cache.delete(cache.keys().next().value);
+    return result;
+}
+
+module.exports = {
+    parse
+};
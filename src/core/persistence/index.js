@@ -0,0 +1,227 @@
+const fs = require('fs');
+const path = require('path');
+
+/**
+ * Write-behind persistence for the JSON data stores (memory, settings, reminders).
+ *
+ * Each store is a plain JSON snapshot (e.g. data/settings.json) plus an append-only journal next to it
+ * (data/settings.json.journal). Changes are applied in memory right away and recorded as
+ * { op: 'set' | 'delete', path: [...keys], value } lines; the journal is appended asynchronously
+ * PERSIST_FLUSH_MS after the first change, so a burst of updates costs one small write. Repeated
+ * changes to the same path within a flush are coalesced.
+ *
+ * Once the journal passes PERSIST_COMPACT_KB (or PERSIST_COMPACT_MS has elapsed), the snapshot is
+ * rewritten atomically (temp file + fsync + rename) and the journal is emptied. On startup the
+ * journal is replayed over the snapshot, so a crash loses at most the last flush window. On a
+ * clean exit, shutdown() (also run on 'exit') writes out whatever is pending or still mid-append.
+ *
+ * Ops are plain assignments/deletions of object keys, so replaying part of a journal twice is
+ * harmless (the window between snapshot rename and journal truncation). Arrays are only ever
+ * set, never spliced through the journal.
+ */
+
+const FLUSH_MS = parseInt(process.env.PERSIST_FLUSH_MS || '200', 10);
+const COMPACT_BYTES = parseInt(process.env.PERSIST_COMPACT_KB || '256', 10) * 1024;
+const COMPACT_MS = parseInt(process.env.PERSIST_COMPACT_MS || '600000', 10);
+
+const stores = [];
+
+class JsonStore {
+    /**
+     * @param {string} file - snapshot path
+     * @param {*} fallback - initial data when there is no snapshot yet
+     */
+    constructor(file, fallback) {
+        this.file = file;
+        this.journal = `${file}.journal`;
+        this.name = path.basename(file);
+        this.pending = new Map(); // JSON path -> op, in order of last change
+        this.inflight = ''; // Journal lines taken for an append that hasn't finished yet
+        this.journalBytes = 0;
+        this.timer = null;
+        this.chain = Promise.resolve(); // Serializes journal appends and compactions
+        this.lastCompact = Date.now();
+        this.data = this.load(fallback);
+    }
+
+    load(fallback) {
+        fs.mkdirSync(path.dirname(this.file), { recursive: true });
+
+        let data = fallback;
+        if (fs.existsSync(this.file)) {
+            try {
+                data = JSON.parse(fs.readFileSync(this.file, 'utf8'));
+            } catch (e) {
+                console.error(`[Persistence] Failed to load ${this.name}:`, e);
+            }
+        }
+
+        // Crash recovery: replay whatever was journaled after the last snapshot
+        if (fs.existsSync(this.journal)) {
+            const text = fs.readFileSync(this.journal, 'utf8');
+            this.journalBytes = Buffer.byteLength(text);
+            let replayed = 0;
+            for (const line of text.split('\n')) {
+                if (!line.trim()) continue;
+                try {
+                    const op = JSON.parse(line);
+                    data = applyOp(data, op);
+                    replayed++;
+                } catch (e) {
+                    // A torn last line from a crash mid-append
+                    console.error(`[Persistence] Skipping unreadable journal entry in ${this.name}`);
+                }
+            }
+            if (replayed) console.log(`[Persistence] Replayed ${replayed} changes into ${this.name}`);
+        }
+        return data;
+    }
+
+    /**
+     * Assign a value (path [] replaces the whole store) and journal it
+     * @param {string[]} keyPath
+     * @param {*} value
+     */
+    set(keyPath, value) {
+        this.data = applyOp(this.data, { op: 'set', path: keyPath, value });
+        this.record({ op: 'set', path: keyPath, value });
+    }
+
+    /**
+     * Delete an object key and journal it
+     * @param {string[]} keyPath
+     */
+    delete(keyPath) {
+        this.data = applyOp(this.data, { op: 'delete', path: keyPath });
+        this.record({ op: 'delete', path: keyPath });
+    }
+
+    record(op) {
+        // Values are serialized at flush time, so only the latest change per path is worth keeping
+        const key = JSON.stringify(op.path);
+        this.pending.delete(key);
+        this.pending.set(key, op);
+        if (!this.timer) this.timer = setTimeout(() => this.flush(), FLUSH_MS);
+    }
+
+    takePending() {
+        clearTimeout(this.timer);
+        this.timer = null;
+        if (!this.pending.size) return '';
+        const lines = [...this.pending.values()].map((op) => JSON.stringify(op)).join('\n') + '\n';
+        this.pending.clear();
+        return lines;
+    }
+
+    // Append lines, keeping them until the write lands so flushSync() can redo it; lines from a
+    // failed append go out again with the next ones (after a newline, in case it left a torn line)
+    async append(lines) {
+        this.inflight = this.inflight ? `\n${this.inflight}${lines}` : lines;
+        const text = this.inflight;
+        await fs.promises.appendFile(this.journal, text, 'utf8');
+        this.journalBytes += Buffer.byteLength(text);
+        if (this.inflight === text) this.inflight = '';
+    }
+
+    /**
+     * Append pending changes to the journal (and compact if it has grown large)
+     * @returns {Promise<void>}
+     */
+    flush() {
+        this.chain = this.chain.then(async () => {
+            const lines = this.takePending();
+            if (lines) await this.append(lines);
+            const due = this.journalBytes > 0 && Date.now() - this.lastCompact > COMPACT_MS;
+            if (this.journalBytes > COMPACT_BYTES || due) await this.writeSnapshot();
+        }).catch((e) => console.error(`[Persistence] Failed to write ${this.name}:`, e));
+        return this.chain;
+    }
+
+    /**
+     * Rewrite the snapshot and empty the journal
+     * @returns {Promise<void>}
+     */
+    compact() {
+        this.chain = this.chain.then(async () => {
+            const lines = this.takePending();
+            if (lines) await this.append(lines);
+            await this.writeSnapshot();
+        }).catch((e) => console.error(`[Persistence] Failed to compact ${this.name}:`, e));
+        return this.chain;
+    }
+
+    async writeSnapshot() {
+        const tmp = `${this.file}.tmp`;
+        const handle = await fs.promises.open(tmp, 'w');
+        try {
+            await handle.writeFile(JSON.stringify(this.data, null, 2), 'utf8');
+            await handle.sync();
+        } finally {
+            await handle.close();
+        }
+        await fs.promises.rename(tmp, this.file);
+        await fs.promises.writeFile(this.journal, '');
+        this.journalBytes = 0;
+        this.lastCompact = Date.now();
+    }
+
+    // Last-chance write on shutdown; replaying these over a fresher snapshot (or twice, if the
+    // async append did land) is harmless
+    flushSync() {
+        // An append cut short may have left a torn line; the newline keeps ours off the end of it
+        const inflight = this.inflight ? `\n${this.inflight}` : '';
+        const lines = inflight + this.takePending();
+        if (!lines) return;
+        try {
+            fs.appendFileSync(this.journal, lines, 'utf8');
+            this.inflight = '';
+        } catch (e) {
+            console.error(`[Persistence] Failed to write ${this.name} on exit:`, e);
+        }
+    }
+}
+
+function applyOp(data, op) {
+    if (!op.path.length) return op.op === 'set' ? op.value : data;
+    let target = data;
+    for (const key of op.path.slice(0, -1)) {
+        if (target[key] === null || typeof target[key] !== 'object') {
+            if (op.op === 'delete') return data;
+            target[key] = {};
+        }
+        target = target[key];
+    }
+    const last = op.path[op.path.length - 1];
+    if (op.op === 'set') target[last] = op.value;
+    else delete target[last];
+    return data;
+}
+
+/**
+ * Open (load and recover) a JSON store
+ * @param {string} file - snapshot path, e.g. data/settings.json
+ * @param {*} fallback - initial data when the snapshot doesn't exist
+ * @returns {JsonStore}
+ */
+function open(file, fallback) {
+    const store = new JsonStore(file, fallback);
+    stores.push(store);
+    // Fold a recovered journal into the snapshot, off the startup path
+    if (store.journalBytes > 0) setImmediate(() => store.compact());
+    return store;
+}
+
+/**
+ * Synchronously write every store's pending and in-flight changes to its journal. Runs on
+ * 'exit'; call it from signal handlers that end the process some other way.
+ */
+function shutdown() {
+    for (const store of stores) store.flushSync();
+}
+
+process.on('exit', shutdown);
+
+module.exports = {
+    open,
+    shutdown
+};
@@ -1,4 +1,4 @@
-const intentClassifier = require('../nlu/classifier');
+const nlu = require('../nlu/engine');
 const registry = require('../commands/registry');
 // We will move 'ai' to src/core/ai later, for now require from root or assume let's use the one in root
 const ai = require('../../integrations/ai');
@@ -8,16 +8,18 @@ const { ActionType } = require('../types');
 /**
  * Handle a user utterance
  * @param {string} text - The spoken text
- * @param {Object} context - { userId, guildId, username, guildName, member }
+ * @param {Object} context - { userId, guildId, username, guildName, member, trace? }
  * @returns {Promise<import('../types').ActionPlan>}
  */
 async function handleUtterance(text, context) {
     console.log(`[Pipeline] Handling: "${text}" from ${context.username}`);
 
     // 1. Intent Classification
-    // We use the existing classifier to get normalized text and intent
-    const processed = intentClassifier.processTranscription(text);
+    // One memoized parse (shared with the voice handler's precheck); commands read their slots from context.parse
+    const processed = nlu.parse(text);
+    context.parse = processed;
     const normalizedText = processed.normalized;
+    if (context.trace) context.trace.mark('intent');
 
     if (normalizedText !== text) {
         console.log(`[Normalized] "${text}" -> "${normalizedText}"`);
@@ -48,12 +50,14 @@ async function handleUtterance(text, context) {
 
     // 3. Command Registry Lookup
     // Use afterWakeWord to ensure commands invoke only on the command part
-    const query = processed.afterWakeWord || normalizedText;
+    const query = processed.query;
 
     const match = registry.findMatch(query, context);
     if (match) {
         console.log(`[Pipeline] Matched command: ${match.command.id}`);
-        return await match.command.execute(query, context, match.matches);
+        const plan = await match.command.execute(query, context, match.matches);
+        if (context.trace) context.trace.mark('command');
+        return plan;
     }
 
     // 4. Fallback to AI (Gemini)
@@ -74,6 +78,7 @@ async function handleUtterance(text, context) {
     const fullPrompt = `${memoryContext}\n[Your Current Status: "${context.currentStatus || 'Online'}"]\nUser: ${query}`;
 
     const response = await ai.generateResponse(fullPrompt);
+    if (context.trace) context.trace.mark('llm');
     console.log(`[AI] Response: "${response}"`);
 
 
@@ -1,75 +1,19 @@
-const fs = require('fs');
 const path = require('path');
+const persistence = require('../persistence');
+const transcripts = require('../transcripts');
 
-const BASE_DIR = path.join(process.cwd(), 'data', 'transcripts');
-
-if (!fs.existsSync(BASE_DIR)) {
-    fs.mkdirSync(BASE_DIR, { recursive: true });
-}
-
-function getTodayString() {
-    return new Date().toISOString().split('T')[0];
-}
-
+// Transcript lines are buffered and written in batches to the day's segment (see core/transcripts)
 function saveTranscript(username, userId, text) {
-    const dateStr = getTodayString();
-    // Structure: transcripts/YYYY-MM-DD/username-userId.txt
-    const dayDir = path.join(BASE_DIR, dateStr);
-
-    if (!fs.existsSync(dayDir)) {
-        fs.mkdirSync(dayDir, { recursive: true });
-    }
-
-    // Sanitize username to remove illegal characters for Windows/Linux filenames
-    const safeUsername = username.replace(/[<>:"/\\|?*]/g, '_');
-    const filename = `${safeUsername}-${userId}.txt`;
-    const filePath = path.join(dayDir, filename);
-
-    const timestamp = new Date().toLocaleTimeString();
-    const line = `[${timestamp}] ${text}\n`;
-
-    fs.appendFile(filePath, line, (err) => {
-        if (err) console.error('Error writing transcript:', err);
-    });
-}
-
-function getTranscriptPath(userId) {
-    const dates = fs.readdirSync(BASE_DIR).sort().reverse();
-    for (const date of dates) {
-        const dayDir = path.join(BASE_DIR, date);
-        const files = fs.readdirSync(dayDir);
-        const userFile = files.find(f => f.includes(userId));
-        if (userFile) {
-            return path.join(dayDir, userFile);
-        }
-    }
-    return null;
+    transcripts.append(username, userId, text);
 }
 
 function logEvent(username, userId, eventType) {
-    const today = new Date().toISOString().split('T')[0];
-    const dayDir = path.join(BASE_DIR, today);
-
-    if (!fs.existsSync(dayDir)) {
-        fs.mkdirSync(dayDir, { recursive: true });
-    }
-
-    // Sanitize username
-    const safeUsername = username.replace(/[<>:"/\\|?*]/g, '_');
-    const filename = `${safeUsername}-${userId}.txt`;
-    const filePath = path.join(dayDir, filename);
-
-    const timestamp = new Date().toLocaleTimeString();
-    const logLine = `[${timestamp}] *** ${eventType} ***\n`;
-
-    fs.appendFile(filePath, logLine, (err) => {
-        if (err) console.error(`Error logging event:`, err);
-    });
+    transcripts.append(username, userId, `*** ${eventType} ***`);
 }
 
 const SETTINGS_FILE = path.join(process.cwd(), 'data', 'settings.json');
 const LOGS_DIR = path.join(process.cwd(), 'data', 'logs');
-let settings = {
+const DEFAULT_SETTINGS = {
     optedOut: [],
     voiceSettings: {},
     chatterEnabled: false,
@@ -83,22 +27,13 @@ let settings = {
     debugMode: false
 };
 
-// Load settings on startup
-if (fs.existsSync(SETTINGS_FILE)) {
-    try {
-        const data = fs.readFileSync(SETTINGS_FILE, 'utf8');
-        settings = JSON.parse(data);
-    } catch (e) {
-        console.error('Error loading settings:', e);
-    }
-}
+// Load settings on startup (replaying any changes journaled since the last snapshot)
+const store = persistence.open(SETTINGS_FILE, DEFAULT_SETTINGS);
+const settings = store.data;
 
-function saveSettings() {
-    try {
-        fs.writeFileSync(SETTINGS_FILE, JSON.stringify(settings, null, 2));
-    } catch (e) {
-        console.error('Error saving settings:', e);
-    }
+// Queue the setting at this path (e.g. 'voiceSettings', userId) for writing
+function saveSettings(...keyPath) {
+    store.set(keyPath, keyPath.reduce((value, key) => value[key], settings));
 }
 
 // --- Getters and Setters ---
@@ -111,13 +46,13 @@ function setOptOut(userId, optOut) {
     if (optOut) {
         if (!settings.optedOut.includes(userId)) {
             settings.optedOut.push(userId);
-            saveSettings();
+            saveSettings('optedOut');
         }
     } else {
         const index = settings.optedOut.indexOf(userId);
         if (index > -1) {
             settings.optedOut.splice(index, 1);
-            saveSettings();
+            saveSettings('optedOut');
         }
     }
 }
@@ -128,7 +63,7 @@ function getVoice(userId) {
 
 function setVoice(userId, langCode) {
     settings.voiceSettings[userId] = langCode;
-    saveSettings();
+    saveSettings('voiceSettings', userId);
 }
 
 function getChatterEnabled() {
@@ -137,7 +72,7 @@ function getChatterEnabled() {
 
 function setChatterEnabled(enabled) {
     settings.chatterEnabled = enabled;
-    saveSettings();
+    saveSettings('chatterEnabled');
 }
 
 function getJoinSound(userId) {
@@ -147,7 +82,11 @@ function getJoinSound(userId) {
 function setJoinSound(userId, filePath) {
     if (!settings.joinSounds) settings.joinSounds = {};
     settings.joinSounds[userId] = filePath;
-    saveSettings();
+    saveSettings('joinSounds', userId);
+}
+
+function getJoinSounds() {
+    return settings.joinSounds || {};
 }
 
 function getLeaveSound(userId) {
@@ -157,7 +96,11 @@ function getLeaveSound(userId) {
 function setLeaveSound(userId, filePath) {
     if (!settings.leaveSounds) settings.leaveSounds = {};
     settings.leaveSounds[userId] = filePath;
-    saveSettings();
+    saveSettings('leaveSounds', userId);
+}
+
+function getLeaveSounds() {
+    return settings.leaveSounds || {};
 }
 
 function getGlobalVoice() {
@@ -166,7 +109,7 @@ function getGlobalVoice() {
 
 function setGlobalVoice(voice) {
     settings.globalVoice = voice;
-    saveSettings();
+    saveSettings('globalVoice');
 }
 
 function getGhostMode() {
@@ -175,7 +118,7 @@ function getGhostMode() {
 
 function setGhostMode(enabled) {
     settings.ghostMode = enabled;
-    saveSettings();
+    saveSettings('ghostMode');
 }
 
 function getAiEnabled() {
@@ -184,7 +127,7 @@ function getAiEnabled() {
 
 function setAiEnabled(enabled) {
     settings.aiEnabled = enabled;
-    saveSettings();
+    saveSettings('aiEnabled');
 }
 
 function getAiModel() {
@@ -193,7 +136,7 @@ function getAiModel() {
 
 function setAiModel(model) {
     settings.aiModel = model;
-    saveSettings();
+    saveSettings('aiModel');
 }
 
 function getTriggerWords() {
@@ -203,7 +146,7 @@ function getTriggerWords() {
 function setTriggerWords(words) {
     if (Array.isArray(words)) {
         settings.triggerWords = words;
-        saveSettings();
+        saveSettings('triggerWords');
     }
 }
 
@@ -213,13 +156,12 @@ function getDebugMode() {
 
 function setDebugMode(enabled) {
     settings.debugMode = enabled;
-    saveSettings();
+    saveSettings('debugMode');
 }
 
 module.exports = {
     saveTranscript,
     logEvent,
-    getTranscriptPath,
     isOptedOut,
     setOptOut,
     getVoice,
@@ -228,8 +170,10 @@ module.exports = {
     setChatterEnabled,
     getJoinSound,
     setJoinSound,
+    getJoinSounds,
     getLeaveSound,
     setLeaveSound,
+    getLeaveSounds,
     getGlobalVoice,
     setGlobalVoice,
     getGhostMode,
@@ -0,0 +1,230 @@
+const fs = require('fs');
+const path = require('path');
+const { Readable } = require('stream');
+const persistence = require('../persistence');
+
+/**
+ * Transcript log: one append-only segment per day (data/transcripts/YYYY-MM-DD.log) shared by
+ * everyone, written in batches through a file handle that stays open for the day.
+ *
+ * index.json maps each user to the byte ranges their lines occupy in each segment, so a user's
+ * transcript for any date range is read straight from those ranges without scanning directories.
+ * Ranges are only indexed once their bytes are on disk, at offsets taken from the file's real
+ * size, so a crash or a failed write can orphan lines but never point a user at someone else's.
+ *
+ * The old per-user files (YYYY-MM-DD/username-userId.txt) are indexed once on first start and
+ * still served by /download.
+ */
+
+const BASE_DIR = path.join(process.cwd(), 'data', 'transcripts');
+const INDEX_FILE = path.join(BASE_DIR, 'index.json');
+const FLUSH_MS = parseInt(process.env.TRANSCRIPT_FLUSH_MS || '1000', 10);
+const FLUSH_BYTES = 64 * 1024;
+const DATE_PATTERN = /^\d{4}-\d{2}-\d{2}$/;
+
+fs.mkdirSync(BASE_DIR, { recursive: true });
+const firstRun = !fs.existsSync(INDEX_FILE) && !fs.existsSync(`${INDEX_FILE}.journal`);
+// userId -> { name, days: { date: [[start, end], ...] }, legacy: { date: relative path } }
+const index = persistence.open(INDEX_FILE, {});
+
+let segment = null; // Today's segment: { date, file, pending: [], pendingBytes, handle, timer }
+let chain = Promise.resolve(); // Serializes segment writes
+let writing = 0;
+
+function today() {
+    return new Date().toISOString().split('T')[0];
+}
+
+function segmentFile(date) {
+    return path.join(BASE_DIR, `${date}.log`);
+}
+
+function currentSegment() {
+    const date = today();
+    if (segment && segment.date === date) return segment;
+
+    // Day rolled over: write out and close yesterday's segment
+    if (segment) {
+        const previous = segment;
+        flushSegment(previous);
+        chain = chain.then(() => previous.handle && previous.handle.close()).catch(() => {});
+    }
+
+    segment = { date, file: segmentFile(date), pending: [], pendingBytes: 0, handle: null, timer: null };
+    return segment;
+}
+
+function addRange(userId, name, date, start, end) {
+    const user = index.data[userId];
+    if (!user) {
+        index.set([userId], { name, days: { [date]: [[start, end]] } });
+        return;
+    }
+    if (user.name !== name) index.set([userId, 'name'], name);
+
+    const ranges = user.days && user.days[date];
+    if (!ranges) {
+        index.set([userId, 'days', date], [[start, end]]);
+        return;
+    }
+    // Consecutive lines from the same user become one range
+    const last = ranges[ranges.length - 1];
+    if (last[1] === start) index.set([userId, 'days', date, ranges.length - 1], [last[0], end]);
+    else index.set([userId, 'days', date, ranges.length], [start, end]);
+}
+
+// Index lines written as one block starting at `start`; lines past `written` bytes didn't make it
+function indexWritten(date, entries, start, written) {
+    let offset = start;
+    for (const entry of entries) {
+        const end = offset + entry.data.length;
+        if (end > start + written) {
+            console.error(`[Transcripts] Short write: ${entries.length - entries.indexOf(entry)} lines not indexed`);
+            return;
+        }
+        addRange(entry.userId, entry.name, date, offset, end);
+        offset = end;
+    }
+}
+
+function flushSegment(seg) {
+    clearTimeout(seg.timer);
+    seg.timer = null;
+    if (!seg.pending.length) return chain;
+
+    const pending = seg.pending;
+    seg.pending = [];
+    seg.pendingBytes = 0;
+    writing++;
+    chain = chain.then(async () => {
+        if (!seg.handle) seg.handle = await fs.promises.open(seg.file, 'a');
+        // Appends land at the real end of the file, whatever an earlier failed write left there
+        const { size } = await seg.handle.stat();
+        const { bytesWritten } = await seg.handle.write(Buffer.concat(pending.map((entry) => entry.data)));
+        indexWritten(seg.date, pending, size, bytesWritten);
+    }).catch((e) => console.error('[Transcripts] Failed to write transcript:', e))
+        .finally(() => writing--);
+    return chain;
+}
+
+/**
+ * Write out buffered lines
+ * @returns {Promise<void>}
+ */
+function flush() {
+    return segment ? flushSegment(segment) : chain;
+}
+
+/**
+ * Buffer one transcript line for a user
+ * @param {string} username
+ * @param {string} userId
+ * @param {string} text
+ */
+function append(username, userId, text) {
+    const seg = currentSegment();
+    const data = Buffer.from(`[${new Date().toLocaleTimeString()}] ${username}: ${text}\n`, 'utf8');
+    seg.pending.push({ userId, name: username, data });
+    seg.pendingBytes += data.length;
+
+    if (seg.pendingBytes >= FLUSH_BYTES) flushSegment(seg);
+    else if (!seg.timer) seg.timer = setTimeout(() => flushSegment(seg), FLUSH_MS);
+}
+
+/**
+ * Days (YYYY-MM-DD, ascending) with transcript lines for a user, optionally within [from, to]
+ * @param {string} userId
+ * @param {{ from?: string, to?: string }} [range]
+ * @returns {string[]}
+ */
+function getDays(userId, { from, to } = {}) {
+    const user = index.data[userId] || {};
+    const days = new Set([...Object.keys(user.days || {}), ...Object.keys(user.legacy || {})]);
+    // Lines still buffered for today aren't in the index yet
+    if (segment && segment.pending.some((entry) => entry.userId === userId)) days.add(segment.date);
+    return [...days].filter((date) => (!from || date >= from) && (!to || date <= to)).sort();
+}
+
+async function* readDays(userId, range) {
+    await flush();
+    const user = index.data[userId] || {};
+    for (const date of getDays(userId, range)) {
+        yield Buffer.from(`=== ${date} ===\n`);
+
+        const legacy = user.legacy && user.legacy[date];
+        if (legacy) {
+            try {
+                yield await fs.promises.readFile(path.join(BASE_DIR, legacy));
+            } catch (e) {
+                console.error(`[Transcripts] Missing legacy transcript ${legacy}`);
+            }
+        }
+
+        const ranges = user.days && user.days[date];
+        if (!ranges) continue;
+        const handle = await fs.promises.open(segmentFile(date), 'r');
+        try {
+            for (const [start, end] of ranges) {
+                const buffer = Buffer.alloc(end - start);
+                const { bytesRead } = await handle.read(buffer, 0, buffer.length, start);
+                yield buffer.subarray(0, bytesRead);
+            }
+        } finally {
+            await handle.close();
+        }
+    }
+}
+
+/**
+ * Stream a user's transcript for a date range (inclusive), one section per day
+ * @param {string} userId
+ * @param {{ from?: string, to?: string }} [range]
+ * @returns {Readable}
+ */
+function streamTranscript(userId, range) {
+    return Readable.from(readDays(userId, range), { objectMode: false });
+}
+
+// Index the old per-user files once, in the background
+async function indexLegacy() {
+    const entries = await fs.promises.readdir(BASE_DIR, { withFileTypes: true });
+    let count = 0;
+    for (const entry of entries) {
+        if (!entry.isDirectory() || !DATE_PATTERN.test(entry.name)) continue;
+        for (const file of await fs.promises.readdir(path.join(BASE_DIR, entry.name))) {
+            const match = file.match(/^(.*)-([^-]+)\.txt$/);
+            if (!match) continue;
+            const [, name, userId] = match;
+            if (!index.data[userId]) index.set([userId], { name, days: {} });
+            index.set([userId, 'legacy', entry.name], `${entry.name}/${file}`);
+            count++;
+        }
+    }
+    if (count) console.log(`[Transcripts] Indexed ${count} legacy transcript files`);
+}
+
+if (firstRun) {
+    indexLegacy().catch((e) => console.error('[Transcripts] Failed to index legacy transcripts:', e));
+}
+
+// Last-chance write on shutdown (skipped if an async write is mid-flight, to keep offsets honest)
+process.on('exit', () => {
+    if (!segment || !segment.pending.length || writing) return;
+    try {
+        const data = Buffer.concat(segment.pending.map((entry) => entry.data));
+        const size = fs.existsSync(segment.file) ? fs.statSync(segment.file).size : 0;
+        fs.appendFileSync(segment.file, data);
+        indexWritten(segment.date, segment.pending, size, data.length);
+        index.flushSync();
+    } catch (e) {
+        console.error('[Transcripts] Failed to write transcript on exit:', e);
+    }
+});
+
+module.exports = {
+    DATE_PATTERN,
+    append,
+    flush,
+    getDays,
+    streamTranscript
+};
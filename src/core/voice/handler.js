@@ -1,25 +1,25 @@
 const { EndBehaviorType, VoiceConnectionStatus } = require('@discordjs/voice');
 const prism = require('prism-media');
-const transcription = require('../../integrations/transcription');
+const transcriptionScheduler = require('../../integrations/transcription/scheduler');
 const storage = require('../storage');
 const tts = require('../../integrations/tts');
 const gemini = require('../../integrations/ai');
 const memory = require('../memory');
-const intentClassifier = require('../nlu/classifier');
+const nlu = require('../nlu/engine');
 const reminders = require('../../features/reminders/store');
 const pipeline = require('../pipeline/handleUtterance');
 const { ActionType } = require('../types');
 const satelliteServer = require('../../integrations/satellite');
 const audio = require('../../integrations/discord/audio');
+const soundbank = require('../../integrations/discord/soundbank');
 const greetings = require('../../features/greetings');
 const scheduler = require('../../features/reminders/scheduler');
+const metrics = require('../metrics');
 
 const { ActionRowBuilder, ButtonBuilder, ButtonStyle, EmbedBuilder } = require('discord.js');
 const fs = require('fs');
 const path = require('path');
 
-// State Maps (Reduced)
-const activeTranscriptions = new Set(); // UserId
 // Chatterbox stuff
 const chatterCooldowns = new Map();
 const COOLDOWN_MS = 10000;
@@ -34,7 +34,9 @@ module.exports = {
     joinChannel,
     leaveChannel,
     playFile: audio.playFile, // Proxy
+    playSound: audio.playSound, // Proxy
     speak: audio.speak,       // Proxy
+    stopTTS: audio.stopTTS,   // Proxy
     scheduleReminder: scheduler.scheduleReminder,
     getBotChannelId: function (guildId) {
         const conn = audio.getConnection(guildId);
@@ -45,7 +47,7 @@ module.exports = {
 
 // --- Action Execution ---
 // --- Action Execution ---
-async function executePlan(plan, guildId, userId, client) {
+async function executePlan(plan, guildId, userId, client, trace) {
     if (!plan) return;
 
     if (plan[ActionType.SATELLITE_CMD] && userId) {
@@ -53,7 +55,7 @@ async function executePlan(plan, guildId, userId, client) {
         satelliteServer.sendCommand(userId, cmd.command);
     }
     if (plan[ActionType.TTS_SPEAK]) {
-        await audio.speak(guildId, plan[ActionType.TTS_SPEAK]);
+        await audio.speak(guildId, plan[ActionType.TTS_SPEAK], { trace });
     }
     if (plan[ActionType.PLAY_FILE]) {
         await audio.playFile(guildId, plan[ActionType.PLAY_FILE]);
@@ -117,26 +119,55 @@ function startListening(connection, guild) {
 
     receiver.speaking.on('start', (userId) => {
         if (!userId || storage.isOptedOut(userId)) return;
-        if (activeTranscriptions.has(userId)) return;
-        activeTranscriptions.add(userId);
+        // Still subscribed: the open stream is already carrying this speech.
+        // Once it has ended, a new utterance gets its own stream even if the last one is still being transcribed.
+        if (receiver.subscriptions.has(userId)) return;
 
         const opusStream = receiver.subscribe(userId, {
             end: { behavior: EndBehaviorType.AfterSilence, duration: 1000 },
         });
 
-        opusStream.on('error', () => activeTranscriptions.delete(userId));
-
         const decoder = new prism.opus.Decoder({ rate: 16000, channels: 1, frameSize: 960 });
         const pcmStream = opusStream.pipe(decoder);
+        // Listeners here too: a stream can error while it is still queued for transcription
+        opusStream.on('error', (err) => console.error(`[Voice] Receive stream error for ${userId}:`, err.message));
+        pcmStream.on('error', (err) => console.error(`[Voice] Decoder error for ${userId}:`, err.message));
 
-        pcmStream.on('error', () => activeTranscriptions.delete(userId));
-        pcmStream.on('close', () => activeTranscriptions.delete(userId));
-        pcmStream.on('end', () => activeTranscriptions.delete(userId));
+        let trace = metrics.startTrace({ userId, guildId: guild.id });
+        opusStream.on('end', () => trace.mark('speech_end')); // AfterSilence fired
 
         const member = guild.members.cache.get(userId);
         const username = member ? member.displayName : userId;
 
-        transcription.transcribeStream(pcmStream, userId, async (uid, text) => {
+        // Immediate Feedback: play the "Thinking" sound once per utterance, as soon as
+        // a partial or final transcript shows the wake word. This confirms we heard you.
+        let thinkingPlayed = false;
+        const playThinking = (text) => {
+            if (thinkingPlayed) return;
+            const preCheck = nlu.parse(text);
+            // "chat" intent means generic AI, so trigger confidence matters.
+            // "music/reminder" intents are specific commands.
+            if (preCheck.intent && (preCheck.intent !== 'chat' || preCheck.triggerConfidence >= 0.6)) {
+                thinkingPlayed = true;
+                transcriptionScheduler.markAddressed(userId);
+                audio.playSound(guild.id, soundbank.THINKING_SOUND);
+            }
+        };
+
+        const onPartial = (uid, partialText) => {
+            try {
+                playThinking(partialText);
+            } catch (e) {
+                console.error("Partial Transcript Error:", e);
+            }
+        };
+
+        transcriptionScheduler.submit(pcmStream, userId, async (uid, text) => {
+            // Vosk can emit several finals per stream; each one after the first is its own utterance
+            if (trace.has('transcript')) trace = metrics.startTrace({ userId, guildId: guild.id });
+            const utteranceTrace = trace;
+            utteranceTrace.mark('transcript');
+
             // Save Transcript (Restored)
             storage.saveTranscript(username, uid, text);
 
@@ -148,27 +179,24 @@ function startListening(connection, guild) {
                 guildName: guild.name,
                 member,
                 client: guild.client,
-                currentStatus: guild.client.user.presence.activities[0]?.name
+                currentStatus: guild.client.user.presence.activities[0]?.name,
+                trace: utteranceTrace
             };
 
             try {
-                // Immediate Feedback: Check for wake word to play "Thinking" sound
-                // This mimics the original behavior of confirming we heard you.
-                const preCheck = intentClassifier.processTranscription(text);
-                // "chat" intent means generic AI, so trigger confidence matters.
-                // "music/reminder" intents are specific commands.
-                if (preCheck.intent && (preCheck.intent !== 'chat' || preCheck.triggerConfidence >= 0.6)) {
-                    audio.playFile(guild.id, path.join(process.cwd(), 'data', 'sounds', 'thinking.mp3'));
-                }
+                playThinking(text);
+                thinkingPlayed = false; // Vosk can emit several finals per stream
 
                 const plan = await pipeline.handleUtterance(text, context);
 
                 if (plan && Object.keys(plan).length > 0) {
-                    await executePlan(plan, guild.id, userId, guild.client);
+                    await executePlan(plan, guild.id, userId, guild.client, utteranceTrace);
                     return; // Handled by pipeline
                 }
             } catch (e) {
                 console.error("Pipeline Error:", e);
+            } finally {
+                utteranceTrace.end(); // No-op if playback already ended it
             }
 
             // 2. Legacy Chatterbox Fallback
@@ -187,6 +215,6 @@ function startListening(connection, guild) {
                     }
                 }
             }
-        });
+        }, onPartial, trace);
     });
 }
@@ -1,19 +1,17 @@
 const registry = require('../../core/commands/registry');
 const { ActionType } = require('../../core/types');
-const intentClassifier = require('../../core/nlu/classifier');
-const intentParser = require('../../core/nlu/parser');
 const satelliteServer = require('../../integrations/satellite');
 // We should wrap this later
 
 registry.register({
     id: 'MUSIC_CONTROL',
-    matcher: (text) => {
-        const classification = intentClassifier.classifyIntent(text);
+    matcher: (text, context) => {
+        const classification = context.parse.music;
         return classification.intent === 'music' && classification.confidence > 0.6;
     },
     execute: async (text, context) => {
-        // Parse specific intent (Play, Pause, etc.)
-        const intent = intentParser.parseIntent(text);
+        // Specific intent (Play, Pause, etc.) from the utterance's parse
+        const intent = context.parse.media;
 
         if (!intent) {
             // Intent classifier said music, but parser couldn't figure it out?
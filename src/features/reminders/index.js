@@ -1,17 +1,16 @@
 const registry = require('../../core/commands/registry');
 const { ActionType } = require('../../core/types');
-const intentClassifier = require('../../core/nlu/classifier');
 const reminders = require('./store');
 const numberToWords = require('../../utils/numberToWords');
 
 // Register Reminder Command
 registry.register({
     id: 'REMINDER_SET',
-    matcher: (text) => {
-        return !!intentClassifier.parseReminder(text);
+    matcher: (text, context) => {
+        return !!context.parse.reminder;
     },
     execute: async (text, context) => {
-        const data = intentClassifier.parseReminder(text);
+        const data = context.parse.reminder;
 
         // Return ActionPlan
         // We calculate the confirmation text here or let the executor do it?
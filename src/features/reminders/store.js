@@ -1,30 +1,15 @@
-const fs = require('fs');
 const path = require('path');
+const persistence = require('../../core/persistence');
 
 const REMINDERS_FILE = path.join(process.cwd(), 'data', 'reminders.json');
 
-// Ensure data dir exists
-if (!fs.existsSync(path.join(process.cwd(), 'data'))) {
-    fs.mkdirSync(path.join(process.cwd(), 'data'));
-}
-
-let reminders = [];
-
-// Load reminders
-if (fs.existsSync(REMINDERS_FILE)) {
-    try {
-        reminders = JSON.parse(fs.readFileSync(REMINDERS_FILE, 'utf8'));
-    } catch (e) {
-        console.error("Failed to load reminders:", e);
-    }
-}
+// Load reminders (and replay any changes journaled since the last snapshot)
+const store = persistence.open(REMINDERS_FILE, []);
+let reminders = store.data;
 
+// Queue the whole list for writing (after removals)
 function saveReminders() {
-    try {
-        fs.writeFileSync(REMINDERS_FILE, JSON.stringify(reminders, null, 2));
-    } catch (e) {
-        console.error("Failed to save reminders:", e);
-    }
+    store.set([], reminders);
 }
 
 // Add a new reminder
@@ -37,7 +22,7 @@ function addReminder(userId, message, remindAt) {
         createdAt: new Date().toISOString()
     };
     reminders.push(reminder);
-    saveReminders();
+    store.set([reminders.length - 1], reminder);
     return reminder;
 }
 
@@ -1,16 +1,15 @@
 const registry = require('../../core/commands/registry');
 const { ActionType } = require('../../core/types');
-const intentClassifier = require('../../core/nlu/classifier');
 const reminders = require('../reminders/store');
 const numberToWords = require('../../utils/numberToWords');
 
 registry.register({
     id: 'TIMER_SET',
-    matcher: (text) => {
-        return !!intentClassifier.parseTimer(text);
+    matcher: (text, context) => {
+        return !!context.parse.timer;
     },
     execute: async (text, context) => {
-        const data = intentClassifier.parseTimer(text);
+        const data = context.parse.timer;
 
         // Add timer as reminder
         const reminder = reminders.addReminder(context.userId, "Timer is up!", data.remindAt);
@@ -1,14 +1,20 @@
 const gemini = require('./gemini');
 const openrouter = require('./openrouter');
+const metrics = require('../../core/metrics');
 
 async function generateResponse(prompt) {
     const provider = (process.env.AI_PROVIDER || 'gemini').toLowerCase();
+    const start = Date.now();
 
-    if (provider === 'openrouter') {
-        return await openrouter.generateResponse(prompt);
-    } else {
-        // Default to Gemini
-        return await gemini.generateResponse(prompt);
+    try {
+        if (provider === 'openrouter') {
+            return await openrouter.generateResponse(prompt);
+        } else {
+            // Default to Gemini
+            return await gemini.generateResponse(prompt);
+        }
+    } finally {
+        metrics.observe('mina_llm_seconds', (Date.now() - start) / 1000, { provider }, 'LLM response time');
     }
 }
 
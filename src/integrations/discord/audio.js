@@ -4,26 +4,37 @@ const {
     createAudioResource,
     StreamType,
     AudioPlayerStatus,
+    NoSubscriberBehavior,
     VoiceConnectionStatus,
     enterState
 } = require('@discordjs/voice');
 const fs = require('fs');
+const path = require('path');
 const tts = require('../tts');
+const soundbank = require('./soundbank');
 const storage = require('../../core/storage');
 
 // State Maps
 const connections = new Map(); // GuildId -> Connection
-const ttsQueues = new Map(); // GuildId -> Array of { tempFile }
-const isSpeaking = new Map(); // GuildId -> Boolean
-const activePlayers = new Map(); // GuildId -> AudioPlayer
+const playback = new Map(); // GuildId -> { player, lanes: { sfx: [], speech: [] }, current }
 let tempFiles = [];
 
+// Lanes in priority order: a queued sound effect plays before the next sentence,
+// but never interrupts the one currently playing
+const LANES = ['sfx', 'speech'];
+
+// How long a live stream (streamed TTS) may run dry before the player gives up on it. The
+// player's default is 5 missed 20ms frames, which cuts a reply off at the first 100ms stall.
+const MAX_STALL_MS = parseInt(process.env.PLAYBACK_MAX_STALL_MS || '5000', 10);
+
 // Exports
 module.exports = {
     join,
     leave,
     speak,
     playFile,
+    playSound,
+    stopTTS,
     getConnection,
     getVoiceConnectionStatus: VoiceConnectionStatus
 };
@@ -47,8 +58,7 @@ function join(channel) {
     });
 
     connections.set(channel.guild.id, connection);
-    ttsQueues.set(channel.guild.id, []);
-    isSpeaking.set(channel.guild.id, false);
+    connection.subscribe(getPlayback(channel.guild.id).player);
 
     // Auto-cleanup on disconnect
     connection.on(VoiceConnectionStatus.Disconnected, async () => {
@@ -85,9 +95,14 @@ function cleanup(guildId) {
         connections.delete(guildId);
     }
 
-    ttsQueues.delete(guildId);
-    isSpeaking.delete(guildId);
-    activePlayers.delete(guildId);
+    const state = playback.get(guildId);
+    if (state) {
+        playback.delete(guildId);
+        for (const lane of LANES) drainLane(state, lane);
+        if (state.current) finishItem(state.current, false);
+        state.current = null;
+        state.player.stop(true);
+    }
 
     // Clean temp files
     // Ideally we track which file belongs to which guild, but for now clear all known temp files?
@@ -97,14 +112,41 @@ function cleanup(guildId) {
 }
 
 function cleanTempFiles() {
-    tempFiles.forEach(file => {
-        if (fs.existsSync(file)) {
-            try { fs.unlinkSync(file); } catch (e) { console.error('Error deleting temp file:', e); }
-        }
-    });
+    // Cached clips are only unpinned; real temp files are deleted
+    tempFiles.forEach(file => tts.disposeFile(file));
     tempFiles = [];
 }
 
+function releaseFile(file) {
+    const index = tempFiles.indexOf(file);
+    if (index === -1) return; // Already cleaned up
+    tempFiles.splice(index, 1);
+    tts.disposeFile(file);
+}
+
+// Formats @discordjs/voice can play without spawning FFmpeg
+const NATIVE_TYPES = {
+    '.ogg': StreamType.OggOpus,
+    '.opus': StreamType.OggOpus,
+    '.pcm': StreamType.Raw // 48kHz stereo s16le
+};
+
+/**
+ * Build an audio resource, skipping the FFmpeg transcode when the input is already Discord-ready
+ * @param {string|import('stream').Readable} input - file path or raw PCM stream
+ * @param {number} [volume] - only adds an inline volume transformer when != 1
+ */
+function createResource(input, volume = 1.0) {
+    const inputType = typeof input === 'string'
+        ? (NATIVE_TYPES[path.extname(input).toLowerCase()] || StreamType.Arbitrary)
+        : StreamType.Raw;
+    // Arbitrary input is transcoded anyway, so volume is free there; otherwise only pay for it when needed
+    const inlineVolume = inputType === StreamType.Arbitrary || volume !== 1.0;
+    const resource = createAudioResource(input, { inputType, inlineVolume });
+    if (inlineVolume) resource.volume.setVolume(volume);
+    return resource;
+}
+
 /**
  * Get active connection
  * @param {string} guildId 
@@ -131,28 +173,30 @@ async function speak(guildId, text, args = {}) {
     }
 
     const effectiveCode = options.code || storage.getGlobalVoice() || 'en-US';
-    options.code = effectiveCode;
+    const { trace, ...ttsOptions } = options;
+    ttsOptions.code = effectiveCode;
 
     try {
-        const tempFile = await tts.generateSpeech(text, options);
-        if (!tempFile || !fs.existsSync(tempFile)) {
+        // Either a file path or, for streaming engines, { stream, inputType: 'raw' } still being generated
+        const result = await tts.generateSpeech(text, ttsOptions);
+        if (trace) trace.mark('tts');
+        const streamed = result && typeof result === 'object' && result.stream;
+        if (!streamed && (!result || !fs.existsSync(result))) {
             console.error("TTS failed to generate file.");
             return false;
         }
 
         // Log
-        const styleLog = options.style ? `[${options.style}] ` : '';
+        const styleLog = ttsOptions.style ? `[${ttsOptions.style}] ` : '';
         storage.saveTranscript("Mina 🤖", "BOT_TTS", `${styleLog}${text}`);
 
-        tempFiles.push(tempFile);
-
-        const queue = ttsQueues.get(guildId) || [];
+        if (!streamed) tempFiles.push(result);
 
-        // Return promise that resolves when THIS item finishes playing
-        return new Promise((resolve) => {
-            queue.push({ tempFile, resolve });
-            ttsQueues.set(guildId, queue);
-            processQueue(guildId);
+        // Resolves when THIS item finishes playing
+        return enqueue(guildId, 'speech', {
+            input: streamed ? result.stream : result,
+            tempFile: streamed ? null : result,
+            trace
         });
 
     } catch (e) {
@@ -161,59 +205,135 @@ async function speak(guildId, text, args = {}) {
     }
 }
 
-function processQueue(guildId) {
-    if (!connections.has(guildId)) return;
-    if (isSpeaking.get(guildId)) return;
+// --- Playback ---
+// One long-lived AudioPlayer per guild. Items wait in priority lanes; while one plays,
+// the next one's resource is already created so its FFmpeg decode runs ahead of time.
 
-    const queue = ttsQueues.get(guildId);
-    if (!queue || queue.length === 0) return;
+function getPlayback(guildId) {
+    let state = playback.get(guildId);
+    if (state) return state;
 
-    isSpeaking.set(guildId, true);
-    const item = queue.shift();
+    const player = createAudioPlayer({
+        behaviors: {
+            noSubscriber: NoSubscriberBehavior.Pause,
+            maxMissedFrames: Math.ceil(MAX_STALL_MS / 20)
+        }
+    });
+    state = { player, lanes: { sfx: [], speech: [] }, current: null };
+    playback.set(guildId, state);
 
-    const connection = connections.get(guildId);
+    player.on(AudioPlayerStatus.Playing, () => {
+        if (state.current && state.current.trace) state.current.trace.mark('playback');
+    });
 
-    try {
-        const resource = createAudioResource(item.tempFile, { inputType: StreamType.Arbitrary, inlineVolume: true });
-        const player = createAudioPlayer();
-        activePlayers.set(guildId, player);
+    player.on(AudioPlayerStatus.Idle, () => {
+        if (state.current) finishItem(state.current, true);
+        state.current = null;
+        playNext(guildId, state);
+    });
 
-        player.play(resource);
-        connection.subscribe(player);
+    player.on('error', error => {
+        console.error('Player Error:', error);
+        // Idle follows once the failed resource is torn down, which moves the queue on
+        if (state.current) finishItem(state.current, false);
+    });
 
-        player.on(AudioPlayerStatus.Idle, () => {
-            player.stop();
-            activePlayers.delete(guildId);
-            isSpeaking.set(guildId, false);
+    return state;
+}
 
-            // Delete file immediately?
-            try {
-                if (fs.existsSync(item.tempFile)) fs.unlinkSync(item.tempFile);
-                tempFiles = tempFiles.filter(f => f !== item.tempFile);
-            } catch (e) { }
+function enqueue(guildId, lane, item) {
+    // The bot may have left while the speech was being generated
+    if (!connections.has(guildId)) {
+        if (item.tempFile) releaseFile(item.tempFile);
+        return Promise.resolve(false);
+    }
+    const state = getPlayback(guildId);
+    return new Promise((resolve) => {
+        state.lanes[lane].push({ ...item, lane, resolve, done: false });
+        if (!state.current) playNext(guildId, state);
+        else prefetch(state);
+    });
+}
 
-            // Resolve the promise for this item
-            if (item.resolve) item.resolve(true);
+function peekNext(state) {
+    for (const lane of LANES) {
+        if (state.lanes[lane].length) return state.lanes[lane][0];
+    }
+    return null;
+}
 
-            processQueue(guildId);
-        });
+function prepare(item) {
+    // Streamed PCM and .ogg/.pcm output skip the FFmpeg probe/transcode
+    if (!item.resource) item.resource = createResource(item.input, item.volume);
+    return item.resource;
+}
 
-        player.on('error', error => {
-            console.error('Player Error:', error);
-            activePlayers.delete(guildId);
-            isSpeaking.set(guildId, false);
-            if (item.resolve) item.resolve(false);
-            processQueue(guildId);
-        });
+function prefetch(state) {
+    const next = peekNext(state);
+    if (!next || next.resource) return;
+    try {
+        prepare(next);
+    } catch (e) {
+        console.error("Error preparing next audio:", e);
+    }
+}
 
+function playNext(guildId, state) {
+    if (!connections.has(guildId) || playback.get(guildId) !== state) return;
+
+    const item = peekNext(state);
+    if (!item) return;
+    state.lanes[item.lane].shift();
+
+    try {
+        state.current = item;
+        state.player.play(prepare(item));
+        if (item.duration > 0) {
+            item.timer = setTimeout(() => {
+                if (state.current === item) state.player.stop();
+            }, item.duration);
+        }
+        prefetch(state);
     } catch (e) {
         console.error("Error processing queue:", e);
-        isSpeaking.set(guildId, false);
-        if (item.resolve) item.resolve(false);
-        processQueue(guildId);
+        state.current = null;
+        finishItem(item, false);
+        playNext(guildId, state);
+    }
+}
+
+function finishItem(item, ok) {
+    if (item.done) return;
+    item.done = true;
+    if (item.timer) clearTimeout(item.timer);
+    // Delete the temp file (or release the cached clip) now that it has played
+    if (item.tempFile) releaseFile(item.tempFile);
+    item.resolve(ok);
+}
+
+function drainLane(state, lane) {
+    for (const item of state.lanes[lane].splice(0)) {
+        if (item.resource) item.resource.playStream.destroy();
+        finishItem(item, false);
     }
 }
 
+/**
+ * Skip the sentence currently being spoken, optionally dropping the rest of the speech queue
+ * @param {string} guildId
+ * @param {boolean} [clearQueue]
+ * @returns {boolean} whether speech was playing
+ */
+function stopTTS(guildId, clearQueue = false) {
+    const state = playback.get(guildId);
+    if (!state) return false;
+
+    if (clearQueue) drainLane(state, 'speech');
+    const speaking = !!state.current && state.current.lane === 'speech';
+    if (speaking) state.player.stop(true);
+    return speaking;
+}
+
 /**
  * Play an audio file found on disk
  * @param {string} guildId 
@@ -225,30 +345,21 @@ async function playFile(guildId, filePath, duration = 0, volume = 1.0) {
     if (!connections.has(guildId)) return false;
     if (!fs.existsSync(filePath)) return false;
 
-    const connection = connections.get(guildId);
-    try {
-        const resource = createAudioResource(filePath, { inputType: StreamType.Arbitrary, inlineVolume: true });
-        resource.volume.setVolume(volume);
-
-        const player = createAudioPlayer();
-        player.play(resource);
-        connection.subscribe(player);
+    return enqueue(guildId, 'sfx', { input: filePath, volume, duration });
+}
 
-        let timeout = null;
-        if (duration > 0) {
-            timeout = setTimeout(() => { player.stop(); }, duration);
-        }
+/**
+ * Play a short clip (chime, join/leave theme) from the in-memory sound bank.
+ * Falls back to decoding the file if the clip isn't loaded yet.
+ * @param {string} guildId
+ * @param {string} filePath
+ * @param {{ volume?: number, maxMs?: number }} [options]
+ */
+async function playSound(guildId, filePath, options = {}) {
+    if (!connections.has(guildId)) return false;
 
-        return new Promise((resolve) => {
-            player.on(AudioPlayerStatus.Idle, () => {
-                player.stop();
-                if (timeout) clearTimeout(timeout);
-                resolve();
-            });
-            player.on('error', () => resolve());
-        });
-    } catch (e) {
-        console.error("playFile Error:", e);
-        return false;
-    }
+    const resource = soundbank.createResource(filePath, options);
+    if (!resource) return playFile(guildId, filePath, options.maxMs || 0, options.volume || 1.0);
+    // Length and volume are already baked into the decoded frames
+    return enqueue(guildId, 'sfx', { resource });
 }
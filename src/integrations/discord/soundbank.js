@@ -0,0 +1,104 @@
+const fs = require('fs');
+const path = require('path');
+const { Readable } = require('stream');
+const prism = require('prism-media');
+const { createAudioResource, StreamType } = require('@discordjs/voice');
+
+// Short clips (thinking chime, join/leave themes) decoded once into Opus frames and kept in memory.
+// Volume and length limits are baked in at decode time, so playback needs neither FFmpeg nor inlineVolume.
+
+const THINKING_SOUND = path.join(process.cwd(), 'data', 'sounds', 'thinking.mp3');
+// Join/leave themes: max 5s at 50% volume
+const THEME_OPTIONS = { volume: 0.5, maxMs: 5000 };
+
+const FRAME_SIZE = 960; // 20ms at 48kHz
+const clips = new Map(); // clipKey -> Buffer[] (Opus packets)
+const loading = new Map(); // clipKey -> Promise
+
+function clipKey(file, { volume = 1.0, maxMs = 0 } = {}) {
+    return `${path.resolve(file)}|${volume}|${maxMs}`;
+}
+
+function decode(file, { volume = 1.0, maxMs = 0 } = {}) {
+    return new Promise((resolve, reject) => {
+        const args = ['-analyzeduration', '0', '-loglevel', '0', '-i', file];
+        if (maxMs > 0) args.push('-t', String(maxMs / 1000));
+        if (volume !== 1.0) args.push('-af', `volume=${volume}`);
+        args.push('-f', 's16le', '-ar', '48000', '-ac', '2');
+
+        const ffmpeg = new prism.FFmpeg({ args });
+        const encoder = new prism.opus.Encoder({ rate: 48000, channels: 2, frameSize: FRAME_SIZE });
+        const frames = [];
+
+        ffmpeg.on('error', reject);
+        encoder.on('error', reject);
+        encoder.on('data', (packet) => frames.push(packet));
+        encoder.on('end', () => resolve(frames));
+        ffmpeg.pipe(encoder);
+    });
+}
+
+/**
+ * Decode a clip into memory (replacing any previous version of it)
+ * @param {string} file
+ * @param {{ volume?: number, maxMs?: number }} [options]
+ * @returns {Promise<boolean>}
+ */
+function load(file, options = {}) {
+    const key = clipKey(file, options);
+    if (!file || !fs.existsSync(file)) {
+        clips.delete(key);
+        return Promise.resolve(false);
+    }
+
+    const job = decode(file, options)
+        .then((frames) => {
+            clips.set(key, frames);
+            console.log(`[SoundBank] Loaded ${path.basename(file)} (${frames.length} frames)`);
+            return true;
+        })
+        .catch((e) => {
+            console.error(`[SoundBank] Failed to decode ${file}:`, e.message);
+            return false;
+        })
+        .finally(() => {
+            if (loading.get(key) === job) loading.delete(key);
+        });
+    loading.set(key, job);
+    return job;
+}
+
+/**
+ * Audio resource for a clip straight from memory, or null if it isn't decoded yet
+ * (in which case decoding starts in the background for next time)
+ * @param {string} file
+ * @param {{ volume?: number, maxMs?: number }} [options]
+ */
+function createResource(file, options = {}) {
+    const key = clipKey(file, options);
+    const frames = clips.get(key);
+    if (frames) {
+        return createAudioResource(Readable.from(frames), { inputType: StreamType.Opus });
+    }
+    if (!loading.has(key)) load(file, options);
+    return null;
+}
+
+/**
+ * Decode the thinking chime and every configured join/leave sound
+ * @param {import('../../core/storage')} storage
+ */
+function preload(storage) {
+    const jobs = [load(THINKING_SOUND)];
+    for (const file of Object.values(storage.getJoinSounds())) jobs.push(load(file, THEME_OPTIONS));
+    for (const file of Object.values(storage.getLeaveSounds())) jobs.push(load(file, THEME_OPTIONS));
+    return Promise.all(jobs);
+}
+
+module.exports = {
+    THINKING_SOUND,
+    THEME_OPTIONS,
+    load,
+    preload,
+    createResource
+};
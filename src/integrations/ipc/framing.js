@@ -0,0 +1,82 @@
+/**
+ * Length-prefixed framing shared by Node and the resident Python workers.
+ * Mirrors src/integrations/ipc/framing.py
+ *
+ * Frame layout:
+ *   type (1 byte, ASCII) | id length (1 byte) | payload length (uint32 BE) | id (utf-8) | payload
+ */
+
+const HEADER_SIZE = 6;
+
+/**
+ * Encode a single frame
+ * @param {string} type - Single ASCII character
+ * @param {string} id - Stream / job ID (max 255 bytes)
+ * @param {Buffer} [payload]
+ * @returns {Buffer}
+ */
+function encodeFrame(type, id, payload = Buffer.alloc(0)) {
+    const idBuf = Buffer.from(id, 'utf8');
+    const header = Buffer.allocUnsafe(HEADER_SIZE);
+    header.write(type, 0, 1, 'ascii');
+    header.writeUInt8(idBuf.length, 1);
+    header.writeUInt32BE(payload.length, 2);
+    return Buffer.concat([header, idBuf, payload]);
+}
+
+/**
+ * Incremental frame decoder for a byte stream (e.g. child stdout)
+ */
+class FrameReader {
+    /**
+     * @param {Function} onFrame - (type, id, payload) => void
+     */
+    constructor(onFrame) {
+        this.onFrame = onFrame;
+        this.buffer = Buffer.alloc(0);
+    }
+
+    push(chunk) {
+        this.buffer = this.buffer.length ? Buffer.concat([this.buffer, chunk]) : chunk;
+
+        let offset = 0;
+        while (this.buffer.length - offset >= HEADER_SIZE) {
+            const idLen = this.buffer.readUInt8(offset + 1);
+            const payloadLen = this.buffer.readUInt32BE(offset + 2);
+            const total = HEADER_SIZE + idLen + payloadLen;
+            if (this.buffer.length - offset < total) break;
+
+            const type = String.fromCharCode(this.buffer[offset]);
+            const idStart = offset + HEADER_SIZE;
+            const id = this.buffer.toString('utf8', idStart, idStart + idLen);
+            const payload = this.buffer.subarray(idStart + idLen, offset + total);
+            offset += total;
+
+            this.onFrame(type, id, payload);
+        }
+
+        this.buffer = offset === this.buffer.length ? Buffer.alloc(0) : this.buffer.subarray(offset);
+    }
+}
+
+/**
+ * Turn a result frame from a transcription server back into its result object
+ * ('T' text, 'P' partial, 'X' error, 'D' done, 'J' JSON - see encode_result in framing.py)
+ * @returns {Object|null}
+ */
+function decodeResult(type, id, payload) {
+    const res = type === 'J' ? JSON.parse(payload.toString('utf8')) : {};
+    if (type === 'T') res.text = payload.toString('utf8');
+    else if (type === 'P') res.partial = payload.toString('utf8');
+    else if (type === 'X') res.error = payload.toString('utf8');
+    else if (type === 'D') res.done = true;
+    else if (type !== 'J') return null;
+    if (id) res.id = id;
+    return res;
+}
+
+module.exports = {
+    encodeFrame,
+    decodeResult,
+    FrameReader
+};
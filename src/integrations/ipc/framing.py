@@ -0,0 +1,113 @@
+"""
+Length-prefixed framing shared by the resident Python workers and Node.
+Mirrors src/integrations/ipc/framing.js
+
+Frame layout:
+    type (1 byte, ASCII) | id length (1 byte) | payload length (uint32 BE) | id (utf-8) | payload
+"""
+import json
+import struct
+import threading
+
+HEADER = struct.Struct('>cBI')
+
+
+def read_exact(stream, size):
+    """Read exactly `size` bytes, or return None if the stream closes first"""
+    if size == 0:
+        return b''
+    data = stream.read(size)
+    if not data:
+        return None
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def read_frame(stream):
+    """Read one frame. Returns (type, id, payload) or None on EOF"""
+    header = read_exact(stream, HEADER.size)
+    if header is None:
+        return None
+    ftype, id_len, payload_len = HEADER.unpack(header)
+    stream_id = read_exact(stream, id_len)
+    payload = read_exact(stream, payload_len)
+    if stream_id is None or payload is None:
+        return None
+    return ftype.decode('ascii'), stream_id.decode('utf-8'), payload
+
+
+def encode_frame(ftype, stream_id, payload=b''):
+    sid = stream_id.encode('utf-8')
+    return HEADER.pack(ftype.encode('ascii'), len(sid), len(payload)) + sid + payload
+
+
+# Result frames sent back by the transcription servers (mirrored by decodeResult in framing.js)
+RESULT_TYPES = {'text': 'T', 'partial': 'P', 'error': 'X'}
+
+
+def encode_result(res, stream_id=None):
+    """
+    Compact binary form of a result dict: {"text"} -> 'T', {"partial"} -> 'P', {"error"} -> 'X'
+    (payload is the UTF-8 string), {"done": true} -> 'D' (empty), anything else -> 'J' (JSON)
+    """
+    sid = stream_id or ''
+    keys = set(res) - {'id'}
+    if len(keys) == 1:
+        key = next(iter(keys))
+        if key in RESULT_TYPES:
+            return encode_frame(RESULT_TYPES[key], sid, str(res[key]).encode('utf-8'))
+        if key == 'done':
+            return encode_frame('D', sid)
+    return encode_frame('J', sid, json.dumps(res).encode('utf-8'))
+
+
+class FrameWriter:
+    """Thread-safe frame writer (worker threads share one stdout)"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def write(self, ftype, stream_id, payload=b''):
+        self.write_raw(encode_frame(ftype, stream_id, payload))
+
+    def write_result(self, res, stream_id=None):
+        self.write_raw(encode_result(res, stream_id))
+
+    def write_raw(self, data):
+        with self.lock:
+            self.stream.write(data)
+            self.stream.flush()
+
+
+def fatal(message, server):
+    """
+    Report an error that stops a worker before its loop starts (e.g. the model failed to load):
+    an untagged 'X' frame for a framed server, where Node would take a JSON line for a corrupt
+    frame, otherwise the legacy {"error"} JSON line
+    """
+    import sys
+    if server:
+        sys.stdout.buffer.write(encode_result({"error": message}))
+        sys.stdout.buffer.flush()
+        print(message, file=sys.stderr, flush=True)
+    else:
+        print(json.dumps({"error": message}), flush=True)
+
+
+def claim_stdout():
+    """
+    FrameWriter on the real stdout for a framed server; fd 1 is pointed at stderr
+    so stray prints from libraries can't corrupt the frame stream
+    """
+    import os
+    import sys
+    writer = FrameWriter(os.fdopen(os.dup(1), 'wb'))
+    sys.stdout.flush()
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    return writer
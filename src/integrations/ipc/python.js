@@ -0,0 +1,14 @@
+const path = require('path');
+
+/**
+ * Interpreter for the Python workers (transcription, TTS).
+ * On Linux, use the venv Python in the project root so vosk, faster-whisper, gTTS / edge-tts
+ * and VibeVoice are available; on Windows, whatever `python` is on the PATH.
+ */
+const PYTHON_CMD = process.platform === 'win32'
+    ? 'python'
+    : path.join(process.cwd(), 'venv', 'bin', 'python3');
+
+module.exports = {
+    PYTHON_CMD
+};
@@ -0,0 +1,62 @@
+"""
+Shared-memory ring buffers for streaming PCM from Node to the resident Python workers.
+Mirrors the writer side in src/integrations/transcription/index.js
+
+Node creates one fixed-size file per active speaker (under /dev/shm, so it's RAM),
+writes audio into it at (total bytes written) % size, and sends a small 'R' control
+frame with the absolute offset and length. The worker maps the file once and hands
+out memoryview slices of the mapping, so the audio itself is never copied through a
+pipe. The ring holds RING_SECONDS of audio; the reader only has to stay that close
+behind the writer.
+
+The file's last 8 bytes are the reader's acknowledged offset (uint64 BE): once a
+frame's slices have been used (decoded, or copied by whoever keeps them), consumed()
+stores its end there. The writer only looks at it when the ring seems full, and sends
+audio in-band instead of overwriting anything the reader hasn't got to.
+"""
+import os
+import mmap
+import struct
+
+RING_FRAME = struct.Struct('>QI')  # absolute byte offset, length
+ACK = struct.Struct('>Q')  # absolute byte offset consumed so far, at the end of the file
+
+
+class RingReader:
+    def __init__(self, path):
+        fd = os.open(path, os.O_RDWR)
+        try:
+            length = os.fstat(fd).st_size
+            self.mm = mmap.mmap(fd, length)
+        finally:
+            os.close(fd)
+        self.size = length - ACK.size  # Audio bytes; the ack follows them
+        self.view = memoryview(self.mm)
+
+    def read(self, payload):
+        """Slices of the ring for one 'R' frame (two when the write wrapped around)"""
+        offset, length = RING_FRAME.unpack(payload)
+        start = offset % self.size
+        end = start + length
+        if end <= self.size:
+            return [self.view[start:end]]
+        return [self.view[start:self.size], self.view[:end - self.size]]
+
+    def consumed(self, payload):
+        """Let the writer reuse the ring up to the end of this 'R' frame"""
+        offset, length = RING_FRAME.unpack(payload)
+        ACK.pack_into(self.mm, self.size, offset + length)
+
+    def close(self):
+        self.view.release()
+        try:
+            self.mm.close()
+        except BufferError:
+            pass  # A slice is still referenced somewhere; the mapping goes when it does
+
+
+def open_ring(payload):
+    """'O' frame payload is the ring path; empty means audio arrives in-band as 'A' frames"""
+    if not payload:
+        return None
+    return RingReader(payload.decode('utf-8'))
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Vosk vs Faster-Whisper micro-benchmark on a fixture corpus.
+
+Usage:
+  python benchmark.py <corpus dir> [--engines vosk,whisper] [--output results.jsonl]
+
+The corpus is the same one bench/replay.js uses: 16kHz mono 16-bit WAVs (or raw .pcm) and a
+manifest.json of {"file", "text"} entries ("text" is the reference transcript; "wake": true/false
+overrides whether the utterance counts as addressed to Mina).
+
+Every configuration runs in a child process of this script (--run), with the engine loaded
+in-process there, so load time and peak RSS belong to that configuration alone. Each one
+produces a JSON object: model load time, real-time factor, per-utterance latency, peak RSS,
+word error rate and wake-word recall (how often an utterance that starts with "Mina" still
+starts with one of the bot's wake phrases - the trigger words and the variants the classifier
+normalizes, meena, nina, ... - after transcription). The phrases come from MINA_WAKE_WORDS, or
+when that isn't set, from classifier.getWakePhrases() via node, exactly as the bot builds them. Results go to stdout as JSON lines and, with --output, are appended to a file
+together with the git revision and host so runs can be compared over time.
+
+Config grid (env):
+  BENCH_VOSK_MODELS=models/vosk-model-small-en-us-0.15
+  BENCH_WHISPER_MODELS=tiny.en,base.en
+  BENCH_WHISPER_BEAMS=1,5
+  BENCH_WHISPER_THREADS=<half the cores>,<all cores>
+  BENCH_WHISPER_DEVICE=cpu
+  BENCH_WHISPER_COMPUTE=int8
+"""
+import os
+import sys
+import json
+import time
+import socket
+import resource
+import platform
+import subprocess
+import numpy as np
+
+from whisper_profile import read_clip, SAMPLE_RATE
+from wakeword import wake_phrases, MAX_PREFIX_WORDS
+
+
+def env_list(name, default):
+    return [v.strip() for v in os.getenv(name, default).split(',') if v.strip()]
+
+
+CORES = os.cpu_count() or 1
+VOSK_MODELS = env_list('BENCH_VOSK_MODELS', 'models/vosk-model-small-en-us-0.15')
+WHISPER_MODELS = env_list('BENCH_WHISPER_MODELS', 'tiny.en,base.en')
+WHISPER_BEAMS = [int(b) for b in env_list('BENCH_WHISPER_BEAMS', '1,5')]
+WHISPER_THREADS = sorted({int(t) for t in env_list('BENCH_WHISPER_THREADS', f"{max(1, CORES // 2)},{CORES}")})
+WHISPER_DEVICE = os.getenv('BENCH_WHISPER_DEVICE', 'cpu')
+WHISPER_COMPUTE = os.getenv('BENCH_WHISPER_COMPUTE', 'int8')
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+
+def log(msg):
+    print(msg, file=sys.stderr, flush=True)
+
+
+def load_wake_phrases():
+    """The phrases the bot listens for, split into words"""
+    phrases = wake_phrases()
+    if not phrases:
+        script = "console.log(JSON.stringify(require('./src/core/nlu/classifier').getWakePhrases()))"
+        try:
+            out = subprocess.run(['node', '-e', script], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+            phrases = json.loads(out.stdout.strip().splitlines()[-1])
+        except Exception as e:
+            log(f"Could not get the wake phrases from node ({e}); set MINA_WAKE_WORDS to measure wake recall")
+            return []
+        os.environ['MINA_WAKE_WORDS'] = ','.join(phrases)  # The --run children inherit them
+    return [p.lower().split() for p in dict.fromkeys(phrases)]
+
+
+WAKE_PHRASES = load_wake_phrases()
+
+
+# --- Corpus & scoring ---
+
+def load_corpus(directory):
+    manifest = os.path.join(directory, 'manifest.json')
+    if os.path.exists(manifest):
+        with open(manifest) as f:
+            entries = json.load(f)
+    else:
+        entries = [{"file": f} for f in sorted(os.listdir(directory)) if f.lower().endswith(('.wav', '.pcm'))]
+
+    corpus = []
+    for entry in entries:
+        path = os.path.join(directory, entry['file'])
+        if path.lower().endswith('.wav'):
+            audio = read_clip(path)
+        else:
+            with open(path, 'rb') as f:
+                audio = np.frombuffer(f.read(), dtype=np.int16).astype(np.float32) / 32768.0
+        corpus.append(dict(entry, audio=audio))
+    return corpus
+
+
+def words(text):
+    cleaned = ''.join(c if c.isalnum() or c in "' " else ' ' for c in (text or '').lower())
+    return cleaned.split()
+
+
+def edit_distance(ref, hyp):
+    previous = list(range(len(hyp) + 1))
+    for i in range(1, len(ref) + 1):
+        row = [i]
+        for j in range(1, len(hyp) + 1):
+            row.append(min(previous[j] + 1, row[j - 1] + 1,
+                           previous[j - 1] + (ref[i - 1] != hyp[j - 1])))
+        previous = row
+    return previous[-1]
+
+
+def wake_word(text):
+    """The wake phrase (variant) the utterance starts with, within the first few words, or None"""
+    tokens = words(text)
+    for start in range(min(len(tokens), MAX_PREFIX_WORDS + 1)):
+        for phrase in WAKE_PHRASES:
+            if tokens[start:start + len(phrase)] == phrase:
+                return " ".join(phrase)
+    return None
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(np.ceil(p / 100 * len(ordered))) - 1))]
+
+
+# --- Engines (run inside the child process) ---
+
+def load_vosk(config):
+    from vosk import Model, KaldiRecognizer, SetLogLevel
+    SetLogLevel(-1)
+    model = Model(config['model'])
+
+    def transcribe(audio):
+        rec = KaldiRecognizer(model, SAMPLE_RATE)
+        pcm = (audio * 32768).astype('<i2').tobytes()
+        texts = []
+        for offset in range(0, len(pcm), 4000):
+            if rec.AcceptWaveform(pcm[offset:offset + 4000]):
+                texts.append(json.loads(rec.Result())['text'])
+        texts.append(json.loads(rec.FinalResult())['text'])
+        return " ".join(t for t in texts if t)
+
+    return transcribe
+
+
+def load_whisper(config):
+    from faster_whisper import WhisperModel
+    model = WhisperModel(config['model'], device=config['device'], compute_type=config['compute_type'],
+                         cpu_threads=config['cpu_threads'])
+
+    def transcribe(audio):
+        segments, _ = model.transcribe(audio, language="en", beam_size=config['beam_size'], temperature=0.0,
+                                       vad_filter=False, condition_on_previous_text=False)
+        return " ".join(s.text.strip() for s in segments)
+
+    return transcribe
+
+
+LOADERS = {'vosk': load_vosk, 'whisper': load_whisper}
+
+
+def run_config(config, corpus_dir):
+    """Child process: load one engine configuration and decode the whole corpus with it"""
+    corpus = load_corpus(corpus_dir)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    transcribe = LOADERS[config['engine']](config)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    transcribe(corpus[0]['audio'][:SAMPLE_RATE])  # Warm-up, not timed
+
+    latencies, ref_words, errors = [], 0, 0
+    wake_total, wake_hits, heard_as = 0, 0, {}
+    for item in corpus:
+        start = time.perf_counter()
+        hypothesis = transcribe(item['audio'])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        if 'text' in item:
+            ref = words(item['text'])
+            ref_words += len(ref)
+            errors += edit_distance(ref, words(hypothesis))
+
+        addressed = item.get('wake', wake_word(item.get('text', '')) is not None)
+        if addressed:
+            wake_total += 1
+            heard = wake_word(hypothesis)
+            heard_as[heard or 'missed'] = heard_as.get(heard or 'missed', 0) + 1
+            wake_hits += heard is not None
+
+    audio_seconds = sum(len(item['audio']) for item in corpus) / SAMPLE_RATE
+    decode_seconds = sum(latencies) / 1000
+    return dict(
+        config,
+        utterances=len(corpus),
+        load_ms=round(load_ms),
+        audio_seconds=round(audio_seconds, 2),
+        decode_seconds=round(decode_seconds, 3),
+        rtf=round(decode_seconds / audio_seconds, 4) if audio_seconds else None,
+        latency_p50_ms=round(percentile(latencies, 50)),
+        latency_p95_ms=round(percentile(latencies, 95)),
+        # ru_maxrss is in KiB on Linux
+        peak_rss_mb=round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        baseline_rss_mb=round(rss_before / 1024, 1),
+        wer=round(errors / ref_words, 4) if ref_words else None,
+        wake_recall=round(wake_hits / wake_total, 4) if wake_total else None,
+        wake_utterances=wake_total,
+        wake_heard_as=heard_as,
+    )
+
+
+# --- Parent: build the grid, run each configuration in isolation ---
+
+def config_grid(engines):
+    configs = []
+    if 'vosk' in engines:
+        configs += [{"engine": "vosk", "model": m} for m in VOSK_MODELS]
+    if 'whisper' in engines:
+        for model in WHISPER_MODELS:
+            for beam in WHISPER_BEAMS:
+                for threads in WHISPER_THREADS:
+                    configs.append({"engine": "whisper", "model": model, "beam_size": beam, "cpu_threads": threads,
+                                    "device": WHISPER_DEVICE, "compute_type": WHISPER_COMPUTE})
+    return configs
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_child(config, corpus_dir):
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--run', json.dumps(config), corpus_dir],
+                          capture_output=True, text=True)
+    lines = [line for line in proc.stdout.splitlines() if line.strip()]
+    if proc.returncode != 0 or not lines:
+        return dict(config, error=(proc.stderr.strip().splitlines() or ['failed'])[-1])
+    return json.loads(lines[-1])
+
+
+def summary_line(res):
+    name = res['engine'] + ' ' + os.path.basename(res['model'])
+    if res['engine'] == 'whisper':
+        name += f" beam={res['beam_size']} threads={res['cpu_threads']}"
+    if 'error' in res:
+        return f"{name}: ERROR {res['error']}"
+    wer = '-' if res['wer'] is None else f"{res['wer'] * 100:.1f}%"
+    recall = '-' if res['wake_recall'] is None else f"{res['wake_recall'] * 100:.0f}%"
+    return (f"{name}: load {res['load_ms']}ms, RTF {res['rtf']}, p50 {res['latency_p50_ms']}ms, "
+            f"p95 {res['latency_p95_ms']}ms, RSS {res['peak_rss_mb']}MB, WER {wer}, wake recall {recall}")
+
+
+def main(argv):
+    if len(argv) < 1:
+        log(__doc__)
+        return 1
+    corpus_dir = argv[0]
+    engines = ['vosk', 'whisper']
+    output = None
+    if '--engines' in argv:
+        engines = argv[argv.index('--engines') + 1].split(',')
+    if '--output' in argv:
+        output = argv[argv.index('--output') + 1]
+
+    run = {
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "revision": git_revision(),
+        "host": socket.gethostname(),
+        "cpu_count": CORES,
+        "platform": platform.platform(),
+        "corpus": os.path.abspath(corpus_dir),
+    }
+
+    configs = config_grid(engines)
+    log(f"Benchmarking {len(configs)} configurations on {corpus_dir}")
+    failed = 0
+    for config in configs:
+        res = run_child(config, corpus_dir)
+        failed += 'error' in res
+        log(summary_line(res))
+        line = json.dumps(dict(run, **res))
+        print(line, flush=True)
+        if output:
+            with open(output, 'a') as f:
+                f.write(line + '\n')
+    return 1 if failed == len(configs) else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3 and sys.argv[1] == '--run':
+        print(json.dumps(run_config(json.loads(sys.argv[2]), sys.argv[3])), flush=True)
+    else:
+        sys.exit(main(sys.argv[1:]))
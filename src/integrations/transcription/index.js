@@ -1,6 +1,10 @@
 const { spawn } = require('child_process');
 const path = require('path');
 const fs = require('fs');
+const { encodeFrame, decodeResult, FrameReader } = require('../ipc/framing');
+const { PYTHON_CMD } = require('../ipc/python');
+const metrics = require('../../core/metrics');
+const { getWakePhrases } = require('../../core/nlu/classifier');
 
 // Select transcription engine: 'vosk' or 'whisper'
 const TRANSCRIPTION_ENGINE = process.env.TRANSCRIPTION_ENGINE || 'vosk';
@@ -8,17 +12,232 @@ const PYTHON_SCRIPT = TRANSCRIPTION_ENGINE === 'whisper'
     ? path.join(__dirname, 'transcribe_whisper.py')
     : path.join(__dirname, 'transcribe.py');
 
-// Detect Python command based on OS
-// On Linux, use the venv Python to ensure vosk is available
-const isWin = process.platform === 'win32';
-const PYTHON_CMD = isWin
-    ? 'python'
-    : path.join(process.cwd(), 'venv', 'bin', 'python3');
+// Resident server mode (one long-lived Python process for all users).
+// Set TRANSCRIPTION_SERVER=false to go back to one process per utterance.
+// WAKEWORD_GATE=true makes the server skip full recognition unless a wake word starts the utterance.
+const SERVER_MODE = (process.env.TRANSCRIPTION_SERVER || 'true').toLowerCase() !== 'false';
+
+// Server mode: audio goes through a per-speaker ring file in /dev/shm (see ipc/ring.py) and only
+// small control frames cross the pipe. Set TRANSCRIPTION_SHM=false to send audio in-band instead.
+const SHM_DIR = '/dev/shm';
+const USE_SHM = SERVER_MODE
+    && (process.env.TRANSCRIPTION_SHM || 'true').toLowerCase() !== 'false'
+    && fs.existsSync(SHM_DIR);
+// How far (in seconds of 16kHz mono s16le) the server may fall behind before audio goes in-band
+const RING_SECONDS = parseInt(process.env.TRANSCRIPTION_RING_SECONDS || '30', 10);
+const RING_BYTES = RING_SECONDS * 16000 * 2;
+// The ring file ends with the reader's acknowledged offset (uint64 BE)
+const RING_ACK_BYTES = 8;
 
 console.log(`Transcription Engine: ${TRANSCRIPTION_ENGINE.toUpperCase()} (${PYTHON_SCRIPT})`);
 
-// Function to handle a PCM stream
-function transcribeStream(inputStream, userId, callback) {
+// --- Resident Server ---
+
+let server = null; // { process, sessions: Map<streamId, { userId, callback, onPartial, onDone, ring }>, outbox }
+let streamSeq = 0;
+let ringOverflows = 0; // Chunks sent in-band because the server was a whole ring behind
+
+function getServer() {
+    if (server) return server;
+
+    const pythonProcess = spawn(PYTHON_CMD, [PYTHON_SCRIPT, '--server'], {
+        stdio: ['pipe', 'pipe', 'pipe'],
+        env: { ...process.env, MINA_WAKE_WORDS: getWakePhrases().join(',') }
+    });
+
+    const current = { process: pythonProcess, sessions: new Map(), outbox: [] };
+    server = current;
+    console.log(`[Transcriber] Started resident ${TRANSCRIPTION_ENGINE} server (pid ${pythonProcess.pid})`);
+
+    pythonProcess.on('error', (err) => {
+        console.error(`[Transcriber] Failed to spawn resident server:`, err);
+    });
+
+    pythonProcess.stdin.on('error', (err) => {
+        console.error(`[Transcriber] Server stdin error:`, err);
+    });
+
+    // Results come back as frames (see encode_result in ipc/framing.py)
+    const reader = new FrameReader((type, id, payload) => {
+        try {
+            const res = decodeResult(type, id, payload);
+            if (res) handleServerMessage(current, res);
+        } catch (e) {
+            console.error(`[Transcriber] Bad result frame:`, e);
+        }
+    });
+    pythonProcess.stdout.on('data', (data) => reader.push(data));
+
+    pythonProcess.stderr.on('data', (data) => {
+        console.error(`[Transcriber stderr]: ${data.toString().trim()}`);
+    });
+
+    pythonProcess.on('close', (code) => {
+        console.log(`[Transcriber] Resident server exited with code ${code} (${current.sessions.size} streams dropped)`);
+        if (server === current) server = null;
+        for (const session of current.sessions.values()) {
+            closeRing(session.ring);
+            if (session.onDone) session.onDone();
+        }
+        current.sessions.clear();
+    });
+
+    return current;
+}
+
+function handleServerMessage(current, res) {
+    if (res.ready) {
+        console.log(`[Transcriber] Resident server ready (model loaded in ${res.load_ms}ms).`);
+        if (res.load_ms !== undefined) {
+            metrics.setGauge('mina_transcriber_model_load_seconds', res.load_ms / 1000,
+                { engine: TRANSCRIPTION_ENGINE }, 'Model load time of the resident transcriber');
+        }
+        return;
+    }
+    observeInference(res);
+
+    const session = res.id ? current.sessions.get(res.id) : null;
+    if (res.error) {
+        console.error(`Transcriber Error [${session ? `User ${session.userId}` : 'server'}]:`, res.error);
+    }
+    if (!session) return;
+
+    if (res.partial && session.onPartial) {
+        session.onPartial(session.userId, res.partial);
+    }
+    if (res.text) {
+        session.callback(session.userId, res.text);
+    }
+    if (res.done) {
+        current.sessions.delete(res.id);
+        closeRing(session.ring);
+        if (session.onDone) session.onDone();
+    }
+}
+
+function observeInference(res) {
+    if (res.inference_ms === undefined) return;
+    metrics.observe('mina_transcriber_inference_seconds', res.inference_ms / 1000,
+        { engine: TRANSCRIPTION_ENGINE }, 'Recognizer time per transcript, as reported by the Python worker');
+}
+
+/**
+ * Queue a frame (or a ring's pending audio, see queueRing) for the server. Everything queued
+ * from every speaker goes out as one stdin write per event-loop turn instead of one write per
+ * 20ms Opus packet.
+ */
+function sendFrame(current, frame) {
+    if (server !== current || !current.process.stdin.writable) return;
+    current.outbox.push(frame);
+    if (current.outbox.length > 1) return;
+    setImmediate(() => {
+        const items = current.outbox;
+        current.outbox = [];
+        const frames = items.map((item) => (Buffer.isBuffer(item) ? item : flushRing(item.streamId, item.ring)));
+        if (current.process.stdin.writable) current.process.stdin.write(Buffer.concat(frames));
+    });
+}
+
+// --- Shared-memory audio ring (reader side: ipc/ring.py) ---
+
+function openRing(streamId) {
+    const file = path.join(SHM_DIR, `mina-${process.pid}-${streamId.replace(/[^\w-]/g, '_')}.pcm`);
+    try {
+        const fd = fs.openSync(file, 'w+');
+        fs.ftruncateSync(fd, RING_BYTES + RING_ACK_BYTES);
+        return { file, fd, written: 0, acked: 0, pending: [], overflowed: false };
+    } catch (e) {
+        console.error(`[Transcriber] Could not create audio ring ${file}, sending audio in-band:`, e.message);
+        return null;
+    }
+}
+
+/**
+ * Queue a chunk for a stream's ring. Chunks that arrive in the same event-loop turn are
+ * written together when the outbox is flushed: one positional write (two if it wraps) and
+ * one 'R' frame, in the chunk's place among the stream's frames.
+ */
+function queueRing(current, streamId, ring, chunk) {
+    if (server !== current || !current.process.stdin.writable) return;
+    if (!ring.pending.length) sendFrame(current, { streamId, ring });
+    ring.pending.push(chunk);
+}
+
+function flushRing(streamId, ring) {
+    const data = ring.pending.length === 1 ? ring.pending[0] : Buffer.concat(ring.pending);
+    ring.pending = [];
+    if (ring.fd === null) return Buffer.alloc(0); // The stream already ended
+    if (ringHasRoom(ring, data.length)) return encodeFrame('R', streamId, writeRing(ring, data));
+
+    // Writing would overwrite audio the server hasn't read yet
+    ringOverflows++;
+    if (!ring.overflowed) {
+        ring.overflowed = true;
+        console.warn(`[Transcriber] Server is ${RING_SECONDS}s behind on ${streamId}, sending its audio in-band`);
+    }
+    return encodeFrame('A', streamId, data);
+}
+
+// The reader's acknowledged offset is only read (one pread) when the ring looks full
+function ringHasRoom(ring, length) {
+    if (ring.written + length - ring.acked <= RING_BYTES) return true;
+    const ack = Buffer.alloc(RING_ACK_BYTES);
+    fs.readSync(ring.fd, ack, 0, RING_ACK_BYTES, RING_BYTES);
+    ring.acked = Number(ack.readBigUInt64BE(0));
+    return ring.written + length - ring.acked <= RING_BYTES;
+}
+
+/**
+ * Copy audio into the ring (wrapping at the end) and return the 'R' frame payload:
+ * absolute offset (uint64 BE) + length (uint32 BE)
+ */
+function writeRing(ring, chunk) {
+    const start = ring.written % RING_BYTES;
+    const first = Math.min(chunk.length, RING_BYTES - start);
+    fs.writeSync(ring.fd, chunk, 0, first, start);
+    if (first < chunk.length) fs.writeSync(ring.fd, chunk, first, chunk.length - first, 0);
+
+    const header = Buffer.alloc(12);
+    header.writeBigUInt64BE(BigInt(ring.written), 0);
+    header.writeUInt32BE(chunk.length, 8);
+    ring.written += chunk.length;
+    return header;
+}
+
+function closeRing(ring) {
+    if (!ring || ring.fd === null) return;
+    try {
+        fs.closeSync(ring.fd);
+        fs.unlinkSync(ring.file);
+    } catch (e) {
+        console.error(`[Transcriber] Failed to remove audio ring ${ring.file}:`, e.message);
+    }
+    ring.fd = null;
+}
+
+function transcribeViaServer(inputStream, userId, callback, onPartial, onDone) {
+    const current = getServer();
+    const streamId = `${userId}:${++streamSeq}`;
+    const ring = USE_SHM ? openRing(streamId) : null;
+    current.sessions.set(streamId, { userId, callback, onPartial, onDone, ring });
+
+    const send = (type, payload) => sendFrame(current, encodeFrame(type, streamId, payload));
+
+    send('O', ring ? Buffer.from(ring.file) : undefined);
+    inputStream.on('data', (chunk) => {
+        if (ring && ring.fd !== null) queueRing(current, streamId, ring, chunk);
+        else send('A', chunk);
+    });
+    inputStream.on('end', () => send('E'));
+    inputStream.on('error', (err) => {
+        console.error(`[Pipe Error] Audio stream error for ${userId}:`, err);
+        send('E');
+    });
+}
+
+// --- Per-utterance Process (legacy) ---
+
+function transcribeViaProcess(inputStream, userId, callback, onPartial, onDone) {
     // Spawn python process
     // python transcribe.py
     // Stdin: PCM data
@@ -54,13 +273,16 @@ function transcribeStream(inputStream, userId, callback) {
             if (!line.trim()) continue;
             try {
                 const res = JSON.parse(line);
-                if (res.text) {
+                observeInference(res);
+                if (res.partial) {
+                    if (onPartial) onPartial(userId, res.partial);
+                } else if (res.text) {
                     callback(userId, res.text);
                 } else if (res.error) {
                     console.error(`Transcriber Error [User ${userId}]:`, res.error);
                 }
             } catch (e) {
-                // Partial JSON? 
+                // Partial JSON?
                 console.error(`JSON Parse Error [${userId}]:`, e);
             }
         }
@@ -73,6 +295,7 @@ function transcribeStream(inputStream, userId, callback) {
 
     pythonProcess.on('close', (code) => {
         console.log(`Transcriber process for ${userId} exited with code ${code}`);
+        if (onDone) onDone();
     });
 
     // Handle stream end
@@ -82,13 +305,40 @@ function transcribeStream(inputStream, userId, callback) {
     });
 }
 
+/**
+ * Transcribe a PCM stream (16kHz mono s16le)
+ * @param {import('stream').Readable} inputStream
+ * @param {string} userId
+ * @param {Function} callback - (userId, text) => void, once per final transcript
+ * @param {Function} [onPartial] - (userId, text) => void, early partial transcripts (whisper only)
+ * @param {Function} [onDone] - () => void, once the transcriber has finished with the stream
+ */
+function transcribeStream(inputStream, userId, callback, onPartial, onDone) {
+    if (SERVER_MODE) {
+        return transcribeViaServer(inputStream, userId, callback, onPartial, onDone);
+    }
+    return transcribeViaProcess(inputStream, userId, callback, onPartial, onDone);
+}
+
 function initModel() {
-    // No-op for now, Python script checks model
     const engineName = TRANSCRIPTION_ENGINE === 'whisper' ? 'Faster-Whisper (GPU)' : 'Vosk (CPU)';
-    console.log(`Transcription Engine: ${engineName} - Python Subprocess mode ready.`);
+    if (SERVER_MODE) {
+        // Load the model once up front instead of on the first utterance
+        getServer();
+        console.log(`Transcription Engine: ${engineName} - Resident server mode.`);
+    } else {
+        console.log(`Transcription Engine: ${engineName} - Python Subprocess mode ready.`);
+    }
 }
 
+metrics.registerCollector(() => {
+    if (!USE_SHM) return;
+    metrics.setCounter('mina_transcription_ring_overflows_total', ringOverflows, {},
+        'Audio sent in-band because the transcriber had fallen a whole ring behind');
+});
+
 module.exports = {
+    ENGINE: TRANSCRIPTION_ENGINE,
     initModel,
     transcribeStream
 };
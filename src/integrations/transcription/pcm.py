@@ -0,0 +1,69 @@
+"""
+PCM helpers shared by the transcription workers
+"""
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+class PCMBuffer:
+    """
+    Growable int16 sample buffer.
+    Appends are amortised O(1) (capacity doubles) instead of the O(n) copy `bytes +=` does,
+    and views into it are numpy slices, so decoding a window never copies the whole utterance.
+    """
+
+    def __init__(self, capacity_seconds=10):
+        self.data = np.empty(SAMPLE_RATE * capacity_seconds, dtype=np.int16)
+        self.length = 0
+        self.carry = b''  # Odd trailing byte from a chunk split mid-sample
+
+    def __len__(self):
+        return self.length
+
+    def append(self, chunk):
+        if self.carry:
+            chunk = self.carry + bytes(chunk)
+            self.carry = b''
+        if len(chunk) % 2:
+            self.carry = bytes(chunk[-1:])
+            chunk = chunk[:-1]
+        if not chunk:
+            return
+
+        samples = np.frombuffer(chunk, dtype=np.int16)
+        needed = self.length + len(samples)
+        if needed > len(self.data):
+            capacity = len(self.data) * 2
+            while capacity < needed:
+                capacity *= 2
+            grown = np.empty(capacity, dtype=np.int16)
+            grown[:self.length] = self.data[:self.length]
+            self.data = grown
+
+        self.data[self.length:needed] = samples
+        self.length = needed
+
+    def view(self, start=0, end=None):
+        """int16 samples [start, end) without copying"""
+        end = self.length if end is None else min(end, self.length)
+        return self.data[max(0, start):end]
+
+    def seconds(self):
+        return self.length / SAMPLE_RATE
+
+    def reset(self):
+        self.length = 0
+        self.carry = b''
+
+
+def as_int16(audio):
+    """16-bit PCM bytes -> int16 samples (no copy); arrays pass through"""
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        return np.frombuffer(audio, dtype=np.int16)
+    return audio
+
+
+def to_float32(audio):
+    """16-bit PCM (bytes or int16 array) -> float32 samples in [-1, 1]"""
+    return as_int16(audio).astype(np.float32) / 32768.0
@@ -0,0 +1,157 @@
+const transcription = require('./index');
+const metrics = require('../../core/metrics');
+
+// Admission control in front of transcribeStream: at most MAX_CONCURRENT streams are
+// transcribed at once, the rest wait (audio stays buffered in the paused PCM stream).
+// Users who addressed Mina recently jump the queue; anything that waits too long is dropped
+// so the queue can't turn into minutes of stale speech.
+
+const DEFAULT_CONCURRENCY = { vosk: 12, whisper: 6 };
+const ENGINE = transcription.ENGINE;
+const MAX_CONCURRENT = parseInt(
+    process.env[`TRANSCRIPTION_MAX_CONCURRENT_${ENGINE.toUpperCase()}`] || DEFAULT_CONCURRENCY[ENGINE] || 8, 10);
+const QUEUE_MAX = parseInt(process.env.TRANSCRIPTION_QUEUE_MAX || '32', 10);
+const QUEUE_MAX_AGE_MS = parseInt(process.env.TRANSCRIPTION_QUEUE_MAX_AGE_MS || '5000', 10);
+// How long after a wake word a user's speech counts as priority
+const PRIORITY_WINDOW_MS = parseInt(process.env.TRANSCRIPTION_PRIORITY_WINDOW_MS || '60000', 10);
+
+let active = 0;
+const queues = { priority: [], normal: [] }; // FIFO of jobs per class
+const addressedAt = new Map(); // userId -> timestamp of last wake word
+const stats = { admitted: 0, queued: 0, dequeued: 0, droppedAge: 0, droppedFull: 0, waitTotalMs: 0, waitMaxMs: 0 };
+let sweepTimer = null;
+
+/**
+ * Record that a user just addressed the bot, so their next utterances are admitted first
+ * @param {string} userId
+ */
+function markAddressed(userId) {
+    addressedAt.set(userId, Date.now());
+}
+
+function isPriority(userId) {
+    const last = addressedAt.get(userId);
+    if (last === undefined) return false;
+    if (Date.now() - last > PRIORITY_WINDOW_MS) {
+        addressedAt.delete(userId);
+        return false;
+    }
+    return true;
+}
+
+function start(job) {
+    active++;
+    stats.admitted++;
+    if (job.queuedAt) {
+        const waited = Date.now() - job.queuedAt;
+        stats.dequeued++;
+        stats.waitTotalMs += waited;
+        stats.waitMaxMs = Math.max(stats.waitMaxMs, waited);
+        metrics.observe('mina_transcription_queue_wait_seconds', waited / 1000, {},
+            'Time utterances spent queued for a transcription slot');
+    }
+    if (job.trace) job.trace.mark('transcriber_start');
+
+    let released = false;
+    const release = () => {
+        if (released) return;
+        released = true;
+        active--;
+        pump();
+    };
+    transcription.transcribeStream(job.stream, job.userId, job.callback, job.onPartial, release);
+}
+
+function drop(job, reason) {
+    if (reason === 'age') stats.droppedAge++;
+    else stats.droppedFull++;
+    console.log(`[Scheduler] Dropped utterance from ${job.userId} (${reason}, waited ${Date.now() - job.queuedAt}ms)`);
+    job.stream.resume(); // Discard the buffered audio
+}
+
+function expire() {
+    const cutoff = Date.now() - QUEUE_MAX_AGE_MS;
+    for (const queue of Object.values(queues)) {
+        while (queue.length && queue[0].queuedAt < cutoff) drop(queue.shift(), 'age');
+    }
+}
+
+function pump() {
+    expire();
+    while (active < MAX_CONCURRENT) {
+        const job = queues.priority.shift() || queues.normal.shift();
+        if (!job) break;
+        start(job);
+    }
+    scheduleSweep();
+}
+
+// Wake up when the oldest queued job would expire, even if no slot frees up
+function scheduleSweep() {
+    clearTimeout(sweepTimer);
+    sweepTimer = null;
+    const heads = [queues.priority[0], queues.normal[0]].filter(Boolean);
+    if (!heads.length) return;
+    const oldest = Math.min(...heads.map((job) => job.queuedAt));
+    sweepTimer = setTimeout(pump, Math.max(0, oldest + QUEUE_MAX_AGE_MS - Date.now()) + 1);
+}
+
+/**
+ * Transcribe a PCM stream as soon as there is capacity (same arguments as transcribeStream)
+ * @param {import('stream').Readable} inputStream
+ * @param {string} userId
+ * @param {Function} callback
+ * @param {Function} [onPartial]
+ * @param {import('../../core/metrics').Trace} [trace] - marked when transcription starts
+ */
+function submit(inputStream, userId, callback, onPartial, trace) {
+    const job = { stream: inputStream, userId, callback, onPartial, trace, queuedAt: 0 };
+    if (active < MAX_CONCURRENT && !queues.priority.length && !queues.normal.length) {
+        start(job);
+        return;
+    }
+
+    job.queuedAt = Date.now();
+    stats.queued++;
+    const queue = isPriority(userId) ? queues.priority : queues.normal;
+    queue.push(job);
+
+    // Full: shed the oldest normal utterance first, priority speech only as a last resort
+    if (queues.priority.length + queues.normal.length > QUEUE_MAX) {
+        drop(queues.normal.length ? queues.normal.shift() : queues.priority.shift(), 'queue full');
+    }
+    pump();
+}
+
+/**
+ * Current load: active streams, queue depth, wait times and drop counts
+ */
+function getStats() {
+    return {
+        engine: ENGINE,
+        limit: MAX_CONCURRENT,
+        active,
+        queued: queues.priority.length + queues.normal.length,
+        queuedPriority: queues.priority.length,
+        admitted: stats.admitted,
+        queuedTotal: stats.queued,
+        dropped: { age: stats.droppedAge, full: stats.droppedFull },
+        waitAvgMs: stats.dequeued ? Math.round(stats.waitTotalMs / stats.dequeued) : 0,
+        waitMaxMs: stats.waitMaxMs
+    };
+}
+
+metrics.registerCollector(() => {
+    const current = getStats();
+    metrics.setGauge('mina_transcription_active', current.active, {}, 'Utterances being transcribed');
+    metrics.setGauge('mina_transcription_queued', current.queued, {}, 'Utterances waiting for a transcription slot');
+    metrics.setCounter('mina_transcription_dropped_total', current.dropped.age, { reason: 'age' },
+        'Queued utterances dropped without being transcribed');
+    metrics.setCounter('mina_transcription_dropped_total', current.dropped.full, { reason: 'full' });
+});
+
+module.exports = {
+    submit,
+    markAddressed,
+    getStats
+};
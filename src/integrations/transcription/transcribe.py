@@ -1,40 +1,213 @@
 import sys
 import os
 import json
+import time
 from vosk import Model, KaldiRecognizer
 
+try:
+    # The binding's own FFI: from_buffer() lets ring slices reach libvosk without a copy
+    from vosk import _ffi as vosk_ffi
+except ImportError:
+    vosk_ffi = None
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ipc'))
+import framing
+import ring
+import wakeword
+
 # Point to the model directory
 MODEL_PATH = "models/vosk-model-small-en-us-0.15"
+SAMPLE_RATE = 16000
+
+# Idle recognizers kept around for reuse in server mode
+POOL_SIZE = int(os.getenv('VOSK_POOL_SIZE', '8'))
+
+# Server mode: binary result frames on stdout (None = JSON lines, legacy mode)
+results = None
+
+SERVER_MODE = '--server' in sys.argv
 
 if not os.path.exists(MODEL_PATH):
-    print(json.dumps({"error": f"Model not found at {MODEL_PATH}"}))
+    framing.fatal(f"Model not found at {MODEL_PATH}", SERVER_MODE)
     sys.exit(1)
 
 # Initialize Model
+load_start = time.monotonic()
 try:
     model = Model(MODEL_PATH)
 except Exception as e:
-    print(json.dumps({"error": str(e)}))
+    framing.fatal(str(e), SERVER_MODE)
     sys.exit(1)
+# Reported to Node with the ready message
+LOAD_MS = round((time.monotonic() - load_start) * 1000)
+
+
+def waveform(chunk):
+    """PCM for AcceptWaveform: a char[] over the chunk's own memory, or a bytes copy"""
+    if vosk_ffi is not None:
+        return vosk_ffi.from_buffer(chunk)
+    return bytes(chunk)
+
+
+class RecognizerPool:
+    """Reusable KaldiRecognizers - creating one per utterance is cheap, reloading the model is not"""
 
-# Create recognizer - using 16kHz to match model expectations
-rec = KaldiRecognizer(model, 16000)
+    def __init__(self, model, max_idle):
+        self.model = model
+        self.max_idle = max_idle
+        self.idle = []
 
-while True:
-    data = sys.stdin.buffer.read(4000)
-    if len(data) == 0:
-        break
-    
-    if rec.AcceptWaveform(data):
-        res = json.loads(rec.Result())
+    def acquire(self):
+        if self.idle:
+            return self.idle.pop()
+        return KaldiRecognizer(self.model, SAMPLE_RATE)
+
+    def release(self, rec):
+        if len(self.idle) >= self.max_idle:
+            return
+        rec.Reset()
+        self.idle.append(rec)
+
+
+class Stream:
+    """One speaker's utterance: optional wake-word gate in front of a pooled recognizer"""
+
+    def __init__(self, stream_id, pool, spotter, ring_buffer=None):
+        self.stream_id = stream_id
+        self.pool = pool
+        self.gate = spotter.gate() if spotter else None
+        self.rec = None
+        self.ring = ring_buffer
+        self.busy = 0.0  # Seconds spent in the recognizer since the last result
+
+    def result(self, raw):
+        """Emit a recognizer result with the recognizer time that went into it"""
+        res = json.loads(raw)
         if res['text']:
-            print(json.dumps(res), flush=True)
-    else:
-        # Partial result (optional to print)
-        # res = json.loads(rec.PartialResult())
-        pass
+            res['inference_ms'] = round(self.busy * 1000)
+            emit(res, self.stream_id)
+        self.busy = 0.0
+
+    def decode(self, chunks):
+        for chunk in chunks:
+            if self.rec is None:
+                self.rec = self.pool.acquire()
+            start = time.monotonic()
+            final = self.rec.AcceptWaveform(waveform(chunk))
+            self.busy += time.monotonic() - start
+            if final:
+                self.result(self.rec.Result())
+
+    def accept(self, chunk):
+        self.decode(self.gate.feed(chunk) if self.gate else [chunk])
+
+    def finish(self):
+        if self.gate:
+            self.decode(self.gate.finish())
+        if self.rec is not None:
+            start = time.monotonic()
+            raw = self.rec.FinalResult()
+            self.busy += time.monotonic() - start
+            self.result(raw)
+            self.pool.release(self.rec)
+            self.rec = None
 
-# Final result
-res = json.loads(rec.FinalResult())
-if res['text']:
+    def close(self):
+        if self.ring:
+            self.ring.close()
+            self.ring = None
+
+
+def emit(res, stream_id=None):
+    if results:
+        results.write_result(res, stream_id)
+        return
+    if stream_id is not None:
+        res["id"] = stream_id
     print(json.dumps(res), flush=True)
+
+
+def run_single():
+    """Legacy mode: one utterance on stdin, JSON lines on stdout"""
+    # Create recognizer - using 16kHz to match model expectations
+    rec = KaldiRecognizer(model, SAMPLE_RATE)
+
+    while True:
+        data = sys.stdin.buffer.read(4000)
+        if len(data) == 0:
+            break
+
+        if rec.AcceptWaveform(data):
+            res = json.loads(rec.Result())
+            if res['text']:
+                emit(res)
+
+    # Final result
+    res = json.loads(rec.FinalResult())
+    if res['text']:
+        emit(res)
+
+
+def run_server():
+    """
+    Resident mode: many users' PCM multiplexed over framed stdin.
+    Frames: 'O' open stream (payload: shared-memory ring path, or empty), 'A' in-band audio,
+    'R' audio written to the ring (see ipc/ring.py), 'E' end of stream (see ipc/framing.py)
+    Results go out as binary frames tagged with the stream ID: text with its recognizer time
+    ({"text", "inference_ms"} as a 'J' frame), 'D' done, 'X' error.
+    The ready message carries the model load time as "load_ms".
+    With WAKEWORD_GATE=true only utterances that start with a wake word are decoded.
+    """
+    global results
+    results = framing.claim_stdout()
+    pool = RecognizerPool(model, POOL_SIZE)
+    spotter = wakeword.load_spotter(model)
+    sessions = {}  # stream id -> Stream
+    stdin = sys.stdin.buffer
+
+    emit({"ready": True, "load_ms": LOAD_MS})
+
+    while True:
+        frame = framing.read_frame(stdin)
+        if frame is None:
+            break
+        ftype, stream_id, payload = frame
+
+        try:
+            if ftype == 'O':
+                if stream_id not in sessions:
+                    sessions[stream_id] = Stream(stream_id, pool, spotter, ring.open_ring(payload))
+
+            elif ftype == 'R':
+                stream = sessions.get(stream_id)
+                if stream is not None and stream.ring:
+                    for view in stream.ring.read(payload):
+                        stream.accept(view)
+                    stream.ring.consumed(payload)
+
+            elif ftype == 'A':
+                stream = sessions.get(stream_id)
+                if stream is None:
+                    stream = sessions[stream_id] = Stream(stream_id, pool, spotter)
+                stream.accept(payload)
+
+            elif ftype == 'E':
+                stream = sessions.pop(stream_id, None)
+                if stream is not None:
+                    try:
+                        stream.finish()
+                    finally:
+                        stream.close()
+                emit({"done": True}, stream_id)
+
+        except Exception as e:
+            emit({"error": str(e)}, stream_id)
+            if ftype == 'E':
+                emit({"done": True}, stream_id)
+
+
+if __name__ == "__main__":
+    if SERVER_MODE:
+        run_server()
+    else:
+        run_single()
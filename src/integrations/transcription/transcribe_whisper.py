@@ -3,23 +3,89 @@
 GPU-accelerated transcription using Faster-Whisper
 Requires: pip install faster-whisper
 Uses NVIDIA GPU for fast, accurate transcription
+
+Modes:
+  (default)  one utterance on stdin, JSON result on stdout
+  --server   resident worker; framed audio from many users on stdin,
+             utterances arriving close together are decoded as one batch
+  --calibrate [clip.wav]
+             time candidate model/compute/thread settings on a reference clip and
+             cache the best one (see whisper_profile.py); later starts load it
+
+Both modes emit {"partial": ...} lines while audio is still arriving
+(WHISPER_PARTIALS=false disables them) before the final {"text": ..., "inference_ms": ...}.
+The server's ready message carries the model load time as "load_ms".
+Audio is trimmed to speech by vad.py first; utterances with no speech are never decoded.
 """
 import sys
 import os
 import json
+import queue
+import threading
+import time
 import numpy as np
 from faster_whisper import WhisperModel
+from faster_whisper.audio import pad_or_trim
+from faster_whisper.tokenizer import Tokenizer
+from faster_whisper.transcribe import get_compression_ratio
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ipc'))
+import framing
+import ring
+import vad
+import wakeword
+import whisper_profile
+from pcm import PCMBuffer, as_int16, to_float32
 
 # Configuration
 MODEL_SIZE = os.getenv('WHISPER_MODEL', 'base.en')  # tiny.en, base.en, small.en, medium.en, large-v2
 DEVICE = os.getenv('WHISPER_DEVICE', 'cpu')  # cuda or cpu
 # Use int8 for both CPU and GPU (best compatibility)
 COMPUTE_TYPE = "int8"
+# faster-whisper defaults; replaced by the calibrated profile when there is one
+CPU_THREADS = 0
+NUM_WORKERS = 1
+
+# Decoding policy: 'adaptive' decodes greedily and re-decodes low-confidence segments with
+# beam search; 'beam' always uses beam search (old behaviour); 'greedy' never escalates
+DECODE_POLICY = os.getenv('WHISPER_DECODE_POLICY', 'adaptive').lower()
+BEAM_SIZE = int(os.getenv('WHISPER_BEAM_SIZE', '5'))
+# A greedy segment is low-confidence below this average token log-probability...
+LOGPROB_THRESHOLD = float(os.getenv('WHISPER_LOGPROB_THRESHOLD', '-0.7'))
+# ...or above this gzip compression ratio (repetition loops)
+COMPRESSION_THRESHOLD = float(os.getenv('WHISPER_COMPRESSION_THRESHOLD', '2.4'))
+# Low-confidence segments above this no-speech probability are treated as silence and dropped
+NO_SPEECH_THRESHOLD = float(os.getenv('WHISPER_NO_SPEECH_THRESHOLD', '0.6'))
+
+# Server mode batching: wait this long after the first finished utterance for others to join
+BATCH_WINDOW_MS = int(os.getenv('WHISPER_BATCH_WINDOW_MS', '150'))
+BATCH_SIZE = int(os.getenv('WHISPER_BATCH_SIZE', '8'))
+
+# Streaming partials: decode the last WINDOW seconds every INTERVAL of received audio
+PARTIALS_ENABLED = os.getenv('WHISPER_PARTIALS', 'true').lower() != 'false'
+PARTIAL_INTERVAL_MS = int(os.getenv('WHISPER_PARTIAL_INTERVAL_MS', '800'))
+PARTIAL_WINDOW_S = float(os.getenv('WHISPER_PARTIAL_WINDOW_S', '8'))
+
+if __name__ == "__main__" and '--calibrate' in sys.argv:
+    args = sys.argv[sys.argv.index('--calibrate') + 1:]
+    sys.exit(0 if whisper_profile.calibrate(DEVICE, args[0] if args else None) else 1)
+
+# Use the calibrated profile if this box has one (an explicit WHISPER_MODEL still wins)
+profile = whisper_profile.load(DEVICE, os.getenv('WHISPER_MODEL'))
+if profile:
+    MODEL_SIZE = profile['model']
+    COMPUTE_TYPE = profile['compute_type']
+    CPU_THREADS = profile['cpu_threads']
+    NUM_WORKERS = profile['num_workers']
+    print(f"Using calibrated profile: {COMPUTE_TYPE}, cpu_threads={CPU_THREADS}, num_workers={NUM_WORKERS}",
+          file=sys.stderr)
 
 # Initialize model
+load_start = time.monotonic()
 try:
     print(f"Loading Faster-Whisper model: {MODEL_SIZE} on {DEVICE}...", file=sys.stderr)
-    model = WhisperModel(MODEL_SIZE, device=DEVICE, compute_type=COMPUTE_TYPE)
+    model = WhisperModel(MODEL_SIZE, device=DEVICE, compute_type=COMPUTE_TYPE,
+                         cpu_threads=CPU_THREADS, num_workers=NUM_WORKERS)
     print("Model loaded successfully!", file=sys.stderr)
 except Exception as e:
     # Fallback to CPU if CUDA fails
@@ -27,50 +93,79 @@ except Exception as e:
         print(f"GPU failed ({e}), falling back to CPU...", file=sys.stderr)
         DEVICE = "cpu"
         COMPUTE_TYPE = "int8"
+        profile = whisper_profile.load(DEVICE, MODEL_SIZE) or {}
         try:
-            model = WhisperModel(MODEL_SIZE, device=DEVICE, compute_type=COMPUTE_TYPE)
+            model = WhisperModel(MODEL_SIZE, device=DEVICE, compute_type=profile.get('compute_type', COMPUTE_TYPE),
+                                 cpu_threads=profile.get('cpu_threads', 0),
+                                 num_workers=profile.get('num_workers', 1))
             print("Model loaded successfully on CPU!", file=sys.stderr)
         except Exception as e2:
-            print(json.dumps({"error": f"Failed to load model: {str(e2)}"}))
+            framing.fatal(f"Failed to load model: {str(e2)}", '--server' in sys.argv)
             sys.exit(1)
     else:
-        print(json.dumps({"error": f"Failed to load model: {str(e)}"}))
+        framing.fatal(f"Failed to load model: {str(e)}", '--server' in sys.argv)
         sys.exit(1)
 
+# Reported to Node with the ready message
+LOAD_MS = round((time.monotonic() - load_start) * 1000)
+
 # Audio configuration - expecting 16kHz mono PCM from Node.js
 SAMPLE_RATE = 16000
+# Whisper's encoder window; longer utterances can't share a batch
+MAX_BATCH_SAMPLES = SAMPLE_RATE * 30
+PARTIAL_INTERVAL_SAMPLES = SAMPLE_RATE * PARTIAL_INTERVAL_MS // 1000
+PARTIAL_WINDOW_SAMPLES = int(SAMPLE_RATE * PARTIAL_WINDOW_S)
+
+stdout_lock = threading.Lock()
+# Server mode: binary result frames on stdout (None = JSON lines, legacy mode)
+results = None
+
+# How often each decoding tier was used, logged to stderr every TIER_LOG_EVERY segments
+tier_counts = {"greedy": 0, "beam": 0, "silence": 0}
+tier_lock = threading.Lock()
+TIER_LOG_EVERY = 50
+
+
+def emit(res, stream_id=None):
+    if results:
+        results.write_result(res, stream_id)
+        return
+    if stream_id is not None:
+        res["id"] = stream_id
+    line = json.dumps(res)
+    with stdout_lock:
+        print(line, flush=True)
 
-audio_buffer = b''
 
 def is_hallucination(text):
     """Detect if transcription is likely a hallucination (repetitive patterns)"""
     if not text or len(text) < 10:
         return False
-    
+
     words = text.lower().split()
     if len(words) < 5:
         return False
-    
+
     # Count word frequency
     word_counts = {}
     for word in words:
         word_counts[word] = word_counts.get(word, 0) + 1
-    
+
     total_words = len(words)
-    
+
     # Check for excessive repetition
     for word, count in word_counts.items():
         # If any word appears more than 40% of the time, it's likely a hallucination
         if count / total_words > 0.4 and count > 3:
             return True
-    
+
     # Check for repetitive phrases (common hallucination patterns)
     hallucination_phrases = [
         'bye bye bye', 'okay okay okay', 'all right all right',
         'next time next time', 'see you see you', 'thank you thank you',
         'yeah yeah yeah', 'no no no', 'yes yes yes'
     ]
-    
+
     text_lower = text.lower()
     for phrase in hallucination_phrases:
         if phrase in text_lower:
@@ -78,63 +173,413 @@ def is_hallucination(text):
             count = text_lower.count(phrase)
             if count >= 2:
                 return True
-    
+
     return False
 
+
+def finish_text(text):
+    """Apply the hallucination filter and build the result object"""
+    text = text.strip()
+    if text and is_hallucination(text):
+        print(json.dumps({"warning": "Hallucination detected, suppressing output"}), file=sys.stderr)
+        return None
+    if text:
+        return {"text": text}
+    return None
+
+
+def count_tier(tier):
+    with tier_lock:
+        tier_counts[tier] += 1
+        total = sum(tier_counts.values())
+        if total % TIER_LOG_EVERY == 0:
+            print(json.dumps({"decode_tiers": dict(tier_counts)}), file=sys.stderr, flush=True)
+
+
+def classify(text, avg_logprob, no_speech_prob):
+    """Which tier a greedy result ends up in: 'greedy' (keep), 'beam' (re-decode) or 'silence' (drop)"""
+    if DECODE_POLICY == 'greedy':
+        return "greedy"
+    low_confidence = avg_logprob < LOGPROB_THRESHOLD
+    if low_confidence and no_speech_prob > NO_SPEECH_THRESHOLD:
+        return "silence"
+    if low_confidence or (text and get_compression_ratio(text) > COMPRESSION_THRESHOLD):
+        return "beam"
+    return "greedy"
+
+
+def run_model(samples, beam_size):
+    """One model.transcribe pass; greedy passes skip the temperature fallback (we escalate to beam instead)"""
+    segments, info = model.transcribe(
+        to_float32(samples),
+        language="en",
+        beam_size=beam_size,
+        temperature=0.0 if beam_size == 1 else [0.0, 0.2, 0.4, 0.6, 0.8, 1.0],
+        no_speech_threshold=NO_SPEECH_THRESHOLD,
+        vad_filter=False,
+        word_timestamps=False,
+        condition_on_previous_text=True  # Better context for sentence completion
+    )
+    return list(segments)
+
+
+def decode(samples):
+    """Decode one chunk of speech (int16 samples) to text using Faster-Whisper"""
+    try:
+        if DECODE_POLICY == 'beam':
+            segments = run_model(samples, BEAM_SIZE)
+            for _ in segments:
+                count_tier("beam")
+            return " ".join(segment.text.strip() for segment in segments)
+
+        text_parts = []
+        for segment in run_model(samples, 1):
+            text = segment.text.strip()
+            tier = classify(text, segment.avg_logprob, segment.no_speech_prob)
+            if tier == "beam":
+                # Re-decode only this segment's span, with a little context either side
+                start = max(0, int((segment.start - 0.2) * SAMPLE_RATE))
+                end = int((segment.end + 0.2) * SAMPLE_RATE)
+                text = " ".join(s.text.strip() for s in run_model(samples[start:end], BEAM_SIZE))
+            count_tier(tier)
+            if tier != "silence":
+                text_parts.append(text)
+
+        return " ".join(text_parts)
+
+    except Exception as e:
+        print(json.dumps({"error": str(e)}), file=sys.stderr)
+        return ""
+
+
 def transcribe_audio(audio_data):
-    """Transcribe audio data using Faster-Whisper"""
+    """
+    Transcribe one utterance (PCM bytes or int16 samples): trim it to speech with the VAD,
+    decode each speech chunk, then filter hallucinations
+    """
+    chunks = vad.split_speech(as_int16(audio_data))
+    return finish_text(" ".join(decode(chunk) for chunk in chunks))
+
+
+def generate_batch(audio_list, beam_size):
+    """
+    Decode several short chunks (<= 30s each) in a single encoder/decoder call.
+    Mirrors what faster-whisper's BatchedInferencePipeline does for chunks of one file,
+    but across different speakers. Returns [(text, avg_logprob, no_speech_prob)].
+    """
+    tokenizer = Tokenizer(
+        model.hf_tokenizer,
+        model.model.is_multilingual,
+        task="transcribe",
+        language="en",
+    )
+    features = np.stack([
+        pad_or_trim(model.feature_extractor(to_float32(audio))[..., :-1])
+        for audio in audio_list
+    ])
+    encoder_output = model.encode(features)
+    prompt = model.get_prompt(tokenizer, [], without_timestamps=True)
+
+    outputs = model.model.generate(
+        encoder_output,
+        [list(prompt) for _ in audio_list],
+        beam_size=beam_size,
+        max_length=model.max_length,
+        suppress_blank=True,
+        suppress_tokens=[-1],
+        return_scores=True,
+        return_no_speech_prob=True,
+    )
+
+    decoded = []
+    for output in outputs:
+        tokens = output.sequences_ids[0]
+        # Scores are length-normalized; convert back the same way faster-whisper does
+        avg_logprob = output.scores[0] * len(tokens) / (len(tokens) + 1)
+        decoded.append((tokenizer.decode(tokens).strip(), avg_logprob, output.no_speech_prob))
+    return decoded
+
+
+def decode_batch(audio_list):
+    """Batched counterpart of decode(): greedy for everyone, then one beam batch for the low-confidence ones"""
+    if DECODE_POLICY == 'beam':
+        for _ in audio_list:
+            count_tier("beam")
+        return [text for text, _, _ in generate_batch(audio_list, BEAM_SIZE)]
+
+    texts = []
+    retry = []
+    for i, (text, avg_logprob, no_speech_prob) in enumerate(generate_batch(audio_list, 1)):
+        tier = classify(text, avg_logprob, no_speech_prob)
+        count_tier(tier)
+        texts.append("" if tier == "silence" else text)
+        if tier == "beam":
+            retry.append(i)
+
+    if retry:
+        for i, (text, _, _) in zip(retry, generate_batch([audio_list[i] for i in retry], BEAM_SIZE)):
+            texts[i] = text
+    return texts
+
+
+def transcribe_partial(samples):
+    """Cheap greedy decode of an in-progress utterance; only used for early partials"""
+    if not vad.has_speech(samples):
+        return None
     try:
-        # Convert bytes to float32 numpy array
-        audio_np = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
-        
-        # Transcribe with better settings for complete sentences
         segments, info = model.transcribe(
-            audio_np,
+            to_float32(samples),
             language="en",
-            beam_size=5,
+            beam_size=1,
             vad_filter=False,
-            word_timestamps=False,
-            condition_on_previous_text=True  # Better context for sentence completion
+            without_timestamps=True,
+            condition_on_previous_text=False
         )
-        
-        # Collect results
-        text_parts = []
-        for segment in segments:
-            text_parts.append(segment.text.strip())
-        
-        text = " ".join(text_parts).strip()
-        
-        # Filter out hallucinations
-        if text and is_hallucination(text):
-            print(json.dumps({"warning": "Hallucination detected, suppressing output"}), file=sys.stderr)
-            return None
-        
-        if text:
-            return {"text": text}
-        return None
-        
+        text = " ".join(segment.text.strip() for segment in segments).strip()
+        if text and not is_hallucination(text):
+            return text
     except Exception as e:
-        print(json.dumps({"error": str(e)}), file=sys.stderr)
-        return None
+        print(json.dumps({"error": f"Partial decode failed: {e}"}), file=sys.stderr)
+    return None
 
-# Main loop - buffer all audio until stream ends
-while True:
-    try:
-        # Read audio data in chunks
-        data = sys.stdin.buffer.read(4000)
-        if len(data) == 0:
+
+class Session:
+    """One speaker's in-progress utterance, optionally behind the wake-word gate"""
+
+    def __init__(self, spotter=None, ring_buffer=None):
+        self.ring = ring_buffer
+        self.audio = PCMBuffer()
+        self.gate = spotter.gate() if spotter else None
+        self.next_partial_at = PARTIAL_INTERVAL_SAMPLES
+        self.partial_text = None
+        self.partial_pending = False
+        self.closed = False
+
+    def append(self, chunk):
+        for released in (self.gate.feed(chunk) if self.gate else [chunk]):
+            self.audio.append(released)
+
+    def finish(self):
+        try:
+            if self.gate:
+                for released in self.gate.finish():
+                    self.audio.append(released)
+        finally:
+            self.closed = True
+            if self.ring:
+                self.ring.close()
+                self.ring = None
+
+    def partial_due(self):
+        return (
+            PARTIALS_ENABLED
+            and not self.partial_pending
+            and len(self.audio) >= self.next_partial_at
+        )
+
+    def partial_window(self):
+        """Snapshot of the sliding window to decode (copied - the buffer keeps growing)"""
+        self.next_partial_at = len(self.audio) + PARTIAL_INTERVAL_SAMPLES
+        return self.audio.view(len(self.audio) - PARTIAL_WINDOW_SAMPLES).copy()
+
+    def update_partial(self, text):
+        """Returns True if this partial differs from the last one sent"""
+        if not text or text == self.partial_text:
+            return False
+        self.partial_text = text
+        return True
+
+
+def run_single():
+    """Legacy mode: one utterance on stdin until it closes, partials emitted along the way"""
+    session = Session()
+
+    while True:
+        try:
+            # Read audio data in chunks
+            data = sys.stdin.buffer.read(4000)
+            if len(data) == 0:
+                break
+
+            session.append(data)
+
+            if session.partial_due():
+                text = transcribe_partial(session.partial_window())
+                if session.update_partial(text):
+                    emit({"partial": text})
+
+        except KeyboardInterrupt:
             break
-        
-        audio_buffer += data
-                
-    except KeyboardInterrupt:
-        break
-    except Exception as e:
-        print(json.dumps({"error": str(e)}), file=sys.stderr)
-        break
+        except Exception as e:
+            print(json.dumps({"error": str(e)}), file=sys.stderr)
+            break
+
+    # Transcribe all buffered audio at once when stream ends
+    if len(session.audio) > SAMPLE_RATE:  # At least 1 second of audio
+        start = time.monotonic()
+        result = transcribe_audio(session.audio.view())
+        if result:
+            result["inference_ms"] = round((time.monotonic() - start) * 1000)
+            emit(result)
+
+
+def partial_worker(partials):
+    """Decode sliding windows of still-open utterances; skipped once the final is queued"""
+    while True:
+        stream_id, session, window = partials.get()
+        try:
+            if session.closed:
+                continue
+            text = transcribe_partial(window)
+            if not session.closed and session.update_partial(text):
+                emit({"partial": text}, stream_id)
+        except Exception as e:
+            print(json.dumps({"error": f"Partial failed: {e}"}), file=sys.stderr)
+        finally:
+            session.partial_pending = False
 
-# Transcribe all buffered audio at once when stream ends
-if len(audio_buffer) > SAMPLE_RATE * 2:  # At least 1 second of audio (16-bit = 2 bytes per sample)
-    result = transcribe_audio(audio_buffer)
-    if result:
-        print(json.dumps(result), flush=True)
+
+def batch_worker(jobs):
+    """Collect finished utterances for BATCH_WINDOW_MS and decode them together"""
+    while True:
+        first = jobs.get()
+        batch = [first]
+        deadline = time.monotonic() + BATCH_WINDOW_MS / 1000.0
+
+        while len(batch) < BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(jobs.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        # Every job gets its 'D' and task_done() even if the batch blows up, or Node's
+        # admission slots (and jobs.join() at shutdown) would wait forever
+        try:
+            decode_jobs(batch)
+        except Exception as e:
+            print(json.dumps({"error": f"Batch failed: {e}"}), file=sys.stderr)
+        finally:
+            for stream_id, _ in batch:
+                try:
+                    emit({"done": True}, stream_id)
+                except Exception as e:
+                    print(json.dumps({"error": f"Could not send done: {e}"}), file=sys.stderr)
+                jobs.task_done()
+
+
+def decode_jobs(batch):
+    """Decode a batch of (stream_id, samples) utterances and emit each one's text"""
+    start = time.monotonic()
+    # VAD first: silence-only utterances never reach the model, long ones become several chunks
+    owners, chunks = [], []  # chunk position -> index in batch, int16 samples
+    for index, (_, audio) in enumerate(batch):
+        for chunk in vad.split_speech(audio):
+            owners.append(index)
+            chunks.append(chunk)
+
+    short = [i for i, chunk in enumerate(chunks) if len(chunk) <= MAX_BATCH_SAMPLES]
+    single = [i for i, chunk in enumerate(chunks) if len(chunk) > MAX_BATCH_SAMPLES]
+
+    texts = [""] * len(chunks)
+    if len(short) > 1:
+        try:
+            for i, text in zip(short, decode_batch([chunks[i] for i in short])):
+                texts[i] = text
+        except Exception as e:
+            print(json.dumps({"error": f"Batched decode failed: {e}"}), file=sys.stderr)
+            single.extend(short)
+    else:
+        single.extend(short)
+
+    for i in single:
+        texts[i] = decode(chunks[i])
+    inference_ms = round((time.monotonic() - start) * 1000)
+
+    for index, (stream_id, _) in enumerate(batch):
+        # One user's bad text shouldn't cost the rest of the batch theirs
+        try:
+            parts = [text for owner, text in zip(owners, texts) if owner == index]
+            result = finish_text(" ".join(parts))
+            if result:
+                result["inference_ms"] = inference_ms
+                emit(result, stream_id)
+        except Exception as e:
+            print(json.dumps({"error": f"Finishing {stream_id} failed: {e}"}), file=sys.stderr)
+
+
+def run_server():
+    """
+    Resident mode: many users' PCM multiplexed over framed stdin.
+    Frames: 'O' open stream (payload: shared-memory ring path, or empty), 'A' in-band audio,
+    'R' audio written to the ring (see ipc/ring.py), 'E' end of stream (see ipc/framing.py)
+    Results go out as binary frames tagged with the stream ID: 'P' partials while the user
+    is still talking, then the text (a 'J' frame, since it carries timings) and 'D' done.
+    With WAKEWORD_GATE=true, utterances that don't start with a wake word never reach Whisper.
+    """
+    global results
+    results = framing.claim_stdout()
+    spotter = wakeword.load_spotter()
+    jobs = queue.Queue()
+    partials = queue.Queue()
+    threading.Thread(target=batch_worker, args=(jobs,), daemon=True).start()
+    threading.Thread(target=partial_worker, args=(partials,), daemon=True).start()
+
+    sessions = {}  # stream id -> Session
+    stdin = sys.stdin.buffer
+
+    emit({"ready": True, "load_ms": LOAD_MS})
+
+    while True:
+        frame = framing.read_frame(stdin)
+        if frame is None:
+            break
+        ftype, stream_id, payload = frame
+
+        try:
+            if ftype == 'O':
+                if stream_id not in sessions:
+                    sessions[stream_id] = Session(spotter, ring.open_ring(payload))
+            elif ftype in ('A', 'R'):
+                session = sessions.get(stream_id)
+                if session is None:
+                    session = sessions[stream_id] = Session(spotter)
+                if ftype == 'R':
+                    # Zero-copy views into the shared ring; PCMBuffer copies them into the utterance once
+                    if session.ring:
+                        for view in session.ring.read(payload):
+                            session.append(view)
+                        session.ring.consumed(payload)
+                else:
+                    session.append(payload)
+                if session.partial_due():
+                    session.partial_pending = True
+                    partials.put((stream_id, session, session.partial_window()))
+            elif ftype == 'E':
+                session = sessions.pop(stream_id, None)
+                if session is None:
+                    emit({"done": True}, stream_id)
+                    continue
+                session.finish()
+                if len(session.audio) > SAMPLE_RATE:  # At least 1 second of audio
+                    jobs.put((stream_id, session.audio.view()))
+                else:
+                    emit({"done": True}, stream_id)
+        except Exception as e:
+            # One bad stream must not take every other user's transcription down with it
+            print(json.dumps({"error": f"Stream {stream_id} failed: {e}"}), file=sys.stderr)
+            emit({"error": str(e)}, stream_id)
+            if ftype == 'E':
+                emit({"done": True}, stream_id)
+
+    # Let queued utterances finish before exiting
+    jobs.join()
+
+
+if __name__ == "__main__":
+    if '--server' in sys.argv:
+        run_server()
+    else:
+        run_single()
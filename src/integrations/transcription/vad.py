@@ -0,0 +1,126 @@
+"""
+Energy-based voice activity detection, vectorized with numpy.
+
+Discord streams end after a full second of silence (EndBehaviorType.AfterSilence),
+and Whisper is prone to hallucinating on silence and noise. Before inference we:
+  - score every 30 ms frame with a speech probability (energy above the noise floor)
+  - trim leading/trailing silence and cut the utterance into speech regions
+  - drop regions whose mean probability is below the threshold
+  - pack the surviving regions into chunks no longer than Whisper's window
+
+Config (env):
+  WHISPER_VAD=false              disable (decode the raw utterance as before)
+  WHISPER_VAD_THRESHOLD=0.5      minimum mean speech probability for a region
+  WHISPER_VAD_MIN_SILENCE_MS=300 gaps shorter than this don't split regions
+"""
+import os
+import numpy as np
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+
+VAD_ENABLED = os.getenv('WHISPER_VAD', 'true').lower() != 'false'
+THRESHOLD = float(os.getenv('WHISPER_VAD_THRESHOLD', '0.5'))
+MIN_SILENCE_MS = int(os.getenv('WHISPER_VAD_MIN_SILENCE_MS', '300'))
+MIN_SPEECH_MS = 250
+PAD_MS = 150
+# Absolute floor: anything quieter than this is never speech
+SILENCE_DBFS = -55.0
+# Cap on the estimated noise floor, for windows that contain no silence at all
+NOISE_FLOOR_MAX_DBFS = -40.0
+# How far above the noise floor a frame has to be to count as speech, and how soft the edge is
+SPEECH_MARGIN_DB = 10.0
+SPEECH_SLOPE_DB = 3.0
+# Whisper decodes 30s windows; leave headroom for padding
+MAX_CHUNK_SAMPLES = SAMPLE_RATE * 28
+GAP_SAMPLES = SAMPLE_RATE // 5  # 200 ms of silence between packed regions
+
+
+def frame_probabilities(samples):
+    """Per-frame speech probability in [0, 1] for int16 samples"""
+    n_frames = len(samples) // FRAME_SAMPLES
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    frames = samples[:n_frames * FRAME_SAMPLES].reshape(n_frames, FRAME_SAMPLES).astype(np.float32) / 32768.0
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    db = 20.0 * np.log10(rms + 1e-9)
+
+    # Noise floor from the quietest frames; Discord streams always include trailing silence
+    floor = np.clip(np.percentile(db, 10), SILENCE_DBFS, NOISE_FLOOR_MAX_DBFS)
+    prob = 1.0 / (1.0 + np.exp(-(db - (floor + SPEECH_MARGIN_DB)) / SPEECH_SLOPE_DB))
+    prob[db < SILENCE_DBFS] = 0.0
+
+    # Light smoothing so single clicks or dropouts don't flip the decision
+    kernel = np.ones(5, dtype=np.float32) / 5
+    return np.convolve(prob, kernel, mode='same').astype(np.float32)
+
+
+def speech_regions(samples, threshold=THRESHOLD):
+    """[(start_sample, end_sample, mean_probability)] for regions that pass the threshold"""
+    prob = frame_probabilities(samples)
+    if len(prob) == 0:
+        return []
+
+    # Pad speech frames on both sides (dilation), which also bridges short gaps
+    pad = PAD_MS // FRAME_MS
+    bridge = MIN_SILENCE_MS // FRAME_MS
+    mask = prob > 0.5
+    mask = np.convolve(mask.astype(np.int8), np.ones(2 * pad + 1, dtype=np.int8), mode='same') > 0
+
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+    starts, ends = edges[0::2], edges[1::2]
+    if len(starts) == 0:
+        return []
+
+    # Merge regions separated by less than MIN_SILENCE_MS
+    keep = np.concatenate(([True], (starts[1:] - ends[:-1]) > bridge))
+    merged_starts = starts[keep]
+    merged_ends = np.maximum.reduceat(ends, np.flatnonzero(keep))
+
+    regions = []
+    min_frames = MIN_SPEECH_MS // FRAME_MS
+    for start, end in zip(merged_starts, merged_ends):
+        if end - start < min_frames:
+            continue
+        score = float(prob[start:end].mean())
+        if score < threshold:
+            continue
+        regions.append((int(start) * FRAME_SAMPLES, min(int(end) * FRAME_SAMPLES, len(samples)), score))
+    return regions
+
+
+def has_speech(samples):
+    return not VAD_ENABLED or bool(speech_regions(samples))
+
+
+def split_speech(samples):
+    """
+    Trimmed speech for an utterance as a list of int16 chunks, each short enough
+    for one Whisper window. Empty list means there's nothing worth decoding.
+    """
+    if not VAD_ENABLED:
+        return [samples]
+
+    chunks = []
+    current = []
+    current_len = 0
+    gap = np.zeros(GAP_SAMPLES, dtype=np.int16)
+
+    for start, end, _ in speech_regions(samples):
+        # Long monologues: hard-split oversized regions
+        for piece_start in range(start, end, MAX_CHUNK_SAMPLES):
+            piece = samples[piece_start:min(end, piece_start + MAX_CHUNK_SAMPLES)]
+            if current and current_len + GAP_SAMPLES + len(piece) > MAX_CHUNK_SAMPLES:
+                chunks.append(np.concatenate(current))
+                current, current_len = [], 0
+            if current:
+                current.append(gap)
+                current_len += GAP_SAMPLES
+            current.append(piece)
+            current_len += len(piece)
+
+    if current:
+        chunks.append(np.concatenate(current))
+    return chunks
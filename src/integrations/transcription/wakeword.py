@@ -0,0 +1,166 @@
+"""
+Cheap wake-word spotting stage for the transcription workers.
+
+A Vosk recognizer restricted to a tiny grammar (the trigger words plus the
+mis-hearings the classifier normalizes) listens to the start of each utterance.
+Only utterances where a wake word shows up within the first few words are handed
+to the large-vocabulary recognizer; everything else is dropped early.
+
+Config (env):
+  WAKEWORD_GATE=true       enable the gate (off by default - it stops non-wake speech
+                           from reaching the transcript logs)
+  WAKEWORD_WINDOW_S=3      how much audio to listen to before giving up
+  MINA_WAKE_WORDS=a,b,c    phrases to listen for, set by the Node side from
+                           classifier.getWakePhrases(); without it the gate stays off
+"""
+import os
+import sys
+import json
+
+SAMPLE_RATE = 16000
+VOSK_MODEL_PATH = "models/vosk-model-small-en-us-0.15"
+
+GATE_ENABLED = os.getenv('WAKEWORD_GATE', 'false').lower() == 'true'
+WINDOW_SECONDS = float(os.getenv('WAKEWORD_WINDOW_S', '3'))
+# Same rule as classifier.processTranscription: wake word within the first 5 words
+MAX_PREFIX_WORDS = 4
+
+
+def log(msg):
+    print(json.dumps({"wakeword": msg}), file=sys.stderr, flush=True)
+
+
+def wake_phrases():
+    """The wake phrases Node passed in MINA_WAKE_WORDS (trigger words plus the classifier's variants)"""
+    return [w.strip() for w in os.getenv('MINA_WAKE_WORDS', '').split(',') if w.strip()]
+
+
+class WakeWordSpotter:
+    def __init__(self, model, phrases):
+        from vosk import KaldiRecognizer
+        self.KaldiRecognizer = KaldiRecognizer
+
+        # Keep only phrases the model can actually recognize; unknown words would
+        # silently never match and reject every utterance.
+        self.phrases = []
+        for phrase in phrases:
+            words = phrase.lower().split()
+            if words and all(model.find_word(w) != -1 for w in words):
+                self.phrases.append(words)
+            elif words:
+                log(f"'{phrase}' is not in the model vocabulary, skipping")
+
+        self.model = model
+        self.grammar = json.dumps([" ".join(p) for p in self.phrases] + ["[unk]"])
+        self.longest = max((len(p) for p in self.phrases), default=0)
+        self.window_samples = int(SAMPLE_RATE * WINDOW_SECONDS)
+        self.idle = []
+
+    def usable(self):
+        return bool(self.phrases)
+
+    def acquire(self):
+        if self.idle:
+            return self.idle.pop()
+        return self.KaldiRecognizer(self.model, SAMPLE_RATE, self.grammar)
+
+    def release(self, rec):
+        rec.Reset()
+        self.idle.append(rec)
+
+    def match(self, words):
+        """
+        True  - wake phrase found near the start
+        False - enough words heard that a wake word can no longer be near the start
+        None  - undecided
+        """
+        for start in range(min(len(words), MAX_PREFIX_WORDS + 1)):
+            for phrase in self.phrases:
+                if words[start:start + len(phrase)] == phrase:
+                    return True
+        if len(words) > MAX_PREFIX_WORDS + self.longest:
+            return False
+        return None
+
+    def gate(self):
+        return WakeGate(self)
+
+
+class WakeGate:
+    """Holds back the start of one utterance until the spotter decides"""
+
+    def __init__(self, spotter):
+        self.spotter = spotter
+        self.rec = spotter.acquire()
+        self.heard = []
+        self.samples = 0
+        self.pending = []
+        self.state = None  # None undecided, True passed, False rejected
+
+    def _decide(self, state):
+        self.state = state
+        self.spotter.release(self.rec)
+        self.rec = None
+        released = self.pending if state else []
+        self.pending = []
+        return released
+
+    def feed(self, chunk):
+        """Returns the chunks that may go on to the full recognizer"""
+        if self.state is True:
+            return [chunk]
+        if self.state is False:
+            return []
+
+        # Held until the decision, so copy: the chunk may be a view into the shared audio ring
+        chunk = bytes(chunk)
+        self.pending.append(chunk)
+        self.samples += len(chunk) // 2
+
+        if self.rec.AcceptWaveform(chunk):
+            self.heard += json.loads(self.rec.Result()).get('text', '').split()
+            words = self.heard
+        else:
+            words = self.heard + json.loads(self.rec.PartialResult()).get('partial', '').split()
+
+        decision = self.spotter.match(words)
+        if decision is None and self.samples >= self.spotter.window_samples:
+            decision = False
+        if decision is not None:
+            return self._decide(decision)
+        return []
+
+    def finish(self):
+        """Stream ended while undecided: check the final result. Returns released chunks."""
+        if self.state is not None:
+            return []
+        words = self.heard + json.loads(self.rec.FinalResult()).get('text', '').split()
+        return self._decide(self.spotter.match(words) is True)
+
+    def rejected(self):
+        return self.state is False
+
+
+def load_spotter(model=None):
+    """Build the spotter if WAKEWORD_GATE is on. Returns None when disabled or unavailable."""
+    if not GATE_ENABLED:
+        return None
+    phrases = wake_phrases()
+    if not phrases:
+        # A list of our own would drift from the classifier's, so there is no fallback
+        log("WARNING: WAKEWORD_GATE=true but MINA_WAKE_WORDS is empty, transcribing everything")
+        return None
+    try:
+        if model is None:
+            from vosk import Model
+            model = Model(VOSK_MODEL_PATH)
+        spotter = WakeWordSpotter(model, phrases)
+    except Exception as e:
+        log(f"Wake-word gate unavailable ({e}), transcribing everything")
+        return None
+
+    if not spotter.usable():
+        log("No wake phrases in the model vocabulary, transcribing everything")
+        return None
+    log(f"Gate enabled for: {', '.join(' '.join(p) for p in spotter.phrases)}")
+    return spotter
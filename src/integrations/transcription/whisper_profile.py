@@ -0,0 +1,178 @@
+"""
+Startup autotuning for the Faster-Whisper worker.
+
+`transcribe_whisper.py --calibrate [clip.wav]` loads every candidate combination of
+model size, compute type, cpu_threads and num_workers, times it on a reference clip
+and writes the result to WHISPER_PROFILE. Normal starts read that profile instead of
+the hardcoded defaults, so small and large boxes each get a setup that fits them.
+
+Selection: the largest model whose best configuration meets the latency budget,
+using that model's fastest configuration. Latency is measured with two decodes in
+flight at once, since the server runs a final and a partial decode concurrently.
+
+Config (env):
+  WHISPER_PROFILE=models/whisper_profile.json   where the profile is cached
+  WHISPER_LATENCY_BUDGET_MS=1500                max latency for the reference clip
+  WHISPER_CALIBRATE_MODELS=tiny.en,base.en,small.en,medium.en
+"""
+import os
+import sys
+import json
+import time
+import wave
+import threading
+import numpy as np
+
+SAMPLE_RATE = 16000
+PROFILE_PATH = os.getenv('WHISPER_PROFILE', 'models/whisper_profile.json')
+DEFAULT_CLIP = 'models/whisper_calibration.wav'
+LATENCY_BUDGET_MS = float(os.getenv('WHISPER_LATENCY_BUDGET_MS', '1500'))
+CANDIDATE_MODELS = [m.strip() for m in os.getenv(
+    'WHISPER_CALIBRATE_MODELS', 'tiny.en,base.en,small.en,medium.en').split(',') if m.strip()]
+CONCURRENT_DECODES = 2
+
+
+def log(msg):
+    print(msg, file=sys.stderr, flush=True)
+
+
+def load(device, model_size=None):
+    """
+    Cached settings for this device, or None.
+    If model_size is given (WHISPER_MODEL set explicitly), the fastest passing entry for that model is used.
+    """
+    try:
+        with open(PROFILE_PATH) as f:
+            profile = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log(f"Ignoring unreadable Whisper profile {PROFILE_PATH}: {e}")
+        return None
+
+    if profile.get('device') != device:
+        return None
+    if profile.get('cpu_count') != os.cpu_count():
+        log(f"Whisper profile was calibrated on {profile.get('cpu_count')} cores, this box has {os.cpu_count()}; "
+            f"re-run with --calibrate")
+        return None
+
+    if model_size is None:
+        return profile.get('chosen')
+    matching = [r for r in profile.get('results', []) if r['model'] == model_size]
+    return min(matching, key=lambda r: r['latency_ms']) if matching else None
+
+
+def read_clip(path):
+    with wave.open(path, 'rb') as w:
+        if w.getframerate() != SAMPLE_RATE or w.getnchannels() != 1 or w.getsampwidth() != 2:
+            raise ValueError(f"{path} must be 16kHz mono 16-bit PCM "
+                             f"(ffmpeg -i in.wav -ar 16000 -ac 1 -sample_fmt s16 {path})")
+        return np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def candidate_grid(device):
+    import ctranslate2
+    supported = ctranslate2.get_supported_compute_types(device)
+    preferred = ['int8', 'int8_float16', 'float16'] if device == 'cuda' else ['int8', 'int8_float32', 'float32']
+    compute_types = [c for c in preferred if c in supported] or ['default']
+
+    if device == 'cuda':
+        thread_options = [0]  # CPU threads barely matter on GPU; let CTranslate2 decide
+    else:
+        cores = os.cpu_count() or 1
+        thread_options = sorted({max(1, cores // 4), max(1, cores // 2), cores})
+
+    return compute_types, thread_options, [1, CONCURRENT_DECODES]
+
+
+def measure(model, audio):
+    """Latency (ms) of CONCURRENT_DECODES simultaneous greedy decodes of the clip"""
+    def run():
+        segments, _ = model.transcribe(audio, language="en", beam_size=1, temperature=0.0,
+                                       vad_filter=False, condition_on_previous_text=False)
+        list(segments)
+
+    run()  # warm-up
+    threads = [threading.Thread(target=run) for _ in range(CONCURRENT_DECODES)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return (time.perf_counter() - start) * 1000
+
+
+def calibrate(device, clip_path=None):
+    from faster_whisper import WhisperModel
+
+    clip_path = clip_path or DEFAULT_CLIP
+    if not os.path.exists(clip_path):
+        log(f"Calibration clip {clip_path} not found. Record a typical command (a few seconds, 16kHz mono WAV) "
+            f"and pass it as: --calibrate path/to/clip.wav")
+        return None
+    audio = read_clip(clip_path)
+    clip_seconds = len(audio) / SAMPLE_RATE
+    compute_types, thread_options, worker_options = candidate_grid(device)
+    log(f"Calibrating on {clip_path} ({clip_seconds:.1f}s), budget {LATENCY_BUDGET_MS:.0f}ms, device {device}")
+
+    results = []
+    for model_size in CANDIDATE_MODELS:
+        model_results = []
+        for compute_type in compute_types:
+            for cpu_threads in thread_options:
+                for num_workers in worker_options:
+                    try:
+                        model = WhisperModel(model_size, device=device, compute_type=compute_type,
+                                             cpu_threads=cpu_threads, num_workers=num_workers)
+                        latency = measure(model, audio)
+                        del model
+                    except Exception as e:
+                        log(f"  {model_size} {compute_type} threads={cpu_threads} workers={num_workers}: failed ({e})")
+                        continue
+                    entry = {
+                        "model": model_size,
+                        "compute_type": compute_type,
+                        "cpu_threads": cpu_threads,
+                        "num_workers": num_workers,
+                        "latency_ms": round(latency, 1),
+                        "rtf": round(latency / 1000 / clip_seconds, 3),
+                    }
+                    log(f"  {model_size} {compute_type} threads={cpu_threads} workers={num_workers}: "
+                        f"{entry['latency_ms']}ms (RTF {entry['rtf']})")
+                    model_results.append(entry)
+
+        results.extend(model_results)
+        # Larger models only get slower; stop once nothing in this size fits the budget
+        if model_results and min(r['latency_ms'] for r in model_results) > LATENCY_BUDGET_MS:
+            log(f"  {model_size} misses the budget, skipping larger models")
+            break
+
+    if not results:
+        log("No configuration could be loaded; profile not written")
+        return None
+
+    passing = [r for r in results if r['latency_ms'] <= LATENCY_BUDGET_MS]
+    if passing:
+        best_model = max(passing, key=lambda r: CANDIDATE_MODELS.index(r['model']))['model']
+        chosen = min((r for r in passing if r['model'] == best_model), key=lambda r: r['latency_ms'])
+    else:
+        log("Nothing meets the budget; using the fastest configuration found")
+        chosen = min(results, key=lambda r: r['latency_ms'])
+
+    profile = {
+        "device": device,
+        "cpu_count": os.cpu_count(),
+        "clip": clip_path,
+        "clip_seconds": round(clip_seconds, 2),
+        "budget_ms": LATENCY_BUDGET_MS,
+        "calibrated_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "chosen": chosen,
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(PROFILE_PATH) or '.', exist_ok=True)
+    with open(PROFILE_PATH, 'w') as f:
+        json.dump(profile, f, indent=2)
+    log(f"Chose {chosen['model']} {chosen['compute_type']} threads={chosen['cpu_threads']} "
+        f"workers={chosen['num_workers']} ({chosen['latency_ms']}ms); wrote {PROFILE_PATH}")
+    return chosen
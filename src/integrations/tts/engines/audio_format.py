@@ -0,0 +1,60 @@
+"""
+Convert TTS output into formats @discordjs/voice can play without an FFmpeg process.
+
+  mp3  leave the engine's native file alone (played through FFmpeg, as before)
+  ogg  Ogg/Opus, demuxed directly by @discordjs/voice (StreamType.OggOpus)
+  pcm  raw 48kHz stereo s16le (StreamType.Raw)
+
+Decoding MP3 and encoding Opus both go through libsndfile (soundfile >= 0.12 bundles
+libsndfile 1.1+), so no extra binaries are needed.
+"""
+import os
+import numpy as np
+import soundfile as sf
+
+FORMATS = ('mp3', 'ogg', 'pcm')
+DISCORD_RATE = 48000
+# Sample rates Opus can encode natively; anything else is resampled to 48kHz first
+OPUS_RATES = (8000, 12000, 16000, 24000, 48000)
+
+
+def resample(samples, rate, target):
+    """Linear resampling along the first axis; good enough for speech"""
+    if rate == target:
+        return samples
+    length = int(round(len(samples) * target / rate))
+    src = np.arange(len(samples))
+    dst = np.linspace(0, len(samples) - 1, length)
+    return np.stack([np.interp(dst, src, samples[:, ch]) for ch in range(samples.shape[1])], axis=1)
+
+
+def stereo(samples):
+    if samples.shape[1] == 2:
+        return samples
+    return np.repeat(samples[:, :1], 2, axis=1)
+
+
+def convert(path, fmt):
+    """Re-encode `path` as `fmt`, delete the original and return the new path"""
+    if fmt not in FORMATS or fmt == 'mp3':
+        return path
+
+    samples, rate = sf.read(path, dtype='float32', always_2d=True)
+    samples = stereo(samples)
+    base = os.path.splitext(path)[0]
+
+    if fmt == 'ogg':
+        if rate not in OPUS_RATES:
+            samples, rate = resample(samples, rate, DISCORD_RATE), DISCORD_RATE
+        output = base + '.ogg'
+        sf.write(output, samples, rate, format='OGG', subtype='OPUS')
+    else:
+        samples = resample(samples, rate, DISCORD_RATE)
+        output = base + '.pcm'
+        pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+        with open(output, 'wb') as f:
+            f.write(pcm.tobytes())  # Row-major, so L/R interleaved
+
+    if output != path:
+        os.remove(path)
+    return output
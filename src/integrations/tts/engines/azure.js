@@ -76,7 +76,12 @@ async function generate(text, options = {}) {
 
     const voiceName = options.code || DEFAULT_VOICE;
     const speechConfig = getSynthesizer(voiceName);
-    const tempFile = path.join(os.tmpdir(), `azure_${Date.now()}_${Math.random().toString(36).substring(7)}.mp3`);
+    // Azure can produce Ogg/Opus itself, which plays without FFmpeg
+    const ogg = (process.env.TTS_OUTPUT_FORMAT || '').toLowerCase() === 'ogg';
+    if (ogg) {
+        speechConfig.speechSynthesisOutputFormat = sdk.SpeechSynthesisOutputFormat.Ogg48Khz16BitMonoOpus;
+    }
+    const tempFile = path.join(os.tmpdir(), `azure_${Date.now()}_${Math.random().toString(36).substring(7)}.${ogg ? 'ogg' : 'mp3'}`);
 
     // Create AudioConfig to write to file
     const audioConfig = sdk.AudioConfig.fromAudioFileOutput(tempFile);
@@ -1,13 +1,6 @@
-const { spawn } = require('child_process');
 const path = require('path');
 const fs = require('fs');
-
-// Detect Python command based on OS
-// On Linux, use the venv Python to ensure edge-tts is available
-const isWin = process.platform === 'win32';
-const PYTHON_CMD = isWin 
-    ? 'python' 
-    : path.join(__dirname, '..', '..', 'venv', 'bin', 'python3');
+const worker = require('./worker');
 
 const VOICES = [
     { label: '🇺🇸 English (US) - Christopher', value: 'en-US-ChristopherNeural' },
@@ -62,8 +55,6 @@ async function generate(text, options = {}) {
         voice = DEFAULT_VOICE;
     }
 
-    const safeText = text.replace(/"/g, '\\"');
-
     const tempDir = path.resolve(__dirname, '../../temp_tts');
     if (!fs.existsSync(tempDir)) {
         fs.mkdirSync(tempDir, { recursive: true });
@@ -72,43 +63,12 @@ async function generate(text, options = {}) {
 
     console.log(`[EdgeTTS] Generating with Voice: "${voice}"`);
 
-    return new Promise((resolve, reject) => {
-        const process = spawn(PYTHON_CMD, [
-            '-m', 'edge_tts',
-            '--voice', voice,
-            '--text', safeText,
-            '--write-media', tempFile
-        ]);
-
-        process.on('close', (exitCode) => {
-            if (exitCode !== 0) {
-                console.error(`Edge-TTS failed with code ${exitCode}`);
-                resolve(null);
-                return;
-            }
-
-            if (!fs.existsSync(tempFile)) {
-                console.error("Edge-TTS file not created:", tempFile);
-                resolve(null);
-                return;
-            }
-            resolve(tempFile);
-        });
-
-        // Enable logging for debugging
-        process.stderr.on('data', (data) => {
-            const msg = data.toString();
-            // Ignore benign progress bars or info, log errors
-            if (msg.toLowerCase().includes('error')) {
-                console.error(`EdgeTTS Error: ${msg}`);
-            }
-        });
-
-        process.on('error', (err) => {
-            console.error("Failed to start edge-tts.", err);
-            resolve(null);
-        });
-    });
+    const output = await worker.synthesize('edge', { text, voice, output: tempFile });
+    if (!output || !fs.existsSync(output)) {
+        console.error("Edge-TTS file not created:", tempFile);
+        return null;
+    }
+    return output;
 }
 
 module.exports = { generate, getVoices };
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Long-lived TTS worker for the lightweight engines (gTTS and edge-tts).
+
+Imports both libraries once and serves JSON requests on stdin, one per line:
+    {"id": "...", "engine": "gtts", "text": "...", "lang": "en", "tld": "com", "output": "/path.mp3"}
+    {"id": "...", "engine": "edge", "text": "...", "voice": "en-GB-RyanNeural", "output": "/path.mp3"}
+Add "format": "ogg" or "pcm" to get Discord-ready audio instead of MP3 (see audio_format.py);
+the reply then points at the converted file.
+Replies are JSON lines on stdout:
+    {"id": "...", "output": "/path.mp3", "synth_ms": 412} or {"id": "...", "error": "..."}
+{"ready": true, "load_ms": ...} is printed once the worker is accepting requests.
+{"cancel": "<id>"} abandons a request Node has given up on: it gets no reply, and whatever
+it wrote is deleted.
+
+Requests run concurrently, limited per engine.
+
+Config (env):
+  TTS_WORKER_CONCURRENCY_GTTS=4
+  TTS_WORKER_CONCURRENCY_EDGE=4
+"""
+import sys
+import os
+import json
+import time
+import asyncio
+
+load_start = time.monotonic()
+from gtts import gTTS
+import edge_tts
+
+import audio_format
+
+CONCURRENCY = {
+    'gtts': int(os.getenv('TTS_WORKER_CONCURRENCY_GTTS', '4')),
+    'edge': int(os.getenv('TTS_WORKER_CONCURRENCY_EDGE', '4')),
+}
+
+
+def reply(res):
+    print(json.dumps(res), flush=True)
+
+
+def discard(job):
+    """Delete everything a cancelled job wrote (the engine's file and any converted copy)"""
+    if not job.get('output'):
+        return
+    base = os.path.splitext(job['output'])[0]
+    for path in {job['output'], base + '.ogg', base + '.pcm'}:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def save_gtts(job):
+    # gTTS is blocking (requests), so it runs on a thread; a cancelled job's thread still
+    # runs to the end, so it cleans up after itself
+    tts = gTTS(job['text'], lang=job.get('lang', 'en'), tld=job.get('tld', 'com'))
+    tts.save(job['output'])
+    if job.get('cancelled'):
+        discard(job)
+
+
+def convert(job):
+    output = audio_format.convert(job['output'], job.get('format', 'mp3'))
+    if job.get('cancelled'):
+        discard(job)
+    return output
+
+
+async def save_edge(job):
+    communicate = edge_tts.Communicate(job['text'], job['voice'])
+    await communicate.save(job['output'])
+
+
+async def handle(job, limits):
+    job_id = job.get('id')
+    engine = job.get('engine')
+    try:
+        if engine not in limits:
+            raise ValueError(f"Unknown engine '{engine}'")
+        async with limits[engine]:
+            start = time.monotonic()
+            if engine == 'gtts':
+                await asyncio.to_thread(save_gtts, job)
+            else:
+                await save_edge(job)
+            synth_ms = round((time.monotonic() - start) * 1000)
+        if not os.path.exists(job['output']):
+            raise RuntimeError("File not created")
+        output = await asyncio.to_thread(convert, job)
+        reply({"id": job_id, "output": output, "synth_ms": synth_ms})
+    except asyncio.CancelledError:
+        print(f"{engine} job {job_id} cancelled", file=sys.stderr, flush=True)
+        job['cancelled'] = True
+        discard(job)
+        raise
+    except Exception as e:
+        print(f"{engine} error: {e}", file=sys.stderr, flush=True)
+        reply({"id": job_id, "error": str(e)})
+
+
+def forget(tasks, job_id, task):
+    if tasks.get(job_id) is task:
+        del tasks[job_id]
+
+
+async def main():
+    limits = {engine: asyncio.Semaphore(max(1, n)) for engine, n in CONCURRENCY.items()}
+
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    sys.stdout.reconfigure(encoding='utf-8')
+    reply({"ready": True, "load_ms": round((time.monotonic() - load_start) * 1000)})
+
+    tasks = {}  # id -> task
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        if not line.strip():
+            continue
+        try:
+            job = json.loads(line)
+        except json.JSONDecodeError as e:
+            print(f"Bad request: {e}", file=sys.stderr, flush=True)
+            continue
+        if 'cancel' in job:
+            task = tasks.get(job['cancel'])
+            if task:
+                task.cancel()  # Frees its concurrency slot right away
+            continue
+        job_id = job.get('id')
+        tasks[job_id] = asyncio.create_task(handle(job, limits))
+        tasks[job_id].add_done_callback(lambda task, job_id=job_id: forget(tasks, job_id, task))
+
+    # stdin closed: finish what's in flight
+    if tasks:
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
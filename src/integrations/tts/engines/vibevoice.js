@@ -1,49 +1,183 @@
 const { spawn } = require('child_process');
 const path = require('path');
 const fs = require('fs');
+const { PassThrough } = require('stream');
+const { FrameReader } = require('../../ipc/framing');
+const { PYTHON_CMD } = require('../../ipc/python');
+const metrics = require('../../../core/metrics');
 
-// Detect Python command based on OS
-// On Linux, use the venv Python to ensure packages are available
-const isWin = process.platform === 'win32';
-const PYTHON_CMD = isWin 
-    ? 'python' 
-    : path.join(__dirname, '..', '..', 'venv', 'bin', 'python3');
+// Path to the wrapper script; run with --server it keeps the model and voice prompts loaded
+const wrapperScript = path.join(__dirname, 'vibevoice_wrapper.py');
 
-async function generate(text, options = {}) {
-    const tempDir = path.resolve(__dirname, '../../temp_tts');
-    if (!fs.existsSync(tempDir)) {
-        fs.mkdirSync(tempDir, { recursive: true });
-    }
-    const tempFile = path.join(tempDir, `vibe-${Date.now()}-${Math.floor(Math.random() * 1000)}.wav`);
+// Stream PCM to the player while it's still being generated (VIBEVOICE_STREAM=false writes a .wav first)
+const STREAM_MODE = (process.env.VIBEVOICE_STREAM || 'true').toLowerCase() !== 'false';
+// PCM (48kHz stereo s16le) buffered before a stream is handed to the player, so a short stall
+// in generation right after the first chunk doesn't leave it with nothing to play
+const PREBUFFER_BYTES = Math.round(parseInt(process.env.VIBEVOICE_PREBUFFER_MS || '750', 10) * 192);
+// File output format when not streaming: 'ogg' / 'pcm' are played without FFmpeg
+const OUTPUT_FORMAT = (process.env.TTS_OUTPUT_FORMAT || 'wav').toLowerCase();
 
-    // Path to the wrapper script we will create
-    const wrapperScript = path.join(__dirname, 'vibevoice_wrapper.py');
+// --- Resident Server ---
 
-    // We assume the environment is set up (pip install done)
-    // Args: OutputPath "Text to speak"
+let server = null; // { process, pending: Map<jobId, { resolve, stream? }> }
+let jobSeq = 0;
 
-    return new Promise((resolve, reject) => {
-        const process = spawn(PYTHON_CMD, [wrapperScript, tempFile, text]);
+function getServer() {
+    if (server) return server;
 
-        process.on('close', (exitCode) => {
-            if (exitCode !== 0) {
-                console.error(`VibeVoice Generation failed (Code ${exitCode})`);
-                resolve(null);
-                return;
+    const pythonProcess = spawn(PYTHON_CMD, [wrapperScript, '--server'], {
+        stdio: ['pipe', 'pipe', 'pipe']
+    });
+    const current = { process: pythonProcess, pending: new Map() };
+    server = current;
+    console.log(`[VibeVoice] Started resident server (pid ${pythonProcess.pid})`);
+
+    pythonProcess.on('error', (err) => {
+        console.error(`[VibeVoice] Failed to spawn resident server:`, err);
+    });
+
+    pythonProcess.stdin.on('error', (err) => {
+        console.error(`[VibeVoice] Server stdin error:`, err);
+    });
+
+    // Replies are framed: 'J' JSON result, 'P' PCM audio, 'E' end of a streamed job
+    const reader = new FrameReader((type, id, payload) => {
+        if (type === 'J') {
+            try {
+                handleServerMessage(current, id, JSON.parse(payload.toString()));
+            } catch (e) {
+                console.error(`[VibeVoice] JSON Parse Error:`, e);
             }
+        } else if (type === 'P') {
+            handleAudio(current, id, payload);
+        } else if (type === 'E') {
+            handleEnd(current, id);
+        }
+    });
+    pythonProcess.stdout.on('data', (data) => reader.push(data));
+
+    pythonProcess.stderr.on('data', (data) => {
+        console.error(`VibeVoice Py: ${data.toString()}`);
+    });
+
+    pythonProcess.on('close', (code) => {
+        console.log(`[VibeVoice] Resident server exited with code ${code} (${current.pending.size} jobs dropped)`);
+        if (server === current) server = null;
+        for (const [id, job] of [...current.pending]) {
+            job.failed = true;
+            handleEnd(current, id);
+        }
+    });
+
+    return current;
+}
+
+function handleServerMessage(current, id, res) {
+    if (res.ready) {
+        console.log(`[VibeVoice] Resident server ready (model loaded in ${res.load_ms}ms).`);
+        return;
+    }
+    if (res.synth_ms !== undefined) {
+        metrics.observe('mina_tts_inference_seconds', res.synth_ms / 1000, { engine: 'vibevoice' },
+            'Synthesis time reported by the Python TTS workers');
+    }
+    if (res.first_audio_ms !== undefined) {
+        metrics.observe('mina_tts_first_audio_seconds', res.first_audio_ms / 1000, { engine: 'vibevoice' },
+            'Time to the first streamed audio chunk, reported by the Python TTS worker');
+    }
 
-            if (!fs.existsSync(tempFile)) {
-                console.error("VibeVoice file not created");
+    const job = id ? current.pending.get(id) : null;
+    if (res.error) {
+        console.error(`VibeVoice Generation failed:`, res.error);
+        if (job) job.failed = true;
+    }
+    if (!job || job.stream) return; // Streamed jobs finish on 'E'
+    current.pending.delete(id);
+
+    if (res.error || !res.output || !fs.existsSync(res.output)) {
+        if (!res.error) console.error("VibeVoice file not created");
+        job.resolve(null);
+        return;
+    }
+    job.resolve(res.output);
+}
+
+function handleAudio(current, id, pcm) {
+    const job = current.pending.get(id);
+    if (!job || !job.stream) return;
+    job.stream.write(pcm);
+    job.buffered += pcm.length;
+    if (!job.started && job.buffered >= PREBUFFER_BYTES) {
+        // Hand the stream to the player once enough audio is queued up ahead of it
+        job.started = true;
+        job.resolve(streamResult(job));
+    }
+}
+
+function streamResult(job) {
+    return { stream: job.stream, inputType: 'raw', complete: job.complete };
+}
+
+function handleEnd(current, id) {
+    const job = current.pending.get(id);
+    if (!job) return;
+    current.pending.delete(id);
+    if (job.stream) {
+        job.stream.end();
+        job.finish(!job.failed);
+    }
+    if (job.started) return;
+    // A reply shorter than the prebuffer still plays
+    job.resolve(job.buffered ? streamResult(job) : null);
+}
+
+/**
+ * Synthesize text.
+ * @returns {Promise<string|{ stream: import('stream').Readable, inputType: 'raw', complete: Promise<boolean> }|null>}
+ *   a .wav path, or (streaming mode) 48kHz stereo s16le PCM that keeps arriving while it plays;
+ *   `complete` resolves once the stream has ended, false if generation failed part way
+ */
+async function generate(text, options = {}) {
+    const current = getServer();
+    const jobId = String(++jobSeq);
+
+    if (STREAM_MODE) {
+        return new Promise((resolve) => {
+            if (!current.process.stdin.writable) {
                 resolve(null);
                 return;
             }
-            resolve(tempFile);
+            let finish;
+            const complete = new Promise((done) => { finish = done; });
+            current.pending.set(jobId, {
+                resolve, stream: new PassThrough(), started: false, buffered: 0, failed: false, complete, finish
+            });
+            current.process.stdin.write(JSON.stringify({ id: jobId, text, stream: true }) + '\n');
         });
+    }
 
-        process.stderr.on('data', (data) => {
-            console.error(`VibeVoice Py: ${data.toString()}`);
-        });
+    const tempDir = path.resolve(__dirname, '../../temp_tts');
+    if (!fs.existsSync(tempDir)) {
+        fs.mkdirSync(tempDir, { recursive: true });
+    }
+    const tempFile = path.join(tempDir, `vibe-${Date.now()}-${Math.floor(Math.random() * 1000)}.wav`);
+
+    return new Promise((resolve) => {
+        if (!current.process.stdin.writable) {
+            resolve(null);
+            return;
+        }
+        current.pending.set(jobId, { resolve });
+        current.process.stdin.write(JSON.stringify({
+            id: jobId,
+            text,
+            output: tempFile,
+            format: OUTPUT_FORMAT
+        }) + '\n');
     });
 }
 
+// This module is only loaded when TTS_ENGINE=vibevoice; start loading the model right away
+getServer();
+
 module.exports = { generate };
@@ -1,5 +1,28 @@
+"""
+VibeVoice synthesis.
+
+Modes:
+  <output_file> <text>   one-shot: load everything, synthesize, exit
+  --server               resident: load the processor and model once, then take
+                         JSON jobs on stdin, one per line:
+                           {"id": "...", "text": "...", "output": "/path.wav", "voice": "optional name",
+                            "format": "optional ogg|pcm (see audio_format.py)"}
+                           {"id": "...", "text": "...", "stream": true}
+                         Replies on stdout are length-prefixed frames (see ipc/framing.py):
+                           'J' JSON: {"output": "/path.wav", "synth_ms": ...} or {"error": "..."};
+                               streaming jobs get {"synth_ms": ..., "first_audio_ms": ...} before 'E';
+                               {"ready": true, "load_ms": ...} with no id
+                           'P' 48kHz stereo s16le PCM, sent while a streaming job is still generating
+                           'E' end of a streaming job
+
+Config (env):
+  VIBEVOICE_VOICE=name        default voice prompt (file stem in demo/voices/streaming_model)
+  VIBEVOICE_VOICE_CACHE=4     how many prefilled voice prompts to keep loaded
+"""
 import sys
 import os
+import json
+import copy
 import torch
 import soundfile as sf
 import time
@@ -7,6 +30,7 @@ import queue
 import threading
 import numpy as np
 import warnings
+from collections import OrderedDict
 
 # Suppress warnings
 warnings.filterwarnings("ignore")
@@ -18,107 +42,273 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 REPO_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '../VibeVoice'))
 
 sys.path.append(REPO_ROOT)
+sys.path.append(os.path.join(SCRIPT_DIR, '..', '..', 'ipc'))
+import framing
+import audio_format
 
 try:
     from vibevoice.modular.modeling_vibevoice_streaming_inference import VibeVoiceStreamingForConditionalGenerationInference
     from vibevoice.processor.vibevoice_streaming_processor import VibeVoiceStreamingProcessor
+    from vibevoice.modular.streamer import AudioStreamer
 except ImportError as e:
     print(f"Error importing VibeVoice modules: {e}", file=sys.stderr)
     print(f"sys.path is: {sys.path}", file=sys.stderr)
     sys.exit(1)
 
+# Configuration
+MODEL_PATH = "microsoft/VibeVoice-Realtime-0.5B" # Will download from HuggingFace
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+# We look for voices in tts/VibeVoice/demo/voices/streaming_model
+VOICES_DIR = os.path.join(REPO_ROOT, "demo", "voices", "streaming_model")
+DEFAULT_VOICE = os.getenv('VIBEVOICE_VOICE')
+VOICE_CACHE_SIZE = int(os.getenv('VIBEVOICE_VOICE_CACHE', '4'))
+
+
+def find_voice(name=None):
+    """Path to the .pt voice prompt called `name`, or the first one available"""
+    if not os.path.exists(VOICES_DIR):
+        return None
+    voices = sorted(f for f in os.listdir(VOICES_DIR) if f.endswith(".pt"))
+    if name:
+        for f in voices:
+            if os.path.splitext(f)[0] == name:
+                return os.path.join(VOICES_DIR, f)
+        print(f"Voice '{name}' not found, using default", file=sys.stderr)
+    return os.path.join(VOICES_DIR, voices[0]) if voices else None
+
+
+def load_model():
+    print(f"Loading model from {MODEL_PATH} on {DEVICE}...", file=sys.stderr)
+
+    # Load Processor
+    processor = VibeVoiceStreamingProcessor.from_pretrained(MODEL_PATH)
+
+    # Load Model
+    # Using float32 for CPU/MPS, bfloat16 for CUDA
+    dtype = torch.bfloat16 if DEVICE == "cuda" else torch.float32
+    attn = "flash_attention_2" if DEVICE == "cuda" else "sdpa"
+
+    try:
+         model = VibeVoiceStreamingForConditionalGenerationInference.from_pretrained(
+            MODEL_PATH,
+            torch_dtype=dtype,
+            device_map=DEVICE,
+            attn_implementation=attn
+        )
+    except Exception:
+        # Fallback for attn
+        model = VibeVoiceStreamingForConditionalGenerationInference.from_pretrained(
+            MODEL_PATH,
+            torch_dtype=dtype,
+            device_map=DEVICE,
+            attn_implementation="sdpa"
+        )
+
+    model.eval()
+    model.set_ddpm_inference_steps(num_steps=5) # Default from demo
+    return processor, model
+
+
+class VoiceCache:
+    """LRU of prefilled voice prompts (torch.load of the .pt files), keyed by file path"""
+
+    def __init__(self, size):
+        self.size = max(1, size)
+        self.prompts = OrderedDict()
+
+    def get(self, voice_path):
+        if voice_path in self.prompts:
+            self.prompts.move_to_end(voice_path)
+            return self.prompts[voice_path]
+        prompt = torch.load(voice_path, map_location=DEVICE, weights_only=False)
+        self.prompts[voice_path] = prompt
+        if len(self.prompts) > self.size:
+            self.prompts.popitem(last=False)
+        return prompt
+
+
+def prepare(processor, all_prefilled_outputs, input_text):
+    inputs = processor.process_input_with_cached_prompt(
+        text=input_text,
+        cached_prompt=all_prefilled_outputs,
+        padding=True,
+        return_tensors="pt",
+        return_attention_mask=True,
+    )
+
+    for k, v in inputs.items():
+        if torch.is_tensor(v):
+            inputs[k] = v.to(DEVICE)
+    return inputs
+
+
+def generate(processor, model, all_prefilled_outputs, inputs, **kwargs):
+    with torch.inference_mode():
+        return model.generate(
+            **inputs,
+            max_new_tokens=None,
+            cfg_scale=1.5,
+            tokenizer=processor.tokenizer,
+            generation_config={'do_sample': False},
+            # generate() mutates the prefilled caches; the cached prompt must stay pristine
+            all_prefilled_outputs=copy.deepcopy(all_prefilled_outputs),
+            **kwargs
+        )
+
+
+def synthesize(processor, model, all_prefilled_outputs, input_text, output_path):
+    """Generate speech for input_text into output_path. Returns True if audio was written."""
+    print(f"Generating audio for: {input_text}", file=sys.stderr)
+    inputs = prepare(processor, all_prefilled_outputs, input_text)
+    outputs = generate(processor, model, all_prefilled_outputs, inputs)
+
+    if outputs.speech_outputs and outputs.speech_outputs[0] is not None:
+        # Save
+        processor.save_audio(outputs.speech_outputs[0], output_path=output_path)
+        print(f"Saved to {output_path}", file=sys.stderr)
+        return True
+    print("No audio output generated", file=sys.stderr)
+    return False
+
+
+class DiscordPCM:
+    """24kHz mono float chunks -> 48kHz stereo s16le, interpolating across chunk boundaries"""
+
+    def __init__(self):
+        self.last = 0.0
+
+    def convert(self, chunk):
+        samples = chunk.float().cpu().numpy().reshape(-1)
+        if len(samples) == 0:
+            return b''
+        previous = np.concatenate(([self.last], samples[:-1]))
+        self.last = float(samples[-1])
+        upsampled = np.empty(len(samples) * 2, dtype=np.float32)
+        upsampled[0::2] = (previous + samples) / 2
+        upsampled[1::2] = samples
+        pcm = (np.clip(upsampled, -1.0, 1.0) * 32767).astype('<i2')
+        return np.repeat(pcm, 2).tobytes()  # L/R interleaved
+
+
+def synthesize_stream(processor, model, all_prefilled_outputs, input_text, on_audio):
+    """Generate speech for input_text, handing PCM to on_audio(bytes) as each chunk is produced"""
+    print(f"Streaming audio for: {input_text}", file=sys.stderr)
+    inputs = prepare(processor, all_prefilled_outputs, input_text)
+    streamer = AudioStreamer(batch_size=1, stop_signal=None, timeout=None)
+    failure = []
+
+    def run():
+        try:
+            generate(processor, model, all_prefilled_outputs, inputs, audio_streamer=streamer)
+        except Exception as e:
+            failure.append(e)
+        finally:
+            streamer.end()  # Unblock the reader even if generation failed
+
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+    converter = DiscordPCM()
+    sent = 0
+    for chunk in streamer.get_stream(0):
+        pcm = converter.convert(chunk)
+        if pcm:
+            on_audio(pcm)
+            sent += len(pcm)
+    worker.join()
+
+    if failure:
+        raise failure[0]
+    return sent > 0
+
+
+def run_server():
+    # Frames go to the real stdout; anything the libraries print goes to stderr instead
+    frames = framing.claim_stdout()
+
+    def reply(job_id, res):
+        frames.write('J', job_id or '', json.dumps(res).encode('utf-8'))
+
+    load_start = time.time()
+    try:
+        processor, model = load_model()
+    except Exception as e:
+        reply(None, {"error": f"Failed to load model: {e}"})
+        sys.exit(1)
+
+    voices = VoiceCache(VOICE_CACHE_SIZE)
+    default_voice = find_voice(DEFAULT_VOICE)
+    if default_voice:
+        voices.get(default_voice)  # Warm the default prompt
+    reply(None, {"ready": True, "load_ms": round((time.time() - load_start) * 1000)})
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        job_id = None
+        streaming = False
+        try:
+            job = json.loads(line)
+            job_id = job.get("id")
+            streaming = bool(job.get("stream"))
+            voice_path = find_voice(job.get("voice") or DEFAULT_VOICE)
+            if not voice_path:
+                raise RuntimeError("No voice preset found in demo/voices/streaming_model")
+
+            start = time.time()
+            prompt = voices.get(voice_path)
+            if streaming:
+                first = []
+
+                def on_audio(pcm):
+                    if not first:
+                        first.append(time.time())
+                        print(f"First audio after {first[0] - start:.2f}s", file=sys.stderr)
+                    frames.write('P', job_id, pcm)
+
+                ok = synthesize_stream(processor, model, prompt, job["text"], on_audio)
+            else:
+                ok = synthesize(processor, model, prompt, job["text"], job["output"])
+
+            if not ok:
+                reply(job_id, {"error": "No audio output generated"})
+            else:
+                synth_ms = round((time.time() - start) * 1000)
+                print(f"Synthesized in {synth_ms / 1000:.2f}s", file=sys.stderr)
+                if streaming:
+                    reply(job_id, {"synth_ms": synth_ms, "first_audio_ms": round((first[0] - start) * 1000)})
+                else:
+                    output = audio_format.convert(job["output"], job.get("format", "mp3"))
+                    reply(job_id, {"output": output, "synth_ms": synth_ms})
+        except Exception as e:
+            print(f"Inference Error: {e}", file=sys.stderr)
+            reply(job_id, {"error": str(e)})
+        finally:
+            if streaming:
+                frames.write('E', job_id)
+
+
 def main():
     if len(sys.argv) < 3:
         print("Usage: python vibevoice_wrapper.py <output_file> <text>", file=sys.stderr)
+        print("       python vibevoice_wrapper.py --server", file=sys.stderr)
         sys.exit(1)
 
     output_path = sys.argv[1]
     input_text = sys.argv[2]
-    
-    # Configuration
-    MODEL_PATH = "microsoft/VibeVoice-Realtime-0.5B" # Will download from HuggingFace
-    DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-    
+
     # Locate a voice file
-    # We look in tts/VibeVoice/demo/voices/streaming_model
-    voices_dir = os.path.join(REPO_ROOT, "demo", "voices", "streaming_model")
-    voice_path = None
-    
-    if os.path.exists(voices_dir):
-        # Find first .pt file
-        for f in os.listdir(voices_dir):
-            if f.endswith(".pt"):
-                voice_path = os.path.join(voices_dir, f)
-                break
-    
+    voice_path = find_voice(DEFAULT_VOICE)
     if not voice_path:
         print("Error: No voice preset found in demo/voices/streaming_model", file=sys.stderr)
-        # Try to find *any* pt file or fail
         sys.exit(1)
 
-    print(f"Loading model from {MODEL_PATH} on {DEVICE}...", file=sys.stderr)
-    
     try:
-        # Load Processor
-        processor = VibeVoiceStreamingProcessor.from_pretrained(MODEL_PATH)
-        
-        # Load Model
-        # Using float32 for CPU/MPS, bfloat16 for CUDA
-        dtype = torch.bfloat16 if DEVICE == "cuda" else torch.float32
-        attn = "flash_attention_2" if DEVICE == "cuda" else "sdpa"
-        
-        try:
-             model = VibeVoiceStreamingForConditionalGenerationInference.from_pretrained(
-                MODEL_PATH,
-                torch_dtype=dtype,
-                device_map=DEVICE,
-                attn_implementation=attn
-            )
-        except Exception:
-            # Fallback for attn
-            model = VibeVoiceStreamingForConditionalGenerationInference.from_pretrained(
-                MODEL_PATH,
-                torch_dtype=dtype,
-                device_map=DEVICE,
-                attn_implementation="sdpa"
-            )
-
-        model.eval()
-        model.set_ddpm_inference_steps(num_steps=5) # Default from demo
+        processor, model = load_model()
 
         # Load Voice Prompt
         all_prefilled_outputs = torch.load(voice_path, map_location=DEVICE, weights_only=False)
 
-        # Prepare Input
-        inputs = processor.process_input_with_cached_prompt(
-            text=input_text,
-            cached_prompt=all_prefilled_outputs,
-            padding=True,
-            return_tensors="pt",
-            return_attention_mask=True,
-        )
-        
-        for k, v in inputs.items():
-            if torch.is_tensor(v):
-                inputs[k] = v.to(DEVICE)
-
-        # Generate
-        print(f"Generating audio for: {input_text}", file=sys.stderr)
-        outputs = model.generate(
-            **inputs,
-            max_new_tokens=None,
-            cfg_scale=1.5,
-            tokenizer=processor.tokenizer,
-            generation_config={'do_sample': False},
-            all_prefilled_outputs=all_prefilled_outputs,
-        )
-        
-        if outputs.speech_outputs and outputs.speech_outputs[0] is not None:
-             # Save
-             processor.save_audio(outputs.speech_outputs[0], output_path=output_path)
-             print(f"Saved to {output_path}", file=sys.stderr)
-        else:
-            print("No audio output generated", file=sys.stderr)
+        if not synthesize(processor, model, all_prefilled_outputs, input_text, output_path):
             sys.exit(1)
 
     except Exception as e:
@@ -128,4 +318,7 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    if '--server' in sys.argv:
+        run_server()
+    else:
+        main()
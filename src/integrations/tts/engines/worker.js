@@ -0,0 +1,120 @@
+const { spawn } = require('child_process');
+const path = require('path');
+const fs = require('fs');
+const metrics = require('../../../core/metrics');
+const { PYTHON_CMD } = require('../../ipc/python');
+
+// Client for tts_worker.py: one long-lived Python process shared by the gTTS and Edge engines.
+
+const WORKER_SCRIPT = path.join(__dirname, 'tts_worker.py');
+// 'ogg' (Opus) or 'pcm' (48kHz stereo) are played without FFmpeg; 'mp3' keeps the engines' native output
+const OUTPUT_FORMAT = (process.env.TTS_OUTPUT_FORMAT || 'mp3').toLowerCase();
+// Both engines talk to online services; don't let a hung request block the sentence forever
+const JOB_TIMEOUT_MS = parseInt(process.env.TTS_WORKER_TIMEOUT_MS || '30000', 10);
+
+let worker = null; // { process, pending: Map<jobId, { resolve, timer, engine }> }
+let jobSeq = 0;
+
+function getWorker() {
+    if (worker) return worker;
+
+    const pythonProcess = spawn(PYTHON_CMD, [WORKER_SCRIPT], {
+        stdio: ['pipe', 'pipe', 'pipe']
+    });
+    const current = { process: pythonProcess, pending: new Map() };
+    worker = current;
+    console.log(`[TTS Worker] Started (pid ${pythonProcess.pid})`);
+
+    pythonProcess.on('error', (err) => {
+        console.error(`[TTS Worker] Failed to spawn:`, err);
+    });
+
+    pythonProcess.stdin.on('error', (err) => {
+        console.error(`[TTS Worker] stdin error:`, err);
+    });
+
+    let buffer = '';
+    pythonProcess.stdout.on('data', (data) => {
+        buffer += data.toString();
+        const lines = buffer.split('\n');
+        buffer = lines.pop(); // Keep incomplete line
+
+        for (const line of lines) {
+            if (!line.trim()) continue;
+            try {
+                handleMessage(current, JSON.parse(line));
+            } catch (e) {
+                console.error(`[TTS Worker] JSON Parse Error:`, e);
+            }
+        }
+    });
+
+    pythonProcess.stderr.on('data', (data) => {
+        console.error(`[TTS Worker stderr]: ${data.toString().trim()}`);
+    });
+
+    pythonProcess.on('close', (code) => {
+        console.log(`[TTS Worker] Exited with code ${code} (${current.pending.size} jobs dropped)`);
+        if (worker === current) worker = null;
+        for (const id of [...current.pending.keys()]) finish(current, id, null);
+    });
+
+    return current;
+}
+
+function finish(current, id, output) {
+    const job = current.pending.get(id);
+    if (!job) return;
+    current.pending.delete(id);
+    clearTimeout(job.timer);
+    job.resolve(output);
+}
+
+function handleMessage(current, res) {
+    if (res.ready) {
+        console.log(`[TTS Worker] Ready (libraries loaded in ${res.load_ms}ms).`);
+        return;
+    }
+    const job = current.pending.get(res.id);
+    if (!job) {
+        // A job that timed out finished anyway before it saw the cancel: nobody will play its file
+        if (res.output) fs.unlink(res.output, () => { });
+        return;
+    }
+    if (res.synth_ms !== undefined) {
+        metrics.observe('mina_tts_inference_seconds', res.synth_ms / 1000, { engine: job.engine },
+            'Synthesis time reported by the Python TTS workers');
+    }
+    if (res.error) {
+        console.error(`[TTS Worker] Job ${res.id} failed:`, res.error);
+    }
+    finish(current, res.id, res.error ? null : res.output);
+}
+
+/**
+ * Run one synthesis job on the shared worker
+ * @param {'gtts'|'edge'} engine
+ * @param {Object} params - text, output and engine-specific fields (lang/tld or voice)
+ * @returns {Promise<string|null>} output path, or null on failure
+ */
+function synthesize(engine, params) {
+    const current = getWorker();
+    const id = String(++jobSeq);
+
+    return new Promise((resolve) => {
+        if (!current.process.stdin.writable) {
+            resolve(null);
+            return;
+        }
+        const timer = setTimeout(() => {
+            console.error(`[TTS Worker] Job ${id} (${engine}) timed out`);
+            finish(current, id, null);
+            // Free its slot in the worker and have it delete whatever it wrote
+            if (current.process.stdin.writable) current.process.stdin.write(JSON.stringify({ cancel: id }) + '\n');
+        }, JOB_TIMEOUT_MS);
+        current.pending.set(id, { resolve, timer, engine });
+        current.process.stdin.write(JSON.stringify({ id, engine, format: OUTPUT_FORMAT, ...params }) + '\n');
+    });
+}
+
+module.exports = { synthesize };
@@ -1,5 +1,9 @@
 const fs = require('fs');
 const path = require('path');
+const crypto = require('crypto');
+const { PassThrough } = require('stream');
+const { finished } = require('stream/promises');
+const metrics = require('../../core/metrics');
 const gtts = require('./engines/gtts');
 const edge = require('./engines/edge');
 const azure = require('./engines/azure');
@@ -12,6 +16,205 @@ const engines = {
     'vibevoice': null
 };
 
+// --- Audio Cache ---
+// Synthesized audio is stored under a hash of (engine, voice, style, output format, normalized text),
+// so repeated phrases ("Done.", reminders, canned responses, greetings) skip synthesis entirely.
+// Streamed audio is written to the cache as it plays and stored once the stream completes.
+// TTS_CACHE=false disables it; TTS_CACHE_MAX_MB bounds the on-disk size (least recently used goes first).
+
+const CACHE_ENABLED = (process.env.TTS_CACHE || 'true').toLowerCase() !== 'false';
+const CACHE_DIR = path.join(process.cwd(), 'data', 'tts_cache');
+const CACHE_MAX_BYTES = parseFloat(process.env.TTS_CACHE_MAX_MB || '200') * 1024 * 1024;
+
+const cacheIndex = new Map(); // key -> { file, bytes }, oldest use first
+const pins = new Map(); // file -> number of queued/playing uses (never evicted while > 0)
+const retired = new Set(); // Replaced cache files still pinned; deleted on their last release
+const cacheStats = { hits: 0, misses: 0, stores: 0, evictions: 0, bytes: 0 };
+
+function loadCacheIndex() {
+    if (!CACHE_ENABLED) return;
+    try {
+        fs.mkdirSync(CACHE_DIR, { recursive: true });
+        const entries = [];
+        for (const name of fs.readdirSync(CACHE_DIR)) {
+            const file = path.join(CACHE_DIR, name);
+            if (name.endsWith('.part')) {
+                fs.unlink(file, () => { }); // A stream that never completed
+                continue;
+            }
+            const stat = fs.statSync(file);
+            entries.push({ key: path.parse(name).name, file, bytes: stat.size, used: stat.mtimeMs });
+        }
+        entries.sort((a, b) => a.used - b.used);
+        for (const { key, file, bytes } of entries) {
+            // The same clip in an older format: the newer file wins
+            const previous = cacheIndex.get(key);
+            if (previous) {
+                cacheIndex.delete(key);
+                cacheStats.bytes -= previous.bytes;
+                fs.unlink(previous.file, () => { });
+            }
+            cacheIndex.set(key, { file, bytes });
+            cacheStats.bytes += bytes;
+        }
+        if (cacheIndex.size) console.log(`[TTS] Cache: ${cacheIndex.size} clips, ${(cacheStats.bytes / 1048576).toFixed(1)} MB`);
+    } catch (e) {
+        console.error("[TTS] Failed to load cache index:", e.message);
+    }
+}
+
+function cacheKey(engineName, text, options) {
+    const normalized = text.normalize('NFC').replace(/\s+/g, ' ').trim();
+    // VibeVoice ignores the requested voice; its worker picks the prompt from VIBEVOICE_VOICE
+    const voice = engineName === 'vibevoice'
+        ? process.env.VIBEVOICE_VOICE || ''
+        : options.code || options.voice || '';
+    const format = (process.env.TTS_OUTPUT_FORMAT || '').toLowerCase();
+    return crypto.createHash('sha1')
+        .update(JSON.stringify([engineName, voice, options.style || '', format, normalized]))
+        .digest('hex');
+}
+
+function pin(file) {
+    pins.set(file, (pins.get(file) || 0) + 1);
+    return file;
+}
+
+function cacheLookup(key) {
+    const entry = cacheIndex.get(key);
+    if (!entry) return null;
+    if (!fs.existsSync(entry.file)) {
+        cacheIndex.delete(key);
+        cacheStats.bytes -= entry.bytes;
+        return null;
+    }
+    // Move to the most-recently-used end; mtime keeps the order across restarts
+    cacheIndex.delete(key);
+    cacheIndex.set(key, entry);
+    const now = new Date();
+    fs.utimes(entry.file, now, now, () => { });
+    return pin(entry.file);
+}
+
+function removeCacheFile(file) {
+    if (pins.get(file)) retired.add(file);
+    else fs.unlink(file, () => { });
+}
+
+async function cacheStore(key, tempFile, ext = path.extname(tempFile)) {
+    const file = path.join(CACHE_DIR, key + ext);
+    try {
+        // Replaced by a file with another extension (the output format changed): the old one would
+        // otherwise sit on disk outside the index until the next restart
+        const previous = cacheIndex.get(key);
+        if (previous && previous.file !== file) {
+            cacheIndex.delete(key);
+            cacheStats.bytes -= previous.bytes;
+            removeCacheFile(previous.file);
+        }
+        try {
+            await fs.promises.rename(tempFile, file);
+        } catch (e) {
+            if (e.code !== 'EXDEV') throw e;
+            await fs.promises.copyFile(tempFile, file);
+            await fs.promises.unlink(tempFile);
+        }
+        retired.delete(file);
+        const { size } = await fs.promises.stat(file);
+        const current = cacheIndex.get(key);
+        if (current) cacheStats.bytes -= current.bytes;
+        cacheIndex.delete(key);
+        cacheIndex.set(key, { file, bytes: size });
+        cacheStats.bytes += size;
+        cacheStats.stores++;
+        pin(file);
+        evict();
+        return file;
+    } catch (e) {
+        console.error("[TTS] Failed to cache audio:", e.message);
+        return fs.existsSync(tempFile) ? tempFile : null;
+    }
+}
+
+function evict() {
+    for (const [key, entry] of cacheIndex) {
+        if (cacheStats.bytes <= CACHE_MAX_BYTES) break;
+        if (pins.get(entry.file)) continue;
+        cacheIndex.delete(key);
+        cacheStats.bytes -= entry.bytes;
+        cacheStats.evictions++;
+        fs.unlink(entry.file, () => { });
+    }
+}
+
+/**
+ * Tee a streamed result into the cache; the clip is stored once the engine reports it complete
+ * @param {string} key
+ * @param {{ stream: import('stream').Readable, complete: Promise<boolean> }} result
+ * @returns {{ stream: import('stream').Readable }} the result, with a stream for the player
+ */
+function cacheStream(key, result) {
+    const tempFile = path.join(CACHE_DIR, `${key}-${Date.now()}.part`);
+    const file = fs.createWriteStream(tempFile);
+    const out = new PassThrough();
+    result.stream.pipe(out);
+    result.stream.pipe(file);
+
+    Promise.all([result.complete, finished(file)])
+        .then(async ([complete]) => {
+            if (!complete) {
+                await fs.promises.unlink(tempFile);
+                return;
+            }
+            // Nothing is playing the cached copy yet, so don't keep it pinned
+            const stored = await cacheStore(key, tempFile, '.pcm');
+            if (stored === tempFile) await fs.promises.unlink(tempFile);
+            else disposeFile(stored);
+        })
+        .catch((e) => {
+            console.error("[TTS] Failed to cache streamed audio:", e.message);
+            result.stream.unpipe(file);
+            fs.unlink(tempFile, () => { });
+        });
+    return { ...result, stream: out };
+}
+
+/**
+ * Release a file returned by generateSpeech once it has been played.
+ * Temp files are deleted; cached files are only unpinned.
+ * @param {string} file
+ */
+function disposeFile(file) {
+    if (!file) return;
+    const count = pins.get(file);
+    if (count !== undefined) {
+        if (count > 1) {
+            pins.set(file, count - 1);
+        } else {
+            pins.delete(file);
+            if (retired.delete(file)) fs.unlink(file, () => { });
+        }
+        return;
+    }
+    if (path.dirname(file) === CACHE_DIR) return;
+    try {
+        if (fs.existsSync(file)) fs.unlinkSync(file);
+    } catch (e) {
+        console.error('Error deleting temp file:', e);
+    }
+}
+
+function getCacheStats() {
+    const lookups = cacheStats.hits + cacheStats.misses;
+    return {
+        ...cacheStats,
+        entries: cacheIndex.size,
+        hitRate: lookups ? cacheStats.hits / lookups : 0
+    };
+}
+
+loadCacheIndex();
+
 async function generateSpeech(text, options = {}) {
     // 1. Determine engine
     let engineName = process.env.TTS_ENGINE || 'gtts';
@@ -39,9 +242,26 @@ async function generateSpeech(text, options = {}) {
 
     const engine = engines[engineName];
 
+    const key = CACHE_ENABLED ? cacheKey(engineName, text, options) : null;
+    if (key) {
+        const cached = cacheLookup(key);
+        if (cached) {
+            cacheStats.hits++;
+            return cached;
+        }
+        cacheStats.misses++;
+    }
+
     try {
+        const start = Date.now();
         let result = await engine.generate(text, options);
         if (!result) throw new Error("No result returned");
+        // For streaming engines this is time to first audio
+        metrics.observe('mina_tts_synthesis_seconds', (Date.now() - start) / 1000, { engine: engineName },
+            'Time for a TTS engine to return audio (cache misses only)');
+        // Only audio from the requested engine is cached (fallback audio isn't)
+        if (key && typeof result === 'string') return await cacheStore(key, result);
+        if (key && result.stream && result.complete) return cacheStream(key, result);
         return result;
     } catch (e) {
         console.error(`[TTS] ${engineName} failed:`, e.message);
@@ -66,4 +286,11 @@ async function generateSpeech(text, options = {}) {
     }
 }
 
-module.exports = { generateSpeech };
+metrics.registerCollector(() => {
+    const stats = getCacheStats();
+    metrics.setCounter('mina_tts_cache_hits_total', stats.hits, {}, 'TTS cache hits');
+    metrics.setCounter('mina_tts_cache_misses_total', stats.misses, {}, 'TTS cache misses');
+    metrics.setGauge('mina_tts_cache_bytes', stats.bytes, {}, 'Size of the TTS cache on disk');
+});
+
+module.exports = { generateSpeech, disposeFile, getCacheStats };